@@ -0,0 +1,231 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside);
+window.dash_clientside.compute = Object.assign({}, window.dash_clientside.compute, {
+    // computes the figure traces in the order of ClarkeParkExploration.build_figure_template, following
+    // generate_figure_data, the Python code is the reference and clarke_park_clientside.py checks that
+    // the two agree
+    get_frame: function (settings, controls) {
+        var count = settings.sample_count;
+        var phaseCount = settings.phase_shifts.length;
+        var orders = settings.harmonic_orders;
+        var matrix = settings.clarke_matrix;
+        var zeros = new Array(count).fill(0);
+        var angle = new Array(count);
+        var step = -1 / (count - 1);
+        var index, phase, order, row;
+        for (index = 0; index < count; index++) {
+            var time = index === count - 1 ? -1 : index * step;
+            angle[index] = (time + controls.time) * controls.frequency * 2 * Math.PI;
+        }
+
+        // every phase, then the neutral as their sum
+        var phaseY = [];
+        var phaseZ = [];
+        var shifts = [];
+        for (phase = 0; phase < phaseCount; phase++) {
+            var shift = controls.offsets[phase] * Math.PI + settings.phase_shifts[phase];
+            var amplitude = controls.amplitudes[phase];
+            var zeroY = settings.zero_sequence_offsets[phase][0] * controls.zero_sequence;
+            var zeroZ = settings.zero_sequence_offsets[phase][1] * controls.zero_sequence;
+            // the slider amplitude of each order plus the per-phase inputs, phase major,
+            // empty inputs are null
+            var harmonicAmplitudes = [];
+            var harmonicShifts = [];
+            for (order = 0; order < orders.length; order++) {
+                var input = phase * orders.length + order;
+                harmonicAmplitudes.push(
+                    controls.harmonics[order] + ((controls.phase_harmonic_amplitudes || [])[input] || 0)
+                );
+                harmonicShifts.push(((controls.phase_harmonic_phases || [])[input] || 0) * Math.PI);
+            }
+            var y = new Array(count);
+            var z = new Array(count);
+            for (index = 0; index < count; index++) {
+                var phaseAngle = angle[index] + shift;
+                y[index] = amplitude * Math.cos(phaseAngle) - zeroY;
+                z[index] = amplitude * Math.sin(phaseAngle) - zeroZ;
+                for (order = 0; order < orders.length; order++) {
+                    if (harmonicAmplitudes[order] !== 0) {
+                        var harmonicAngle = orders[order] * phaseAngle + harmonicShifts[order];
+                        y[index] += harmonicAmplitudes[order] * Math.cos(harmonicAngle);
+                        z[index] += harmonicAmplitudes[order] * Math.sin(harmonicAngle);
+                    }
+                }
+            }
+            phaseY.push(y);
+            phaseZ.push(z);
+            shifts.push(shift);
+        }
+        var neutralY = zeros.map(function (_, sample) {
+            return phaseY.reduce(function (total, y) { return total + y[sample]; }, 0);
+        });
+        var neutralZ = zeros.map(function (_, sample) {
+            return phaseZ.reduce(function (total, z) { return total + z[sample]; }, 0);
+        });
+
+        // Clarke transform of the real parts, then Park d and q referenced to phase A
+        var clarke = matrix.map(function (coefficients) {
+            return zeros.map(function (_, sample) {
+                var total = 0;
+                for (phase = 0; phase < phaseCount; phase++) {
+                    total += coefficients[phase] * phaseY[phase][sample];
+                }
+                return total;
+            });
+        });
+        var parkD = zeros.map(function (_, sample) {
+            return phaseZ[0][sample] * clarke[0][sample] - phaseY[0][sample] * clarke[1][sample];
+        });
+        var parkQ = zeros.map(function (_, sample) {
+            return phaseY[0][sample] * clarke[0][sample] + phaseZ[0][sample] * clarke[1][sample];
+        });
+        var park = [parkD, parkQ, zeros];
+
+        // Park d and q rotated back into the three phase frame for plotting
+        var reference = controls.frequency * 2 * Math.PI * controls.time + controls.offsets[0] * Math.PI;
+        var rotate = function (values, rotation) {
+            return [
+                values.map(function (value) { return value * Math.cos(rotation); }),
+                values.map(function (value) { return value * Math.sin(rotation); })
+            ];
+        };
+        var rotatedD = rotate(parkD, reference + Math.PI / 2);
+        var rotatedQ = rotate(parkQ, reference);
+
+        // zero, positive and negative sequence components of the phase phasors
+        var sequenceY = [[], [], []];
+        var sequenceZ = [[], [], []];
+        var power = [0, 0, 0];
+        var rotation = 2 * Math.PI / 3;
+        for (index = 0; index < count; index++) {
+            for (row = 0; row < 3; row++) {
+                var real = 0;
+                var imaginary = 0;
+                for (phase = 0; phase < 3; phase++) {
+                    var turn = rotation * ((row * phase) % 3);
+                    var y = phaseY[phase][index];
+                    var z = phaseZ[phase][index];
+                    real += y * Math.cos(turn) - z * Math.sin(turn);
+                    imaginary += y * Math.sin(turn) + z * Math.cos(turn);
+                }
+                sequenceY[row].push(real / 3);
+                sequenceZ[row].push(imaginary / 3);
+                power[row] += (real * real + imaginary * imaginary) / 9;
+            }
+        }
+        var positive = Math.sqrt(power[1]);
+        var unbalance = [Math.sqrt(power[2]) / positive, Math.sqrt(power[0]) / positive];
+
+        var largest = 1;
+        [phaseY, phaseZ, [neutralY, neutralZ], clarke, park].forEach(function (rows) {
+            rows.forEach(function (values) {
+                values.forEach(function (value) {
+                    largest = Math.max(largest, Math.abs(value));
+                });
+            });
+        });
+
+        var traceY = [[-largest, largest]];
+        var traceZ = [[-largest, largest]];
+        var addTrace = function (y, z) {
+            traceY.push(y);
+            traceZ.push(z);
+        };
+        var addPhasor = function (y, z) {
+            addTrace([0, y === null ? 0 : y[0]], [0, z === null ? 0 : z[0]]);
+        };
+        for (phase = 0; phase < phaseCount; phase++) {
+            addTrace(phaseY[phase], phaseZ[phase]);
+        }
+        addTrace(neutralY, neutralZ);
+        for (phase = 0; phase < phaseCount; phase++) {
+            addPhasor(phaseY[phase], phaseZ[phase]);
+        }
+        addPhasor(neutralY, neutralZ);
+        addTrace(clarke[0], zeros);
+        addTrace(zeros, clarke[1]);
+        addTrace(clarke[2], clarke[2]);
+        addPhasor(clarke[0], null);
+        addPhasor(null, clarke[1]);
+        addPhasor(clarke[2], clarke[2]);
+        addTrace(rotatedD[0], rotatedD[1]);
+        addTrace(rotatedQ[0], rotatedQ[1]);
+        addPhasor(rotatedD[0], rotatedD[1]);
+        addPhasor(rotatedQ[0], rotatedQ[1]);
+        [1, 2, 0].forEach(function (sequence) {
+            addTrace(sequenceY[sequence], sequenceZ[sequence]);
+        });
+
+        var names = settings.names.slice();
+        var label = controls.time.toFixed(2) + ")";
+        settings.phasors.forEach(function (phasor) {
+            names[phasor[0]] = phasor[1] + label;
+        });
+
+        // the values next to the equations, see ClarkeParkExploration.get_equation_values
+        var equationValues = [];
+        for (phase = 0; phase < phaseCount; phase++) {
+            equationValues.push(0, phaseY[phase][0], phaseZ[phase][0]);
+        }
+        equationValues.push(0, neutralY[0], neutralZ[0]);
+        clarke.concat(park).forEach(function (values) {
+            equationValues.push(values[0]);
+        });
+
+        return {
+            names: names,
+            traces: { y: traceY, z: traceZ },
+            equation_values: equationValues.map(function (value) {
+                return Math.round(value * 100) / 100;
+            }),
+            unbalance: unbalance
+        };
+    },
+    // restyles the plot in place from the sliders while browser compute is on
+    update: function (
+        on, time, frequency, amplitudeA, amplitudeB, amplitudeC, offsetA, offsetB, offsetC, zeroSequence,
+        harmonic5, harmonic7, harmonic11, harmonic13, phaseHarmonicAmplitudes, phaseHarmonicPhases, settings
+    ) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!on || !settings) {
+            return [noUpdate, noUpdate];
+        }
+        var frame = window.dash_clientside.compute.get_frame(settings, {
+            time: time,
+            frequency: frequency,
+            amplitudes: [amplitudeA, amplitudeB, amplitudeC],
+            offsets: [offsetA, offsetB, offsetC],
+            zero_sequence: zeroSequence,
+            harmonics: [harmonic5, harmonic7, harmonic11, harmonic13],
+            phase_harmonic_amplitudes: phaseHarmonicAmplitudes,
+            phase_harmonic_phases: phaseHarmonicPhases
+        });
+        var graph = document.querySelector("#scatter_plot .js-plotly-plot");
+        if (graph && graph.data && graph.data.length === frame.names.length) {
+            var update = { name: frame.names };
+            if (graph.data[0].type === "scatter3d") {
+                update.y = frame.traces.y;
+                update.z = frame.traces.z;
+            } else {
+                // planar views plot two of the trace axes, the time axis never changes
+                var titles = [graph.layout.xaxis.title, graph.layout.yaxis.title].map(function (title) {
+                    return title && title.text !== undefined ? title.text : title;
+                });
+                var axes = settings.flat_axes[titles.join("|")] || [];
+                ["x", "y"].forEach(function (plotAxis, position) {
+                    if (axes[position] && axes[position] !== "x") {
+                        update[plotAxis] = frame.traces[axes[position]];
+                    }
+                });
+            }
+            Plotly.restyle(graph, update);
+        }
+        var percent = function (value) {
+            return (value * 100).toFixed(1);
+        };
+        return [
+            frame.equation_values,
+            "Negative sequence unbalance (|V2| / |V1|): " + percent(frame.unbalance[0]) + " %, " +
+                "zero sequence unbalance (|V0| / |V1|): " + percent(frame.unbalance[1]) + " %"
+        ];
+    }
+});
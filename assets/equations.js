@@ -0,0 +1,30 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside);
+window.dash_clientside.equations = Object.assign({}, window.dash_clientside.equations, {
+    // values holds the three phase data rows, then the Clarke data, then the Park data
+    fill_tables: function (values) {
+        if (!values) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        // the three phase cells are padded to separate their columns
+        var paddedCount = 12;
+        return values.map(function (value, index) {
+            return value.toFixed(2) + (index < paddedCount ? "\u00A0\u00A0" : "");
+        });
+    },
+    // values holds the mean, RMS, ripple and THD of each channel
+    fill_statistics: function (values) {
+        if (!values) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        var statisticCount = 4;
+        return values.map(function (value, index) {
+            if (value === null) {
+                return "-";
+            }
+            if (index % statisticCount === statisticCount - 1) {
+                return (value * 100).toFixed(1) + " %\u00A0\u00A0";
+            }
+            return value.toFixed(3) + "\u00A0\u00A0";
+        });
+    }
+});
@@ -0,0 +1,13 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside);
+window.dash_clientside.session = Object.assign({}, window.dash_clientside.session, {
+    // gives the browser session a random id once, the server keeps a plot instance per id
+    create_id: function (timestamp, current) {
+        if (current) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        var random = function () {
+            return Math.random().toString(36).slice(2);
+        };
+        return Date.now().toString(36) + "-" + random() + random();
+    }
+});
@@ -0,0 +1,39 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside);
+window.dash_clientside.stream = Object.assign({}, window.dash_clientside.stream, {
+    // opens or closes the server-sent event stream, every frame restyles the plot in place
+    // the stream carries frames of this browser session's settings only
+    toggle: function (on, port, session) {
+        var stream = window.dash_clientside.stream;
+        if (stream.source) {
+            stream.source.close();
+            stream.source = null;
+        }
+        if (!on) {
+            return "";
+        }
+        if (!port) {
+            return "Live streaming is not enabled on the server (set CLARKE_PARK_STREAM_PORT).";
+        }
+        var url = window.location.protocol + "//" + window.location.hostname + ":" + port + "/stream";
+        url += "?session=" + encodeURIComponent(session || "");
+        stream.source = new EventSource(url);
+        stream.source.onmessage = function (event) {
+            var frame = JSON.parse(event.data);
+            var graph = document.querySelector("#scatter_plot .js-plotly-plot");
+            if (
+                !graph ||
+                !graph.data ||
+                graph.data.length !== frame.names.length ||
+                graph.data[0].type !== frame.type
+            ) {
+                return;
+            }
+            var update = { name: frame.names };
+            Object.keys(frame.traces).forEach(function (axis) {
+                update[axis] = frame.traces[axis];
+            });
+            Plotly.restyle(graph, update);
+        };
+        return "";
+    }
+});
@@ -6,15 +6,39 @@ of functions variables.
 Author: joe f.
 GitHub: https://github.com/joeferg425
 """
+import atexit
+import json
+import os
 from typing import Any
 import numpy as np
 import dash
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output, ClientsideFunction
+from dash.dependencies import ALL, Input, Output, State, ClientsideFunction
 from enum import IntEnum, Enum
 import dash_bootstrap_components as dbc
 import dash_daq as daq
+from clarke_park_analysis import ANALYSIS_CHANNELS, ANALYSIS_ORDERS, analyze_window, symmetrical_components
+from clarke_park_backends import BACKENDS
+from clarke_park_clientside import BROWSER_CONTROLS, get_compute_settings
+from clarke_park_events import EventIndex
+from clarke_park_fit import FIT_CYCLES, fit_recording, get_slider_values
+from clarke_park_jobs import register_job
+from clarke_park_lod import LodView
+from clarke_park_metrics import METRICS, NULL_TIMER
+from clarke_park_multiphase import (
+    add_harmonics,
+    get_clarke_matrix,
+    get_phase_shifts,
+    get_zero_sequence_offsets,
+)
+from clarke_park_profile import PROFILER
+from clarke_park_recording import CHANNEL_GROUPS, CHANNEL_INDEX, CHANNELS, RECORDING_PATH, Recording
+from clarke_park_scenarios import DEFAULT_SCENARIOS, compute_scenarios, format_scenario, parse_scenarios
+from clarke_park_sessions import SessionPool
+from clarke_park_shm import SHARED_FRAMES, SHARED_NAME
+from clarke_park_stats import STATISTICS, RollingStatistics
+from clarke_park_stream import BROADCASTER, STREAM_PORT, StreamProducer
 
 
 class AxisEnum(IntEnum):
@@ -82,6 +106,9 @@ class ColorEnum(Enum):
     ClarkeZ = "#22CC22"
     ParkD = "#F0E442"
     ParkQ = "#999999"
+    SequencePositive = "#117733"
+    SequenceNegative = "#882255"
+    SequenceZero = "#44AA99"
 
 
 class DashEnum(Enum):
@@ -146,30 +173,425 @@ app = dash.Dash(
 PHASE_COUNT = 3
 AXIS_COUNT = 3
 TWO_PI = 2 * np.pi
-_120 = TWO_PI * (1 / 3)
-_240 = TWO_PI * (2 / 3)
+PHASE_SHIFTS = get_phase_shifts(PHASE_COUNT)
+ZERO_SEQUENCE_OFFSETS = get_zero_sequence_offsets(PHASE_COUNT)
+HARMONIC_ORDERS = np.array([5, 7, 11, 13])
+# pattern matching id types of the per-phase harmonic inputs, see create_phase_harmonic_table
+PHASE_HARMONIC_AMPLITUDE = "phase_harmonic_amplitude"
+PHASE_HARMONIC_PHASE = "phase_harmonic_phase"
 margin = 1
 fig = None
 
+# axis titles of the 3D scene
+AXIS_TITLES = {
+    "x": "x (Time)",
+    "y": "y (Real)",
+    "z": "z (Imaginary)",
+}
+
+# rows of the spectrum plot: phases a, b and c, Clarke α and β, Park d and q
+SPECTRUM_ROWS = PHASE_COUNT + 2 + 2
+
+# numpy 2 transforms write into a preallocated output
+RFFT_OUT = np.lib.NumpyVersion(np.__version__) >= "2.0.0"
+
+# channels of the window statistics table
+STATISTICS_CHANNELS = ["Clarke α", "Clarke β", "Park d", "Park q"]
+
+# (horizontal, vertical) trace axes of the views that can be drawn as 2D plots
+FLAT_VIEW_AXES = {
+    FocusAxis.XY: ("x", "y"),
+    FocusAxis.XZ: ("x", "z"),
+    FocusAxis.YZ: ("y", "z"),
+}
+
+# camera position of each preset view
+CAMERA_PRESETS = {
+    FocusAxis.XY: {
+        "up": {
+            "x": 0.0,
+            "y": 0.5,
+            "z": 0.0,
+        },
+        "eye": {
+            "x": 0.0,
+            "y": 0.0,
+            "z": 2.0,
+        },
+    },
+    FocusAxis.XZ: {
+        "up": {
+            "x": 0.0,
+            "y": 0.0,
+            "z": 0.5,
+        },
+        "eye": {
+            "x": 0.0,
+            "y": -2.0,
+            "z": 0.0,
+        },
+    },
+    FocusAxis.YZ: {
+        "up": {
+            "x": 0.0,
+            "y": 0.5,
+            "z": 0.0,
+        },
+        "eye": {
+            "x": -2.0,
+            "y": 0.0,
+            "z": 0.0,
+        },
+    },
+    FocusAxis.XYZ: {
+        "up": {
+            "x": 0.0,
+            "y": 0.5,
+            "z": 0.0,
+        },
+        "eye": {
+            "x": 1.75,
+            "y": 1.75,
+            "z": 1.75,
+        },
+    },
+}
+
+# names and colors of recorded channels
+RECORDING_TRACES = {
+    "a": ("Phase A", ColorEnum.PhaseA),
+    "b": ("Phase B", ColorEnum.PhaseB),
+    "c": ("Phase C", ColorEnum.PhaseC),
+    "n": ("Neutral", ColorEnum.PhaseN),
+    "alpha": ("Clarke α", ColorEnum.ClarkeA),
+    "beta": ("Clarke β", ColorEnum.ClarkeB),
+    "zero": ("Clarke Zero", ColorEnum.ClarkeZ),
+    "d": ("Park d", ColorEnum.ParkD),
+    "q": ("Park q", ColorEnum.ParkQ),
+}
+
+METRICS.install(app.server)
+
+RECORDING_VIEW = LodView(Recording(RECORDING_PATH)) if RECORDING_PATH else None
+RECORDING_EVENTS = EventIndex(RECORDING_VIEW.recording) if RECORDING_VIEW is not None else None
+
+# events listed and marked on the time slider
+MAX_EVENTS = 200
+
+
+def create_trace(
+    name: str, x: Any, y: Any, z: Any, width: WidthEnum, dash_style: DashEnum, color: ColorEnum
+) -> dict:
+    """Create a plotly 3D line trace.
+
+    Args:
+        name: legend name
+        x: x values
+        y: y values
+        z: z values
+        width: line width
+        dash_style: line dash style
+        color: line color
+
+    Returns:
+        trace dictionary
+    """
+    return {
+        "x": x,
+        "y": y,
+        "z": z,
+        "type": "scatter3d",
+        "mode": "lines",
+        "name": name,
+        "line": {
+            "width": width.value,
+            "dash": dash_style.value,
+            "color": color.value,
+        },
+    }
+
+
+def create_recording_figure(window: dict, start: float, stop: float, cursor: float) -> dict:
+    """Create the figure of a recording window, one row of plots per channel group.
+
+    Args:
+        window: window returned by LodView.get_window
+        start: window start in seconds
+        stop: window stop in seconds
+        cursor: time of the time slider position in seconds
+
+    Returns:
+        figure dictionary
+    """
+    data = []
+    layout = {
+        "height": 700,
+        "uirevision": "recording",
+        "title": {
+            "text": "Raw samples"
+            if window["level"] < 0
+            else f"Minimum and maximum of every {window['block_size']} samples",
+        },
+        "xaxis": {"title": "Time (s)", "range": [start, stop]},
+        "margin": {"l": 60, "r": margin, "t": 40, "b": 60},
+        "plot_bgcolor": "rgba(0, 0, 0, 0)",
+        "paper_bgcolor": "rgba(0, 0, 0, 0)",
+        "shapes": [
+            {
+                "type": "line",
+                "xref": "x",
+                "yref": "paper",
+                "x0": cursor,
+                "x1": cursor,
+                "y0": 0,
+                "y1": 1,
+                "line": {"width": 1, "dash": "dot", "color": "#888888"},
+            }
+        ],
+    }
+    rows = len(CHANNEL_GROUPS)
+    for row, (group, channels) in enumerate(CHANNEL_GROUPS.items()):
+        axis = "y" if row == 0 else f"y{row + 1}"
+        bottom = (rows - 1 - row) / rows
+        layout["yaxis" if row == 0 else f"yaxis{row + 1}"] = {
+            "title": group,
+            "domain": [bottom + 0.02, bottom + 1 / rows - 0.02],
+        }
+        for channel in channels:
+            name, color = RECORDING_TRACES[channel]
+            data.append(
+                {
+                    "x": window["time"],
+                    "y": window["values"][CHANNEL_INDEX[channel]],
+                    "type": "scattergl",
+                    "mode": "lines",
+                    "name": name,
+                    "yaxis": axis,
+                    "line": {"width": 1, "color": color.value},
+                }
+            )
+    return {"data": data, "layout": layout}
+
+
+def create_analysis_figure(result: dict) -> dict:
+    """Create the spectrum figure of a recording window analysis.
+
+    Args:
+        result: analysis returned by analyze_window
+
+    Returns:
+        figure dictionary
+    """
+    data = [
+        {
+            "x": result["frequencies"],
+            "y": amplitudes,
+            "type": "scattergl",
+            "mode": "lines",
+            "name": RECORDING_TRACES[channel][0],
+            "line": {"width": 1, "color": RECORDING_TRACES[channel][1].value},
+        }
+        for channel, amplitudes in zip(ANALYSIS_CHANNELS, result["amplitudes"])
+    ]
+    layout = {
+        "height": 400,
+        "xaxis": {"title": "Frequency (Hz)"},
+        "yaxis": {"title": "Amplitude", "type": "log"},
+        "margin": {"l": 60, "r": margin, "t": margin, "b": 60},
+        "plot_bgcolor": "rgba(0, 0, 0, 0)",
+        "paper_bgcolor": "rgba(0, 0, 0, 0)",
+    }
+    return {"data": data, "layout": layout}
+
+
+def create_scenario_figure(names: list, result: dict, time_axis: np.ndarray) -> dict:
+    """Create the small multiples of a scenario comparison, a column of plots per scenario.
+
+    Rows hold the channel groups of the recording plot and share their y axis across the scenarios.
+
+    Args:
+        names: scenario names
+        result: scenarios returned by compute_scenarios
+        time_axis: x values of every plot
+
+    Returns:
+        figure dictionary
+    """
+    data = []
+    layout = {
+        "height": 700,
+        "uirevision": "scenarios",
+        "annotations": [],
+        "margin": {"l": 60, "r": margin, "t": 60, "b": 40},
+        "plot_bgcolor": "rgba(0, 0, 0, 0)",
+        "paper_bgcolor": "rgba(0, 0, 0, 0)",
+    }
+    rows = len(CHANNEL_GROUPS)
+    columns = len(names)
+    for column, name in enumerate(names):
+        left = column / columns
+        layout["annotations"].append(
+            {
+                "text": f"{name}<br>V2/V1 {result['negative'][column] * 100:0.1f} %, "
+                + f"V0/V1 {result['zero'][column] * 100:0.1f} %",
+                "x": left + 0.5 / columns,
+                "y": 1.0,
+                "xref": "paper",
+                "yref": "paper",
+                "xanchor": "center",
+                "yanchor": "bottom",
+                "showarrow": False,
+            }
+        )
+        for row, (group, channels) in enumerate(CHANNEL_GROUPS.items()):
+            number = row * columns + column + 1
+            suffix = "" if number == 1 else str(number)
+            bottom = (rows - 1 - row) / rows
+            layout[f"xaxis{suffix}"] = {
+                "domain": [left + 0.01, left + 1 / columns - 0.01],
+                "anchor": f"y{suffix}",
+                "showticklabels": row == rows - 1,
+            }
+            layout[f"yaxis{suffix}"] = {
+                "domain": [bottom + 0.02, bottom + 1 / rows - 0.02],
+                "anchor": f"x{suffix}",
+                "showticklabels": column == 0,
+            }
+            if number > 1:
+                layout[f"xaxis{suffix}"]["matches"] = "x"
+            if column == 0:
+                layout[f"yaxis{suffix}"]["title"] = group
+            else:
+                # every scenario of a row is drawn on the scale of the first
+                layout[f"yaxis{suffix}"]["matches"] = "y" if row == 0 else f"y{row * columns + 1}"
+            for channel in channels:
+                trace_name, color = RECORDING_TRACES[channel]
+                data.append(
+                    {
+                        "x": time_axis,
+                        "y": result["channels"][column, CHANNEL_INDEX[channel]],
+                        "type": "scattergl",
+                        "mode": "lines",
+                        "name": trace_name,
+                        "legendgroup": channel,
+                        "showlegend": column == 0,
+                        "xaxis": f"x{suffix}",
+                        "yaxis": f"y{suffix}",
+                        "line": {"width": 1, "color": color.value},
+                    }
+                )
+    return {"data": data, "layout": layout}
+
+
+def create_value_table(name: str, rows: int, columns: int) -> list:
+    """Create the table cells filled in by the equations clientside callback.
+
+    Args:
+        name: prefix of the cell ids, cells are named "<name>_<row>_<column>"
+        rows: number of rows
+        columns: number of columns
+
+    Returns:
+        list of table rows
+    """
+    return [
+        html.Tr([html.Td(id=f"{name}_{row}_{column}") for column in range(columns)]) for row in range(rows)
+    ]
+
+
+def set_harmonics(
+    amplitudes: np.ndarray,
+    offsets: np.ndarray,
+    harmonic_sliders: list,
+    phase_harmonic_amplitudes: Any = None,
+    phase_harmonic_phases: Any = None,
+) -> None:
+    """Set the harmonics of every phase from the harmonic sliders and the per-phase harmonic inputs.
+
+    Args:
+        amplitudes: amplitude of each harmonic of each phase, written in place, shape (phases, orders)
+        offsets: phase of each harmonic of each phase in units of pi, written in place, shape (phases, orders)
+        harmonic_sliders: amplitude of each harmonic order added to every phase
+        phase_harmonic_amplitudes: harmonic amplitude added to the sliders' for each phase and order, phase
+            major, None adds nothing
+        phase_harmonic_phases: harmonic phase in units of pi for each phase and order, phase major, None
+            keeps offsets
+    """
+    amplitudes[:] = harmonic_sliders
+    # empty inputs are None
+    if phase_harmonic_amplitudes is not None:
+        for index, value in enumerate(phase_harmonic_amplitudes):
+            amplitudes.flat[index] += value or 0
+    if phase_harmonic_phases is not None:
+        for index, value in enumerate(phase_harmonic_phases):
+            offsets.flat[index] = value or 0
+
+
+def create_phase_harmonic_table(phase_names: list, orders: np.ndarray) -> list:
+    """Create the inputs of the harmonic amplitude and phase of every phase.
+
+    The inputs are named {"type": PHASE_HARMONIC_AMPLITUDE or PHASE_HARMONIC_PHASE, "phase": <phase>, "order":
+    <order>}, phase major, so the values of each type arrive in the order of harmonic_amplitudes.
+
+    Args:
+        phase_names: name of each phase
+        orders: harmonic orders
+
+    Returns:
+        list of table rows
+    """
+    header = [html.Th("")] + [html.Th(f"{order}th amplitude / phase (\\( \\pi \\))") for order in orders]
+    rows = [html.Tr(header)]
+    for phase, name in enumerate(phase_names):
+        cells = [html.Td(name)]
+        for order in orders:
+            cells.append(
+                html.Td(
+                    [
+                        dcc.Input(
+                            id={"type": PHASE_HARMONIC_AMPLITUDE, "phase": phase, "order": int(order)},
+                            type="number",
+                            min=-0.5,
+                            max=0.5,
+                            step=0.01,
+                            value=0,
+                            debounce=True,
+                            style={"width": "45%"},
+                        ),
+                        dcc.Input(
+                            id={"type": PHASE_HARMONIC_PHASE, "phase": phase, "order": int(order)},
+                            type="number",
+                            min=-1,
+                            max=1,
+                            step=0.01,
+                            value=0,
+                            debounce=True,
+                            style={"width": "45%"},
+                        ),
+                    ]
+                )
+            )
+        rows.append(html.Tr(cells))
+    return rows
+
 
 class ClarkeParkExploration:
     """This class defines the controls and graphs of the Clarke and Park transforms."""
 
     INSTANCE: "ClarkeParkExploration"
+    # instance of each browser session, INSTANCE serves the updates that arrive before the session id
+    SESSIONS: SessionPool
 
-    def __init__(self) -> None:
-        """Create instance of class for use in plots and updates."""
+    def __init__(self, sample_count: int = 100, dtype: Any = np.float64) -> None:
+        """Create instance of class for use in plots and updates.
+
+        Args:
+            sample_count: number of samples along the time axis
+            dtype: floating point precision of the plotted data
+        """
         self.frequency: float = 1.0
-        self.sample_count: int = 100
+        self.sample_count: int = sample_count
         self.slider_count: int = 100
-        self.three_phase_data: np.ndarray = np.ones((PHASE_COUNT + 1, AXIS_COUNT, self.sample_count))
-        self.three_phase_data[:, :] *= np.linspace(0, 1, self.sample_count)
-        self.clarke_data: np.ndarray = np.ones((PHASE_COUNT, self.sample_count))
-        self.park_data: np.ndarray = np.ones((AXIS_COUNT, self.sample_count))
-        self.zeros = np.zeros((self.sample_count))
-        self.ones = np.zeros((self.sample_count))
-        self.zeros3 = np.zeros((3, self.sample_count))
-        self.ones3 = np.zeros((3, self.sample_count))
         self.height = 800
         self.width = self.height * 1.25
         self.zero_sequence = 0.0
@@ -184,20 +606,93 @@ class ClarkeParkExploration:
         self.phaseA_amplitude = 0
         self.phaseB_amplitude = 0
         self.phaseC_amplitude = 0
+        # harmonic amplitudes and offsets (in units of pi) for each phase and HARMONIC_ORDERS entry
+        self.harmonic_amplitudes: np.ndarray = np.zeros((PHASE_COUNT, len(HARMONIC_ORDERS)))
+        self.harmonic_offsets: np.ndarray = np.zeros((PHASE_COUNT, len(HARMONIC_ORDERS)))
         self.changed_id: Any = None
         self.focus_selection: FocusAxis = FocusAxis.XYZ
-        self.time = np.linspace(0, -1, self.sample_count)
+        self.webgl_2d = False
+        self.stage_timer: Any = NULL_TIMER
+
+        self.allocate_workspace(self.sample_count, dtype)
 
-        self.first = True
+    def allocate_workspace(self, sample_count: int, dtype: Any = np.float64) -> None:
+        """Allocate every array used by the update path.
+
+        The arrays are sized once by sample count and reused by every update, all
+        per-update math writes into them using ufunc "out" arguments.
+
+        Args:
+            sample_count: number of samples along the time axis
+            dtype: floating point precision of the plotted data
+        """
+        self.sample_count = sample_count
+        self.dtype = np.dtype(dtype)
 
         # Clarke transform
-        self.clarke_matrix = (2 / 3) * np.array(
-            [
-                [1, -(1 / 2), -(1 / 2)],
-                [0, (np.sqrt(3) / 2), -(np.sqrt(3) / 2)],
-                [(1 / 2), (1 / 2), (1 / 2)],
-            ]
+        self.clarke_matrix = get_clarke_matrix(PHASE_COUNT).astype(self.dtype)
+
+        self.three_phase_data: np.ndarray = np.ones(
+            (PHASE_COUNT + 1, AXIS_COUNT, self.sample_count), dtype=self.dtype
         )
+        self.three_phase_data[:, :] *= np.linspace(0, 1, self.sample_count, dtype=self.dtype)
+        self.clarke_data: np.ndarray = np.ones((PHASE_COUNT, self.sample_count), dtype=self.dtype)
+        self.park_data: np.ndarray = np.ones((AXIS_COUNT, self.sample_count), dtype=self.dtype)
+        self.zeros = np.zeros((self.sample_count), dtype=self.dtype)
+        self.ones = np.zeros((self.sample_count), dtype=self.dtype)
+        self.zeros3 = np.zeros((3, self.sample_count), dtype=self.dtype)
+        self.ones3 = np.zeros((3, self.sample_count), dtype=self.dtype)
+        self.time = np.linspace(0, -1, self.sample_count, dtype=self.dtype)
+
+        # scratch space for the generator and transforms
+        self.time_plus_offset: np.ndarray = np.empty((self.sample_count), dtype=self.dtype)
+        self.angle: np.ndarray = np.empty((self.sample_count), dtype=self.dtype)
+        self.phase_angle: np.ndarray = np.empty((PHASE_COUNT, self.sample_count), dtype=self.dtype)
+        self.park_product: np.ndarray = np.empty(
+            (AXIS_COUNT, AXIS_COUNT, self.sample_count), dtype=self.dtype
+        )
+        harmonic_shape = (PHASE_COUNT, len(HARMONIC_ORDERS), self.sample_count)
+        self.harmonic_angle: np.ndarray = np.empty(harmonic_shape, dtype=self.dtype)
+        self.harmonic_trig: np.ndarray = np.empty(harmonic_shape, dtype=self.dtype)
+        self.harmonic_wave: np.ndarray = np.empty((PHASE_COUNT, self.sample_count), dtype=self.dtype)
+        self.equation_values: np.ndarray = np.zeros(
+            ((PHASE_COUNT + 1) * AXIS_COUNT + PHASE_COUNT + AXIS_COUNT)
+        )
+        # Park d/q vectors rotated back into the three phase frame for plotting
+        self.park_rotated: np.ndarray = np.zeros((2, AXIS_COUNT, self.sample_count), dtype=self.dtype)
+        # phases as complex phasors and their zero, positive and negative sequence components
+        self.phasors: np.ndarray = np.zeros((PHASE_COUNT, self.sample_count), dtype=np.complex128)
+        self.sequence_phasors: np.ndarray = np.zeros((PHASE_COUNT, self.sample_count), dtype=np.complex128)
+        self.sequence_data: np.ndarray = np.zeros(
+            (PHASE_COUNT, AXIS_COUNT, self.sample_count), dtype=self.dtype
+        )
+        self.sequence_data[:, AxisEnum.X, :] = self.three_phase_data[PhaseEnum.A, AxisEnum.X, :]
+        self.unbalance = (0.0, 0.0)
+        # per phase generator settings passed to the generate kernel
+        self.phase_amplitudes: np.ndarray = np.zeros((PHASE_COUNT), dtype=self.dtype)
+        self.phase_shifts: np.ndarray = np.zeros((PHASE_COUNT), dtype=self.dtype)
+        self.zero_sequence_y: np.ndarray = np.zeros((PHASE_COUNT), dtype=self.dtype)
+        self.zero_sequence_z: np.ndarray = np.zeros((PHASE_COUNT), dtype=self.dtype)
+        self.harmonic_shifts: np.ndarray = np.zeros((PHASE_COUNT, len(HARMONIC_ORDERS)))
+        # power of the zero, positive and negative sequence components
+        self.sequence_power: np.ndarray = np.zeros(PHASE_COUNT)
+        # spectrum of the abc, αβ and dq channels, one Hann windowed transform of the whole plot
+        bins = self.sample_count // 2 + 1
+        self.spectrum_window: np.ndarray = np.hanning(self.sample_count)
+        self.spectrum_signals: np.ndarray = np.zeros((SPECTRUM_ROWS, self.sample_count))
+        self.spectrum_bins: np.ndarray = np.zeros((SPECTRUM_ROWS, bins), dtype=np.complex128)
+        self.spectrum_amplitudes: np.ndarray = np.zeros((SPECTRUM_ROWS, bins))
+        # the time axis spans one second
+        sample_rate = max(1, self.sample_count - 1)
+        self.spectrum_frequencies: np.ndarray = np.fft.rfftfreq(self.sample_count, 1 / sample_rate)
+        self.spectrum_orders: np.ndarray = np.zeros(bins)
+        # sliding window statistics of α, β, d and q, the window is replaced by every update
+        self.statistics_signals: np.ndarray = np.zeros((len(STATISTICS_CHANNELS), self.sample_count))
+        self.statistics = RollingStatistics(self.sample_count, np.zeros(len(STATISTICS_CHANNELS)))
+        self.statistics_values: np.ndarray = np.zeros((len(STATISTICS_CHANNELS), len(STATISTICS)))
+
+        # compute kernels of the fastest conforming backend for this workspace
+        self.kernels = BACKENDS.select(self.sample_count, self.dtype)
 
         # Park Transform
         self.park_matrix = np.array(
@@ -220,50 +715,58 @@ class ClarkeParkExploration:
             ]
         )
 
-        ClarkeParkExploration.INSTANCE = self
+        self.build_figure_template()
+        self.build_spectrum_template()
 
     def generate_three_phase_data(self) -> None:
-        """Create three 3D helixes 120 degrees offset from each other."""
-        self.time_plus_offset = self.time + self.time_offset
+        """Create three 3D helixes 120 degrees offset from each other.
 
-        self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :] = self.phaseA_amplitude * np.cos(
-            self.frequency * TWO_PI * self.time_plus_offset + (self.phaseA_offset * np.pi)
-        )
-        self.three_phase_data[PhaseEnum.A, AxisEnum.Z, :] = self.phaseA_amplitude * np.sin(
-            self.frequency * TWO_PI * self.time_plus_offset + (self.phaseA_offset * np.pi)
-        )
-
-        self.three_phase_data[PhaseEnum.B, AxisEnum.Y, :] = (
-            self.phaseB_amplitude
-            * np.cos(self.frequency * TWO_PI * self.time_plus_offset + (self.phaseB_offset * np.pi) - _120)
-            - np.cos(_120) * self.zero_sequence
-        )
-        self.three_phase_data[PhaseEnum.B, AxisEnum.Z, :] = (
-            self.phaseB_amplitude
-            * np.sin(self.frequency * TWO_PI * self.time_plus_offset + (self.phaseB_offset * np.pi) - _120)
-            - np.sin(_120) * self.zero_sequence
+        Every phase is computed at once over the (phases, samples) arrays, see clarke_park_multiphase.
+        Harmonics are added to each phase from harmonic_amplitudes and harmonic_offsets, harmonic n of a phase
+        is shifted by n times the phase shift, so the 5th is negative and the 7th positive sequence.
+        """
+        np.add(self.time, self.time_offset, out=self.time_plus_offset)
+        np.multiply(self.time_plus_offset, self.frequency * TWO_PI, out=self.angle)
+
+        self.phase_amplitudes[PhaseEnum.A] = self.phaseA_amplitude
+        self.phase_amplitudes[PhaseEnum.B] = self.phaseB_amplitude
+        self.phase_amplitudes[PhaseEnum.C] = self.phaseC_amplitude
+        self.phase_shifts[PhaseEnum.A] = self.phaseA_offset
+        self.phase_shifts[PhaseEnum.B] = self.phaseB_offset
+        self.phase_shifts[PhaseEnum.C] = self.phaseC_offset
+        self.phase_shifts *= np.pi
+        self.phase_shifts += PHASE_SHIFTS
+        np.multiply(ZERO_SEQUENCE_OFFSETS.real, self.zero_sequence, out=self.zero_sequence_y)
+        np.multiply(ZERO_SEQUENCE_OFFSETS.imag, self.zero_sequence, out=self.zero_sequence_z)
+        self.kernels["generate"](
+            self.angle,
+            self.phase_amplitudes,
+            self.phase_shifts,
+            self.zero_sequence_y,
+            self.zero_sequence_z,
+            self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Y, :],
+            self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Z, :],
         )
 
-        self.three_phase_data[PhaseEnum.C, AxisEnum.Y, :] = (
-            self.phaseC_amplitude
-            * np.cos(self.frequency * TWO_PI * self.time_plus_offset + (self.phaseC_offset * np.pi) + _120)
-            - np.cos(_240) * self.zero_sequence
-        )
-        self.three_phase_data[PhaseEnum.C, AxisEnum.Z, :] = (
-            self.phaseC_amplitude
-            * np.sin(self.frequency * TWO_PI * self.time_plus_offset + (self.phaseC_offset * np.pi) + _120)
-            - np.sin(_240) * self.zero_sequence
-        )
+        if self.harmonic_amplitudes.any():
+            np.add(self.angle, self.phase_shifts[:, np.newaxis], out=self.phase_angle)
+            np.multiply(self.harmonic_offsets, np.pi, out=self.harmonic_shifts)
+            add_harmonics(
+                self.phase_angle,
+                HARMONIC_ORDERS,
+                self.harmonic_amplitudes,
+                self.harmonic_shifts,
+                self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Y, :],
+                self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Z, :],
+                self.harmonic_angle,
+                self.harmonic_trig,
+                self.harmonic_wave,
+            )
 
-        self.three_phase_data[PhaseEnum.N, AxisEnum.Y, :] = (
-            self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :]
-            + self.three_phase_data[PhaseEnum.B, AxisEnum.Y, :]
-            + self.three_phase_data[PhaseEnum.C, AxisEnum.Y, :]
-        )
-        self.three_phase_data[PhaseEnum.N, AxisEnum.Z, :] = (
-            self.three_phase_data[PhaseEnum.A, AxisEnum.Z, :]
-            + self.three_phase_data[PhaseEnum.B, AxisEnum.Z, :]
-            + self.three_phase_data[PhaseEnum.C, AxisEnum.Z, :]
+        np.sum(
+            self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Y :, :],
+            axis=0,
+            out=self.three_phase_data[PhaseEnum.N, AxisEnum.Y :, :],
         )
 
     def do_clarke_transform(self):
@@ -273,15 +776,10 @@ class ClarkeParkExploration:
         https://www.mathworks.com/help/physmod/sps/ref/clarketransform.html
         """
         # Clarke transform function
-        self.clarke_data[:, :] = np.dot(
+        self.kernels["clarke"](
             self.clarke_matrix,
-            np.array(
-                [
-                    self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :],
-                    self.three_phase_data[PhaseEnum.B, AxisEnum.Y, :],
-                    self.three_phase_data[PhaseEnum.C, AxisEnum.Y, :],
-                ]
-            ),
+            self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Y, :],
+            self.clarke_data,
         )
 
     def do_park_transform(self) -> None:
@@ -292,469 +790,457 @@ class ClarkeParkExploration:
         """
         # create Park transformation matrix, with reference based on enum value
         self.park_matrix[0, 0, :] = self.three_phase_data[PhaseEnum.A, AxisEnum.Z, :]
-        self.park_matrix[1, 0, :] = -self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :]
+        self.park_matrix[1, 0, :] = self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :]
+        self.park_matrix[1, 0, :] *= -1
         self.park_matrix[0, 1, :] = self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :]
         self.park_matrix[1, 1, :] = self.three_phase_data[PhaseEnum.A, AxisEnum.Z, :]
 
-        # perform the matrix math
-        self.park_data = np.einsum(
-            "ijk,ik->jk",
-            self.park_matrix,
-            self.clarke_data,
+        # perform the matrix math, equivalent to einsum("ijk,ik->jk") without a new result array
+        self.kernels["park"](self.park_matrix, self.clarke_data, self.park_data, self.park_product)
+
+    def rotate_park_data(self) -> None:
+        """Rotate Park d/q values by the phase A reference angle for plotting."""
+        reference = self.frequency * TWO_PI * self.time_plus_offset[0] + (self.phaseA_offset * np.pi)
+        for axis, angle in ((ParkEnum.D, reference + (np.pi / 2)), (ParkEnum.Q, reference)):
+            np.multiply(self.park_data[axis, :], np.cos(angle), out=self.park_rotated[axis, AxisEnum.Y, :])
+            np.multiply(self.park_data[axis, :], np.sin(angle), out=self.park_rotated[axis, AxisEnum.Z, :])
+
+    def do_symmetrical_components(self) -> None:
+        """Split the three phases into zero, positive and negative sequence components.
+
+        https://en.wikipedia.org/wiki/Symmetrical_components
+        """
+        self.phasors.real = self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Y, :]
+        self.phasors.imag = self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Z, :]
+        symmetrical_components(self.phasors, out=self.sequence_phasors)
+        self.sequence_data[:, AxisEnum.Y, :] = self.sequence_phasors.real
+        self.sequence_data[:, AxisEnum.Z, :] = self.sequence_phasors.imag
+        # unbalance_factors of the components already computed, without decomposing the phases again
+        # |z|^2 summed over the real and imaginary parts viewed as pairs of floats
+        parts = self.sequence_phasors.view(np.float64)
+        power = np.einsum("ij,ij->i", parts, parts, out=self.sequence_power)
+        positive = np.sqrt(power[1])
+        if positive > 0:
+            self.unbalance = (float(np.sqrt(power[2]) / positive), float(np.sqrt(power[0]) / positive))
+        else:
+            self.unbalance = (0.0, 0.0)
+
+    def get_unbalance_label(self) -> str:
+        """Get the unbalance factor readout.
+
+        Returns:
+            negative and zero sequence unbalance factors in percent
+        """
+        negative, zero = self.unbalance
+        return (
+            f"Negative sequence unbalance (|V2| / |V1|): {negative * 100:0.1f} %, "
+            + f"zero sequence unbalance (|V0| / |V1|): {zero * 100:0.1f} %"
         )
 
-    def generate_figure_data(self) -> None:
-        """Create plotly data structure used to update web page in callback."""
-        self.generate_three_phase_data()
-        self.do_clarke_transform()
-        self.do_park_transform()
-        mmax1 = np.max(self.three_phase_data)
-        mmax2 = np.max(self.clarke_data)
-        mmax3 = np.max(self.park_data)
-        mmin1 = np.min(self.three_phase_data)
-        mmin2 = np.min(self.clarke_data)
-        mmin3 = np.min(self.park_data)
-        mmax = np.max([mmax1, mmax2, mmax3, -mmin1, -mmin2, -mmin3])
-        ticks = [-mmax, mmax]
-        self.figure_data = {
-            "data": [
-                {
-                    "x": [0, 1],
-                    "y": ticks,
-                    "z": ticks,
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "fixed_xyz_range",
-                    "line": {
-                        "width": 0,
-                        "color": "rgba(0,0,0,0)",
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.A, AxisEnum.X, :],
-                    "y": self.three_phase_data[PhaseEnum.A, AxisEnum.Y, :],
-                    "z": self.three_phase_data[PhaseEnum.A, AxisEnum.Z, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Phase A (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseA.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.B, AxisEnum.X, :],
-                    "y": self.three_phase_data[PhaseEnum.B, AxisEnum.Y, :],
-                    "z": self.three_phase_data[PhaseEnum.B, AxisEnum.Z, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Phase B (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseB.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.C, AxisEnum.X, :],
-                    "y": self.three_phase_data[PhaseEnum.C, AxisEnum.Y, :],
-                    "z": self.three_phase_data[PhaseEnum.C, AxisEnum.Z, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Phase C (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseC.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.N, AxisEnum.X, :],
-                    "y": self.three_phase_data[PhaseEnum.N, AxisEnum.Y, :],
-                    "z": self.three_phase_data[PhaseEnum.N, AxisEnum.Z, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Neutral (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseN.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [
-                        0,
-                        self.three_phase_data[PhaseEnum.A, AxisEnum.Y, 0],
-                    ],
-                    "z": [
-                        0,
-                        self.three_phase_data[PhaseEnum.A, AxisEnum.Z, 0],
-                    ],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Phase A({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Phasor.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseA.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [
-                        0,
-                        self.three_phase_data[PhaseEnum.B, AxisEnum.Y, 0],
-                    ],
-                    "z": [
-                        0,
-                        self.three_phase_data[PhaseEnum.B, AxisEnum.Z, 0],
-                    ],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Phase B({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Phasor.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseB.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [
-                        0,
-                        self.three_phase_data[PhaseEnum.C, AxisEnum.Y, 0],
-                    ],
-                    "z": [
-                        0,
-                        self.three_phase_data[PhaseEnum.C, AxisEnum.Z, 0],
-                    ],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Phase C({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Phasor.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseC.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [
-                        0,
-                        self.three_phase_data[PhaseEnum.N, AxisEnum.Y, 0],
-                    ],
-                    "z": [
-                        0,
-                        self.three_phase_data[PhaseEnum.N, AxisEnum.Z, 0],
-                    ],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Neutral ({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Clarke.value,
-                        "dash": DashEnum.Normal.value,
-                        "color": ColorEnum.PhaseN.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.A, AxisEnum.X, :],
-                    "y": self.clarke_data[ClarkeEnum.A, :],
-                    "z": self.zeros,
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Clarke α (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Clarke.value,
-                        "color": ColorEnum.ClarkeA.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.A, AxisEnum.X, :],
-                    "y": self.zeros,
-                    "z": self.clarke_data[ClarkeEnum.B, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Clarke β (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Clarke.value,
-                        "color": ColorEnum.ClarkeB.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.A, AxisEnum.X, :],
-                    "y": self.clarke_data[ClarkeEnum.Z, :],
-                    "z": self.clarke_data[ClarkeEnum.Z, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Clarke Zero (t)",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Clarke.value,
-                        "color": ColorEnum.ClarkeZ.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [0, self.clarke_data[ClarkeEnum.A, 0]],
-                    "z": [0, 0],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Clarke α ({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Clarke.value,
-                        "dash": DashEnum.Clarke.value,
-                        "color": ColorEnum.ClarkeA.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [0, 0],
-                    "z": [0, self.clarke_data[ClarkeEnum.B, 0]],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Clarke β ({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Clarke.value,
-                        "dash": DashEnum.Clarke.value,
-                        "color": ColorEnum.ClarkeB.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [0, self.clarke_data[ClarkeEnum.Z, 0]],
-                    "z": [0, self.clarke_data[ClarkeEnum.Z, 0]],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Clarke Zero ({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Time.value,
-                        "dash": DashEnum.Clarke.value,
-                        "color": ColorEnum.ClarkeZ.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.A, AxisEnum.X, :],
-                    "y": np.cos(
-                        self.frequency * TWO_PI * self.time_plus_offset[0]
-                        + (self.phaseA_offset * np.pi)
-                        + (np.pi / 2)
-                    )
-                    * self.park_data[ParkEnum.D, :],
-                    "z": np.sin(
-                        self.frequency * TWO_PI * self.time_plus_offset[0]
-                        + (self.phaseA_offset * np.pi)
-                        + (np.pi / 2)
-                    )
-                    * self.park_data[ParkEnum.D, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Park d (t)",
-                    "line": {
-                        "width": WidthEnum.Park.value,
-                        "dash": DashEnum.Park.value,
-                        "color": ColorEnum.ParkD.value,
-                    },
-                },
-                {
-                    "x": self.three_phase_data[PhaseEnum.A, AxisEnum.X, :],
-                    "y": np.cos(
-                        self.frequency * TWO_PI * self.time_plus_offset[0] + (self.phaseA_offset * np.pi)
-                    )
-                    * self.park_data[ParkEnum.Q, :],
-                    "z": np.sin(
-                        self.frequency * TWO_PI * self.time_plus_offset[0] + (self.phaseA_offset * np.pi)
-                    )
-                    * self.park_data[ParkEnum.Q, :],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": "Park q (t)",
-                    "line": {
-                        "width": WidthEnum.Park.value,
-                        "dash": DashEnum.Park.value,
-                        "color": ColorEnum.ParkQ.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [
-                        0,
-                        np.cos(
-                            self.frequency * TWO_PI * self.time_plus_offset[0]
-                            + (self.phaseA_offset * np.pi)
-                            + (np.pi / 2)
-                        )
-                        * self.park_data[ParkEnum.D, 0],
-                    ],
-                    "z": [
-                        0,
-                        np.sin(
-                            self.frequency * TWO_PI * self.time_plus_offset[0]
-                            + (self.phaseA_offset * np.pi)
-                            + (np.pi / 2)
-                        )
-                        * self.park_data[ParkEnum.D, 0],
-                    ],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Park d ({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Park.value,
-                        "dash": DashEnum.Park.value,
-                        "color": ColorEnum.ParkD.value,
-                    },
-                },
-                {
-                    "x": [0, 0],
-                    "y": [
-                        0,
-                        np.cos(
-                            self.frequency * TWO_PI * self.time_plus_offset[0] + (self.phaseA_offset * np.pi)
-                        )
-                        * self.park_data[ParkEnum.Q, 0],
-                    ],
-                    "z": [
-                        0,
-                        np.sin(
-                            self.frequency * TWO_PI * self.time_plus_offset[0] + (self.phaseA_offset * np.pi)
-                        )
-                        * self.park_data[ParkEnum.Q, 0],
-                    ],
-                    "type": "scatter3d",
-                    "mode": "lines",
-                    "name": f"Park q ({self.time_offset:0.2f})",
-                    "line": {
-                        "width": WidthEnum.Park.value,
-                        "dash": DashEnum.Park.value,
-                        "color": ColorEnum.ParkQ.value,
-                    },
+    def build_figure_template(self) -> None:
+        """Create the plotly data structures once for the current workspace.
+
+        Traces reference the workspace arrays directly, so updates only fill in the phasor end points,
+        the names, the axis range and the camera.
+        """
+        time_axis = self.three_phase_data[PhaseEnum.A, AxisEnum.X, :]
+        self.range_ticks = [-1.0, 1.0]
+        data = [
+            {
+                "x": [0, 1],
+                "y": self.range_ticks,
+                "z": self.range_ticks,
+                "type": "scatter3d",
+                "mode": "lines",
+                "name": "fixed_xyz_range",
+                "line": {
+                    "width": 0,
+                    "color": "rgba(0,0,0,0)",
                 },
-            ],
+            },
+        ]
+        self.phasor_slots: list = []
+
+        def add_phasor(name, y_source, z_source, width, dash_style, color):
+            # end points are copied from the first sample of each source, None sources stay at 0
+            trace = create_trace(name, [0, 0], [0, 0.0], [0, 0.0], width, dash_style, color)
+            data.append(trace)
+            self.phasor_slots.append((trace, name, y_source, z_source))
+
+        phases = [
+            (PhaseEnum.A, "Phase A", ColorEnum.PhaseA),
+            (PhaseEnum.B, "Phase B", ColorEnum.PhaseB),
+            (PhaseEnum.C, "Phase C", ColorEnum.PhaseC),
+            (PhaseEnum.N, "Neutral", ColorEnum.PhaseN),
+        ]
+        for phase, name, color in phases:
+            data.append(
+                create_trace(
+                    f"{name} (t)",
+                    self.three_phase_data[phase, AxisEnum.X, :],
+                    self.three_phase_data[phase, AxisEnum.Y, :],
+                    self.three_phase_data[phase, AxisEnum.Z, :],
+                    WidthEnum.Time,
+                    DashEnum.Normal,
+                    color,
+                )
+            )
+        for phase, name, color in phases:
+            add_phasor(
+                f"{name}(" if phase != PhaseEnum.N else f"{name} (",
+                self.three_phase_data[phase, AxisEnum.Y, :],
+                self.three_phase_data[phase, AxisEnum.Z, :],
+                WidthEnum.Phasor if phase != PhaseEnum.N else WidthEnum.Clarke,
+                DashEnum.Normal,
+                color,
+            )
+
+        clarke_alpha = self.clarke_data[ClarkeEnum.A, :]
+        clarke_beta = self.clarke_data[ClarkeEnum.B, :]
+        clarke_zero = self.clarke_data[ClarkeEnum.Z, :]
+        data.append(
+            create_trace(
+                "Clarke α (t)",
+                time_axis,
+                clarke_alpha,
+                self.zeros,
+                WidthEnum.Time,
+                DashEnum.Clarke,
+                ColorEnum.ClarkeA,
+            )
+        )
+        data.append(
+            create_trace(
+                "Clarke β (t)",
+                time_axis,
+                self.zeros,
+                clarke_beta,
+                WidthEnum.Time,
+                DashEnum.Clarke,
+                ColorEnum.ClarkeB,
+            )
+        )
+        data.append(
+            create_trace(
+                "Clarke Zero (t)",
+                time_axis,
+                clarke_zero,
+                clarke_zero,
+                WidthEnum.Time,
+                DashEnum.Clarke,
+                ColorEnum.ClarkeZ,
+            )
+        )
+        add_phasor("Clarke α (", clarke_alpha, None, WidthEnum.Clarke, DashEnum.Clarke, ColorEnum.ClarkeA)
+        add_phasor("Clarke β (", None, clarke_beta, WidthEnum.Clarke, DashEnum.Clarke, ColorEnum.ClarkeB)
+        add_phasor(
+            "Clarke Zero (", clarke_zero, clarke_zero, WidthEnum.Time, DashEnum.Clarke, ColorEnum.ClarkeZ
+        )
+
+        park_axes = [(ParkEnum.D, "Park d", ColorEnum.ParkD), (ParkEnum.Q, "Park q", ColorEnum.ParkQ)]
+        for axis, name, color in park_axes:
+            data.append(
+                create_trace(
+                    f"{name} (t)",
+                    time_axis,
+                    self.park_rotated[axis, AxisEnum.Y, :],
+                    self.park_rotated[axis, AxisEnum.Z, :],
+                    WidthEnum.Park,
+                    DashEnum.Park,
+                    color,
+                )
+            )
+        for axis, name, color in park_axes:
+            add_phasor(
+                f"{name} (",
+                self.park_rotated[axis, AxisEnum.Y, :],
+                self.park_rotated[axis, AxisEnum.Z, :],
+                WidthEnum.Park,
+                DashEnum.Park,
+                color,
+            )
+
+        sequences = [
+            (1, "Positive Sequence", ColorEnum.SequencePositive),
+            (2, "Negative Sequence", ColorEnum.SequenceNegative),
+            (0, "Zero Sequence", ColorEnum.SequenceZero),
+        ]
+        for sequence, name, color in sequences:
+            trace = create_trace(
+                f"{name} (t)",
+                time_axis,
+                self.sequence_data[sequence, AxisEnum.Y, :],
+                self.sequence_data[sequence, AxisEnum.Z, :],
+                WidthEnum.Time,
+                DashEnum.Normal,
+                color,
+            )
+            # hidden until picked in the legend
+            trace["visible"] = "legendonly"
+            data.append(trace)
+
+        self.figure_data = {
+            "data": data,
             "layout": {
                 "scene": {
                     "xaxis": {
-                        "title": "x (Time)",
+                        "title": AXIS_TITLES["x"],
                         "tickvals": [-1, 0, 1],
                     },
                     "yaxis": {
-                        "title": "y (Real)",
+                        "title": AXIS_TITLES["y"],
                         "tickvals": [-1, 0, 1],
                     },
                     "zaxis": {
-                        "title": "z (Imaginary)",
+                        "title": AXIS_TITLES["z"],
                         "tickvals": [-1, 0, 1],
                     },
+                    "aspectmode": "manual",
+                    "aspectratio": {
+                        "x": 1,
+                        "y": 1,
+                        "z": 1,
+                    },
                 },
                 "plot_bgcolor": "rgba(0, 0, 0, 0)",
                 "paper_bgcolor": "rgba(0, 0, 0, 0)",
+                "uirevision": 1,
+                "height": self.height,
+                "width": self.width,
+                "scene_aspectmode": "cube",
+                "autosize": False,
+                "margin": {
+                    "l": margin,
+                    "r": margin,
+                    "t": margin,
+                    "b": margin,
+                },
             },
         }
-        if self.first is False:
-            self.figure_data["layout"]["uirevision"] = 1
-            self.figure_data["layout"]["scene"]["aspectratio"] = {
-                "x": 1,
-                "y": 1,
-                "z": 1,
-            }
-            self.figure_data["layout"]["height"] = self.height
-            self.figure_data["layout"]["width"] = self.width
-            self.figure_data["layout"]["margin"] = {
-                "l": margin,
-                "r": margin,
-                "t": margin,
-                "b": margin,
-            }
 
-        else:
-            self.first = False
-            self.figure_data["layout"]["uirevision"] = 1
-            self.figure_data["layout"]["height"] = self.height
-            self.figure_data["layout"]["width"] = self.width
-            self.figure_data["layout"]["scene_aspectmode"] = "cube"
-            self.figure_data["layout"]["autosize"] = False
-            self.figure_data["layout"]["scene"]["aspectmode"] = "manual"
-            self.figure_data["layout"]["scene"]["aspectratio"] = {
-                "x": 1,
-                "y": 1,
-                "z": 1,
-            }
-            self.figure_data["layout"]["margin"] = {
-                "l": margin,
-                "r": margin,
-                "t": margin,
-                "b": margin,
+        # one camera per preset view, sharing the projection setting
+        self.camera_projection = {"type": self.projection}
+        self.cameras = {
+            focus: {
+                "up": dict(preset["up"]),
+                "eye": dict(preset["eye"]),
+                "projection": self.camera_projection,
             }
+            for focus, preset in CAMERA_PRESETS.items()
+        }
 
-        if self.focus_selection == FocusAxis.XY:
-            self.figure_data["layout"]["scene"]["camera"] = {
-                "up": {
-                    "x": 0.0,
-                    "y": 0.5,
-                    "z": 0.0,
-                },
-                "eye": {
-                    "x": 0.0,
-                    "y": 0.0,
-                    "z": 2.0,
-                },
-            }
-        elif self.focus_selection == FocusAxis.XZ:
-            self.figure_data["layout"]["scene"]["camera"] = {
-                "up": {
-                    "x": 0.0,
-                    "y": 0.0,
-                    "z": 0.5,
-                },
-                "eye": {
-                    "x": 0.0,
-                    "y": -2.0,
-                    "z": 0.0,
-                },
-            }
-        elif self.focus_selection == FocusAxis.YZ:
-            self.figure_data["layout"]["scene"]["camera"] = {
-                "up": {
-                    "x": 0.0,
-                    "y": 0.5,
-                    "z": 0.0,
-                },
-                "eye": {
-                    "x": -2.0,
-                    "y": 0.0,
-                    "z": 0.0,
+        # 2D WebGL figures of the planar views, sharing the data of the 3D traces
+        self.flat_figures = {}
+        for focus, (horizontal, vertical) in FLAT_VIEW_AXES.items():
+            self.flat_figures[focus] = {
+                "data": [
+                    {
+                        "x": trace[horizontal],
+                        "y": trace[vertical],
+                        "type": "scattergl",
+                        "mode": "lines",
+                        "name": trace["name"],
+                        "line": trace["line"],
+                        "visible": trace.get("visible", True),
+                    }
+                    for trace in data
+                ],
+                "layout": {
+                    "xaxis": {"title": AXIS_TITLES[horizontal], "zeroline": True},
+                    "yaxis": {"title": AXIS_TITLES[vertical], "zeroline": True},
+                    "plot_bgcolor": "rgba(0, 0, 0, 0)",
+                    "paper_bgcolor": "rgba(0, 0, 0, 0)",
+                    "uirevision": focus,
+                    "height": self.height,
+                    "width": self.width,
+                    "autosize": False,
+                    "margin": {
+                        "l": margin,
+                        "r": margin,
+                        "t": margin,
+                        "b": margin,
+                    },
                 },
             }
-        elif self.focus_selection == FocusAxis.XYZ:
-            self.figure_data["layout"]["scene"]["camera"] = {
-                "up": {
-                    "x": 0.0,
-                    "y": 0.5,
-                    "z": 0.0,
+        # keep the polar view round
+        self.flat_figures[FocusAxis.YZ]["layout"]["yaxis"]["scaleanchor"] = "x"
+
+    def generate_figure_data(self) -> None:
+        """Update plotly data structure used to update web page in callback."""
+        self.generate_three_phase_data()
+        self.do_clarke_transform()
+        self.do_park_transform()
+        self.rotate_park_data()
+        self.do_symmetrical_components()
+        self.stage_timer.lap("compute")
+        mmax = max(
+            np.max(self.three_phase_data),
+            np.max(self.clarke_data),
+            np.max(self.park_data),
+            -np.min(self.three_phase_data),
+            -np.min(self.clarke_data),
+            -np.min(self.park_data),
+        )
+        self.range_ticks[0] = -mmax
+        self.range_ticks[1] = mmax
+
+        label = f"{self.time_offset:0.2f})"
+        for trace, name, y_source, z_source in self.phasor_slots:
+            trace["name"] = name + label
+            if y_source is not None:
+                trace["y"][1] = y_source[0]
+            if z_source is not None:
+                trace["z"][1] = z_source[0]
+
+        layout = self.figure_data["layout"]
+        layout["height"] = self.height
+        layout["width"] = self.width
+        self.camera_projection["type"] = self.projection
+        if self.focus_selection in self.cameras:
+            layout["scene"]["camera"] = self.cameras[self.focus_selection]
+        if self.webgl_2d is True and self.focus_selection in self.flat_figures:
+            flat_layout = self.flat_figures[self.focus_selection]["layout"]
+            flat_layout["height"] = self.height
+            flat_layout["width"] = self.width
+            flat_data = self.flat_figures[self.focus_selection]["data"]
+            for flat_trace, trace in zip(flat_data, self.figure_data["data"]):
+                flat_trace["name"] = trace["name"]
+        self.stage_timer.lap("figure")
+
+    def get_figure(self) -> dict:
+        """Get the figure for the selected view.
+
+        Returns:
+            the 2D WebGL figure of a planar view when enabled, otherwise the 3D figure
+        """
+        if self.webgl_2d is True and self.focus_selection in self.flat_figures:
+            return self.flat_figures[self.focus_selection]
+        return self.figure_data
+
+    def build_spectrum_template(self) -> None:
+        """Create the harmonic spectrum plotly data structure once for the current workspace.
+
+        The traces refer to the workspace's spectrum arrays, which generate_spectrum_data fills in place.
+        """
+        channels = [
+            ("Phase A", ColorEnum.PhaseA, 3),
+            ("Phase B", ColorEnum.PhaseB, 3),
+            ("Phase C", ColorEnum.PhaseC, 3),
+            ("Clarke α", ColorEnum.ClarkeA, 2),
+            ("Clarke β", ColorEnum.ClarkeB, 2),
+            ("Park d", ColorEnum.ParkD, 1),
+            ("Park q", ColorEnum.ParkQ, 1),
+        ]
+        self.spectrum_data = {
+            "data": [
+                {
+                    "x": self.spectrum_orders,
+                    "y": amplitudes,
+                    "type": "bar",
+                    "name": name,
+                    "xaxis": "x",
+                    "yaxis": "y" if row == 1 else f"y{row}",
+                    "marker": {"color": color.value},
+                }
+                for (name, color, row), amplitudes in zip(channels, self.spectrum_amplitudes)
+            ],
+            "layout": {
+                "barmode": "group",
+                "height": 600,
+                "xaxis": {
+                    "title": "Harmonic order (frequency / fundamental)",
+                    "range": [-0.5, HARMONIC_ORDERS[-1] + 1.5],
+                    "dtick": 1,
                 },
-                "eye": {
-                    "x": 1.75,
-                    "y": 1.75,
-                    "z": 1.75,
+                "yaxis": {"title": "dq", "domain": [0.0, 0.3]},
+                "yaxis2": {"title": "αβ", "domain": [0.35, 0.65]},
+                "yaxis3": {"title": "abc", "domain": [0.7, 1.0]},
+                "margin": {
+                    "l": 60,
+                    "r": margin,
+                    "t": margin,
+                    "b": 60,
                 },
-            }
-        self.figure_data["layout"]["scene"]["camera"]["projection"] = {
-            "type": self.projection,
+                "plot_bgcolor": "rgba(0, 0, 0, 0)",
+                "paper_bgcolor": "rgba(0, 0, 0, 0)",
+            },
         }
 
+    def get_equation_values(self) -> list:
+        """Get the values shown next to the equations for the time slider sample.
+
+        Returns:
+            three phase data rows, then Clarke data, then Park data, rounded for display
+        """
+        count = (PHASE_COUNT + 1) * AXIS_COUNT
+        self.equation_values[:count].reshape(PHASE_COUNT + 1, AXIS_COUNT)[:] = self.three_phase_data[:, :, 0]
+        self.equation_values[count : count + PHASE_COUNT] = self.clarke_data[:, 0]
+        self.equation_values[count + PHASE_COUNT :] = self.park_data[:, 0]
+        return np.round(self.equation_values, 2, out=self.equation_values).tolist()
+
+    def generate_spectrum_data(self) -> None:
+        """Update plotly data structure of the harmonic spectrum in the abc, αβ and dq frames.
+
+        This is chunked_spectrum with a single chunk, computed in the workspace arrays.
+        """
+        signals = self.spectrum_signals
+        window = self.spectrum_window
+        np.multiply(self.three_phase_data[PhaseEnum.A : PhaseEnum.N, AxisEnum.Y, :], window, out=signals[:3])
+        np.multiply(self.clarke_data[ClarkeEnum.A : ClarkeEnum.Z, :], window, out=signals[3:5])
+        np.multiply(self.park_data[ParkEnum.D : ParkEnum.Z, :], window, out=signals[5:])
+        if RFFT_OUT:
+            np.fft.rfft(signals, axis=-1, out=self.spectrum_bins)
+        else:
+            self.spectrum_bins[:] = np.fft.rfft(signals, axis=-1)
+        np.abs(self.spectrum_bins, out=self.spectrum_amplitudes)
+        self.spectrum_amplitudes *= 2 / np.sum(window)
+        self.spectrum_amplitudes[:, 0] /= 2
+        if self.sample_count % 2 == 0:
+            self.spectrum_amplitudes[:, -1] /= 2
+        np.divide(self.spectrum_frequencies, self.frequency, out=self.spectrum_orders)
+
+    def get_statistics_values(self) -> list:
+        """Get the sliding window statistics of the Clarke α/β and Park d/q data.
+
+        The window ends at the time slider sample and spans as many whole fundamental periods as fit in
+        the plot.
+
+        Returns:
+            mean, RMS, ripple and THD of each channel in STATISTICS_CHANNELS, None where THD is undefined
+        """
+        cycles_per_sample = self.frequency / (self.sample_count - 1)
+        cycles = np.floor(self.frequency) if self.frequency >= 1 else self.frequency
+        window = max(1, min(self.sample_count, int(round(cycles / cycles_per_sample))))
+        # index 0 is the newest sample, the statistics take the window's samples oldest first
+        signals = self.statistics_signals[:, :window]
+        np.copyto(signals[:2], self.clarke_data[ClarkeEnum.A : ClarkeEnum.Z, window - 1 :: -1])
+        np.copyto(signals[2:], self.park_data[ParkEnum.D : ParkEnum.Z, window - 1 :: -1])
+        if self.statistics.window != window:
+            self.statistics = RollingStatistics(window, np.zeros(len(STATISTICS_CHANNELS)))
+        self.statistics.load(signals, [cycles_per_sample, cycles_per_sample, 0.0, 0.0])
+        results = self.statistics.current()
+        values = self.statistics_values
+        for column, name in enumerate(STATISTICS):
+            values[:, column] = results[name]
+        if self.frequency < 1:
+            # less than one period of α and β is plotted
+            values[:2, STATISTICS.index("thd")] = np.nan
+        # channels that are zero up to rounding, e.g. d of a balanced system
+        values[values[:, STATISTICS.index("rms")] < 1e-9, STATISTICS.index("thd")] = np.nan
+        return [None if np.isnan(value) else round(float(value), 4) for value in values.flat]
+
     @staticmethod
     @app.callback(
         [
             Output("scatter_plot", "figure"),
-            Output("three_phase_data", "children"),
-            Output("clarke_data", "children"),
-            Output("park_data", "children"),
+            Output("equation_values", "data"),
             Output("projection", "label"),
             Output("run-mode", "label"),
             Output("interval-component", "max_intervals"),
             Output("time_slider", "value"),
+            Output("spectrum_plot", "figure"),
+            Output("unbalance", "children"),
+            Output("statistics_values", "data"),
         ],
         [
             Input("interval-component", "n_intervals"),
@@ -774,6 +1260,17 @@ class ClarkeParkExploration:
             Input("focus_corner", "n_clicks"),
             Input("projection", "on"),
             Input("run-mode", "on"),
+            Input("harmonic5_slider", "value"),
+            Input("harmonic7_slider", "value"),
+            Input("harmonic11_slider", "value"),
+            Input("harmonic13_slider", "value"),
+            Input({"type": PHASE_HARMONIC_AMPLITUDE, "phase": ALL, "order": ALL}, "value"),
+            Input({"type": PHASE_HARMONIC_PHASE, "phase": ALL, "order": ALL}, "value"),
+            Input("webgl-2d", "on"),
+            Input("browser-compute", "on"),
+        ],
+        [
+            State("session_id", "data"),
         ],
     )
     def update_graphs(
@@ -794,10 +1291,145 @@ class ClarkeParkExploration:
         btn4,
         projection_isometric,
         run_mode,
-    ):
-        """Callback function used by plotly when use interacts with controls.
+        harmonic5_slider,
+        harmonic7_slider,
+        harmonic11_slider,
+        harmonic13_slider,
+        phase_harmonic_amplitudes,
+        phase_harmonic_phases,
+        webgl_2d,
+        browser_compute,
+        session_id,
+    ):
+        """Callback function used by plotly when use interacts with controls.
+
+        Args:
+            interval: _description_
+            time_slider: _description_
+            frequency_slider: _description_
+            phaseA_amplitude_slider: _description_
+            phaseB_amplitude_slider: _description_
+            phaseC_amplitude_slider: _description_
+            phaseA_phase_slider: _description_
+            phaseB_phase_slider: _description_
+            phaseC_phase_slider: _description_
+            size_slider: _description_
+            zero_sequence_slider: _description_
+            btn1: _description_
+            btn2: _description_
+            btn3: _description_
+            btn4: _description_
+            projection_isometric: _description_
+            run_mode: _description_
+            harmonic5_slider: 5th harmonic amplitude of every phase
+            harmonic7_slider: 7th harmonic amplitude of every phase
+            harmonic11_slider: 11th harmonic amplitude of every phase
+            harmonic13_slider: 13th harmonic amplitude of every phase
+            phase_harmonic_amplitudes: harmonic amplitude added to the sliders', per phase and order
+            phase_harmonic_phases: harmonic phase in units of pi, per phase and order
+            webgl_2d: render the X/Y, X/Z and Y/Z views as 2D WebGL plots
+            browser_compute: the browser computes the plot, the equation values and the unbalance for the
+                controls in BROWSER_CONTROLS
+            session_id: id of the browser session, see SESSIONS
+
+        Returns:
+            dictionary of objects for plotly's consumption
+        """
+        changed_id = [p["prop_id"] for p in dash.callback_context.triggered][0]
+        component = dash.callback_context.triggered_id
+        if isinstance(component, dict):
+            component = component["type"]
+            # one trigger label for every input of a pattern matching group
+            changed_id = f"{component}.{changed_id.rsplit('.', 1)[1]}"
+        outputs = ClarkeParkExploration.update_session(
+            session_id,
+            changed_id,
+            interval,
+            time_slider,
+            frequency_slider,
+            phaseA_amplitude_slider,
+            phaseB_amplitude_slider,
+            phaseC_amplitude_slider,
+            phaseA_phase_slider,
+            phaseB_phase_slider,
+            phaseC_phase_slider,
+            size_slider,
+            zero_sequence_slider,
+            btn1,
+            btn2,
+            btn3,
+            btn4,
+            projection_isometric,
+            run_mode,
+            harmonic5_slider,
+            harmonic7_slider,
+            harmonic11_slider,
+            harmonic13_slider,
+            webgl_2d,
+            phase_harmonic_amplitudes,
+            phase_harmonic_phases,
+        )
+        if browser_compute is True and component in BROWSER_CONTROLS:
+            # the browser already drew the plot and filled the equation values and the unbalance, the server
+            # still updates the session, the spectrum and the statistics
+            outputs[0] = outputs[1] = outputs[7] = dash.no_update
+        return outputs
+
+    @staticmethod
+    def update_session(session_id: str, changed_id: str, *controls: Any) -> list:
+        """Update the instance of a browser session from the callback's control values.
+
+        This is the body of update_graphs, the session is held until the end of the Flask request so dash
+        encodes the returned figures before the next update of the session writes to them.
+
+        Args:
+            session_id: id of the browser session, see SESSIONS
+            changed_id: property id of the control that triggered the update
+            controls: control values in the order of update's arguments after changed_id
+
+        Returns:
+            dictionary of objects for plotly's consumption
+        """
+        # the figures refer to the instance's workspace, it is held until dash has encoded them
+        instance = ClarkeParkExploration.SESSIONS.hold(session_id)
+        outputs = PROFILER.run(changed_id, instance.update, changed_id, *controls)
+        SHARED_FRAMES.publish_instance(instance, session_id or "")
+        return outputs
+
+    def update(
+        self,
+        changed_id: str,
+        interval,
+        time_slider,
+        frequency_slider,
+        phaseA_amplitude_slider,
+        phaseB_amplitude_slider,
+        phaseC_amplitude_slider,
+        phaseA_phase_slider,
+        phaseB_phase_slider,
+        phaseC_phase_slider,
+        size_slider,
+        zero_sequence_slider,
+        btn1,
+        btn2,
+        btn3,
+        btn4,
+        projection_isometric,
+        run_mode,
+        harmonic5_slider,
+        harmonic7_slider,
+        harmonic11_slider,
+        harmonic13_slider,
+        webgl_2d,
+        phase_harmonic_amplitudes: Any = None,
+        phase_harmonic_phases: Any = None,
+    ) -> list:
+        """Apply control values and build every callback output.
+
+        This holds the body of the plotly callback so it can be driven without a dash request context.
 
         Args:
+            changed_id: property id of the control that triggered the update
             interval: _description_
             time_slider: _description_
             frequency_slider: _description_
@@ -815,11 +1447,20 @@ class ClarkeParkExploration:
             btn4: _description_
             projection_isometric: _description_
             run_mode: _description_
+            harmonic5_slider: 5th harmonic amplitude of every phase
+            harmonic7_slider: 7th harmonic amplitude of every phase
+            harmonic11_slider: 11th harmonic amplitude of every phase
+            harmonic13_slider: 13th harmonic amplitude of every phase
+            webgl_2d: render the X/Y, X/Z and Y/Z views as 2D WebGL plots
+            phase_harmonic_amplitudes: harmonic amplitude added to the sliders' for each phase and order,
+                phase major, None adds nothing
+            phase_harmonic_phases: harmonic phase in units of pi for each phase and order, phase major,
+                None keeps harmonic_offsets
 
         Returns:
             dictionary of objects for plotly's consumption
         """
-        self = ClarkeParkExploration.INSTANCE
+        self.stage_timer = METRICS.start_timer(changed_id)
         self.time_offset = time_slider
         self.frequency = frequency_slider
         self.phaseA_offset = phaseA_phase_slider
@@ -831,6 +1472,14 @@ class ClarkeParkExploration:
         self.height = size_slider
         self.width = size_slider * 1.25
         self.zero_sequence = zero_sequence_slider
+        set_harmonics(
+            self.harmonic_amplitudes,
+            self.harmonic_offsets,
+            [harmonic5_slider, harmonic7_slider, harmonic11_slider, harmonic13_slider],
+            phase_harmonic_amplitudes,
+            phase_harmonic_phases,
+        )
+        self.webgl_2d = webgl_2d
         if projection_isometric is False:
             self.projection = "isometric"
             self.projection_label = "Enable Orthographic Projection"
@@ -846,7 +1495,7 @@ class ClarkeParkExploration:
         else:
             self.run_mode = "Enable Continuous Mode"
             max_intervals = 0
-        self.changed_id = [p["prop_id"] for p in dash.callback_context.triggered][0]
+        self.changed_id = changed_id
         if "focus_xy" in self.changed_id:
             self.focus_selection = FocusAxis.XY
         elif "focus_xz" in self.changed_id:
@@ -856,86 +1505,135 @@ class ClarkeParkExploration:
         elif "focus_corner" in self.changed_id:
             self.focus_selection = FocusAxis.XYZ
         self.generate_figure_data()
-        return [
-            self.figure_data,
-            html.Td(
-                [
-                    html.Tr(
-                        [
-                            html.Td(f"{self.three_phase_data[PhaseEnum.A, AxisEnum.X, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.A, AxisEnum.Y, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.A, AxisEnum.Z, 0]:0.2f}\u00A0\u00A0"),
-                        ]
-                    ),
-                    html.Tr(
-                        [
-                            html.Td(f"{self.three_phase_data[PhaseEnum.B, AxisEnum.X, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.B, AxisEnum.Y, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.B, AxisEnum.Z, 0]:0.2f}\u00A0\u00A0"),
-                        ]
-                    ),
-                    html.Tr(
-                        [
-                            html.Td(f"{self.three_phase_data[PhaseEnum.C, AxisEnum.X, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.C, AxisEnum.Y, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.C, AxisEnum.Z, 0]:0.2f}\u00A0\u00A0"),
-                        ]
-                    ),
-                    html.Tr(
-                        [
-                            html.Td(f"{self.three_phase_data[PhaseEnum.N, AxisEnum.X, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.N, AxisEnum.Y, 0]:0.2f}\u00A0\u00A0"),
-                            html.Td(f"{self.three_phase_data[PhaseEnum.N, AxisEnum.Z, 0]:0.2f}\u00A0\u00A0"),
-                        ]
-                    ),
-                ]
-            ),
-            html.Td(
-                [
-                    html.Tr(
-                        [
-                            html.Td(f"{self.clarke_data[ClarkeEnum.A, 0]:0.2f}"),
-                        ]
-                    ),
-                    html.Tr(
-                        [
-                            html.Td(f"{self.clarke_data[ClarkeEnum.B, 0]:0.2f}"),
-                        ]
-                    ),
-                    html.Tr(
-                        [
-                            html.Td(f"{self.clarke_data[ClarkeEnum.Z, 0]:0.2f}"),
-                        ]
-                    ),
-                ]
-            ),
-            html.Td(
+        self.generate_spectrum_data()
+        self.stage_timer.lap("spectrum")
+        outputs = [
+            self.get_figure(),
+            self.get_equation_values(),
+            self.projection_label,
+            self.run_mode,
+            max_intervals,
+            self.time_offset,
+            self.spectrum_data,
+            self.get_unbalance_label(),
+            self.get_statistics_values(),
+        ]
+        self.stage_timer.lap("table")
+        self.stage_timer.finish()
+        self.stage_timer = NULL_TIMER
+        return outputs
+
+
+cpe = ClarkeParkExploration()
+ClarkeParkExploration.INSTANCE = cpe
+ClarkeParkExploration.SESSIONS = SessionPool(ClarkeParkExploration, cpe)
+ClarkeParkExploration.SESSIONS.install(app.server)
+METRICS.set_triggers(
+    # the inputs of a pattern matching group share the label of their type, like update_graphs triggers
+    f"{json.loads(item['id'])['type'] if item['id'].startswith('{') else item['id']}.{item['property']}"
+    for callback in app.callback_map.values()
+    for item in callback["inputs"]
+)
+recording_layout = []
+if RECORDING_VIEW is not None:
+    recording_duration = RECORDING_VIEW.recording.duration
+    recording_layout = [
+        html.H3("Recording"),
+        html.P(
+            f"{RECORDING_PATH}: {RECORDING_VIEW.recording.sample_count} samples over "
+            + f"{recording_duration:0.1f} seconds. Pick a window with the slider or zoom into the plot, long "
+            + "windows show the minimum and maximum of blocks of samples and zooming in shows finer blocks "
+            + "down to the raw samples."
+        ),
+        dcc.Graph(id="recording_plot"),
+        dcc.RangeSlider(
+            id="recording_window",
+            min=0,
+            max=recording_duration,
+            value=[0, recording_duration],
+            updatemode="mouseup",
+            tooltip={
+                "placement": "bottom",
+                "always_visible": True,
+            },
+        ),
+        dcc.Store(id="recording_range"),
+        # background jobs cannot share a cancel input, each one cancels on its own window change count
+        dcc.Store(id="analysis_window_change", data=0),
+        dcc.Store(id="fit_window_change", data=0),
+        html.H4("Events"),
+        html.P(
+            "Find the intervals where a recorded channel passes a threshold, or where its slow average "
+            + "drifts from its typical value by more than the threshold. Events are marked on the time "
+            + "slider, which also marks a position in the recording, and picking an event moves the time "
+            + "slider and the recording window to it."
+        ),
+        html.Table(
+            html.Tr(
                 [
-                    html.Tr(
+                    html.Td(
                         [
-                            html.Td(f"{self.park_data[ParkEnum.D, 0]:0.2f}"),
+                            html.P("Channel"),
+                            dcc.Dropdown(
+                                id="event_channel",
+                                options=[
+                                    {"label": RECORDING_TRACES[name][0], "value": name} for name in CHANNELS
+                                ],
+                                value="q",
+                                clearable=False,
+                            ),
                         ]
                     ),
-                    html.Tr(
+                    html.Td(
                         [
-                            html.Td(f"{self.park_data[ParkEnum.Q, 0]:0.2f}"),
+                            html.P("Condition"),
+                            dcc.Dropdown(
+                                id="event_mode",
+                                options=[
+                                    {"label": "|value| > threshold", "value": "abs"},
+                                    {"label": "value > threshold", "value": "above"},
+                                    {"label": "value < threshold", "value": "below"},
+                                    {"label": "|average - typical| > threshold", "value": "drift"},
+                                ],
+                                value="abs",
+                                clearable=False,
+                            ),
                         ]
                     ),
-                    html.Tr(
+                    html.Td(
                         [
-                            html.Td(f"{self.park_data[ParkEnum.Z, 0]:0.2f}"),
+                            html.P("Threshold"),
+                            dcc.Input(id="event_threshold", type="number", value=1.2, step=0.01),
                         ]
                     ),
                 ]
             ),
-            self.projection_label,
-            self.run_mode,
-            max_intervals,
-            self.time_offset,
-        ]
-
-
-cpe = ClarkeParkExploration()
+            style={"width": "100%"},
+        ),
+        dcc.Dropdown(id="event_results"),
+        html.H4("Window Analysis"),
+        html.P(
+            "Compute the averaged spectrum of the Clarke and Park channels over the plotted window. Long "
+            + "windows take a while, the analysis runs in the background and is cancelled when the window "
+            + "changes."
+        ),
+        html.Button("Analyze Window", id="analysis_run", n_clicks=0),
+        html.Button("Cancel", id="analysis_cancel", n_clicks=0, disabled=True),
+        html.Progress(id="analysis_progress", value="0", max="1"),
+        html.P(id="analysis_status"),
+        dcc.Graph(id="analysis_plot"),
+        html.H4("Fit Sliders"),
+        html.P(
+            "Fit the frequency, amplitudes, offsets and zero sequence to every "
+            + f"{FIT_CYCLES} cycle window of the plotted window in one batch, and move the sliders to the "
+            + "last window so the plots above reproduce it. The fit runs in the background and is cancelled "
+            + "when the window changes."
+        ),
+        html.Button("Fit Sliders", id="fit_run", n_clicks=0),
+        html.Button("Cancel", id="fit_cancel", n_clicks=0, disabled=True),
+        html.Progress(id="fit_progress", value="0", max="1"),
+        html.P(id="fit_status"),
+    ]
 app.layout = dbc.Container(
     [
         html.H1("Interactive Clarke & Park Transforms"),
@@ -993,7 +1691,10 @@ app.layout = dbc.Container(
                             ),
                         ]
                     ),
-                    html.Td(id="three_phase_data"),
+                    html.Td(
+                        id="three_phase_data",
+                        children=create_value_table("three_phase_data", PHASE_COUNT + 1, AXIS_COUNT),
+                    ),
                 ]
             )
         ),
@@ -1025,7 +1726,7 @@ app.layout = dbc.Container(
                             ),
                         ]
                     ),
-                    html.Td(id="clarke_data"),
+                    html.Td(id="clarke_data", children=create_value_table("clarke_data", PHASE_COUNT, 1)),
                 ]
             )
         ),
@@ -1062,7 +1763,7 @@ app.layout = dbc.Container(
                             ),
                         ]
                     ),
-                    html.Td(id="park_data"),
+                    html.Td(id="park_data", children=create_value_table("park_data", AXIS_COUNT, 1)),
                 ]
             )
         ),
@@ -1104,10 +1805,43 @@ app.layout = dbc.Container(
                                                 labelPosition="top",
                                             ),
                                         ),
+                                        html.Td(
+                                            html.P("\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0"),
+                                        ),
+                                        html.Td(
+                                            daq.BooleanSwitch(
+                                                id="webgl-2d",
+                                                on=False,
+                                                label="2D WebGL Views",
+                                                labelPosition="top",
+                                            ),
+                                        ),
+                                        html.Td(
+                                            html.P("\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0"),
+                                        ),
+                                        html.Td(
+                                            daq.BooleanSwitch(
+                                                id="live-stream",
+                                                on=False,
+                                                label="Live Stream",
+                                                labelPosition="top",
+                                            ),
+                                        ),
+                                        html.Td(
+                                            html.P("\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0\u00A0"),
+                                        ),
+                                        html.Td(
+                                            daq.BooleanSwitch(
+                                                id="browser-compute",
+                                                on=False,
+                                                label="Browser Compute",
+                                                labelPosition="top",
+                                            ),
+                                        ),
                                     ]
                                 )
                             ),
-                            html.P(),
+                            html.P(id="stream_status"),
                             html.Table(
                                 html.Tr(
                                     [
@@ -1299,6 +2033,92 @@ app.layout = dbc.Container(
                                     "always_visible": True,
                                 },
                             ),
+                            html.Table(
+                                html.Tr(
+                                    [
+                                        html.Td(
+                                            [
+                                                html.P("5th harmonic"),
+                                                dcc.Slider(
+                                                    id="harmonic5_slider",
+                                                    min=0,
+                                                    max=0.5,
+                                                    marks={0: "0", 0.5: "0.5"},
+                                                    step=1 / cpe.slider_count,
+                                                    value=0,
+                                                    updatemode="drag",
+                                                    tooltip={
+                                                        "placement": "bottom",
+                                                        "always_visible": True,
+                                                    },
+                                                ),
+                                            ]
+                                        ),
+                                        html.Td(
+                                            [
+                                                html.P("7th harmonic"),
+                                                dcc.Slider(
+                                                    id="harmonic7_slider",
+                                                    min=0,
+                                                    max=0.5,
+                                                    marks={0: "0", 0.5: "0.5"},
+                                                    step=1 / cpe.slider_count,
+                                                    value=0,
+                                                    updatemode="drag",
+                                                    tooltip={
+                                                        "placement": "bottom",
+                                                        "always_visible": True,
+                                                    },
+                                                ),
+                                            ]
+                                        ),
+                                        html.Td(
+                                            [
+                                                html.P("11th harmonic"),
+                                                dcc.Slider(
+                                                    id="harmonic11_slider",
+                                                    min=0,
+                                                    max=0.5,
+                                                    marks={0: "0", 0.5: "0.5"},
+                                                    step=1 / cpe.slider_count,
+                                                    value=0,
+                                                    updatemode="drag",
+                                                    tooltip={
+                                                        "placement": "bottom",
+                                                        "always_visible": True,
+                                                    },
+                                                ),
+                                            ]
+                                        ),
+                                        html.Td(
+                                            [
+                                                html.P("13th harmonic"),
+                                                dcc.Slider(
+                                                    id="harmonic13_slider",
+                                                    min=0,
+                                                    max=0.5,
+                                                    marks={0: "0", 0.5: "0.5"},
+                                                    step=1 / cpe.slider_count,
+                                                    value=0,
+                                                    updatemode="drag",
+                                                    tooltip={
+                                                        "placement": "bottom",
+                                                        "always_visible": True,
+                                                    },
+                                                ),
+                                            ]
+                                        ),
+                                    ],
+                                ),
+                                style={"width": "100%"},
+                            ),
+                            html.P("Per-phase harmonics, amplitudes are added to the harmonic sliders"),
+                            html.Table(
+                                create_phase_harmonic_table(
+                                    ["Phase A", "Phase B", "Phase C"], HARMONIC_ORDERS
+                                ),
+                                style={"width": "100%"},
+                            ),
                             html.P("Graph size"),
                             dcc.Slider(
                                 id="size_slider",
@@ -1329,7 +2149,58 @@ app.layout = dbc.Container(
                 ]
             )
         ),
+        html.H3("Symmetrical Components"),
+        html.P(
+            "The Fortescue transform splits the phases into positive, negative and zero sequence "
+            + "components, they can be shown on the plot from its legend. Amplitude or phase imbalance "
+            + "creates a negative sequence component, the zero sequence slider creates a zero sequence one."
+        ),
+        html.P(id="unbalance"),
+        html.H3("Scenario Comparison"),
+        html.P(
+            "Compare sets of phase settings side by side, one per line as "
+            + '"name: A amplitude, B amplitude, C amplitude, A offset, B offset, C offset, zero sequence" '
+            + "with the offsets in units of \\( \\pi \\). Every scenario follows the time, frequency and "
+            + "harmonic sliders, and all of them are computed together in one batch."
+        ),
+        dcc.Textarea(id="scenarios", value=DEFAULT_SCENARIOS, style={"width": "100%", "height": "8em"}),
+        html.Button("Add Current Settings", id="scenario_add", n_clicks=0),
+        html.P(id="scenario_status"),
+        dcc.Graph(id="scenario_plot"),
+        html.H3("Window Statistics"),
+        html.P(
+            "Mean, RMS, ripple (RMS without the mean) and total harmonic distortion over the whole "
+            + "fundamental periods of the plotted window. The fundamental of α and β is the electrical "
+            + "frequency, the fundamental of d and q is their mean."
+        ),
+        html.Table(
+            [html.Tr([html.Td("")] + [html.Td(html.B(label)) for label in ["Mean", "RMS", "Ripple", "THD"]])]
+            + [
+                html.Tr(
+                    [html.Td(html.B(channel))]
+                    + [html.Td(id=f"statistics_{row}_{column}") for column in range(len(STATISTICS))]
+                )
+                for row, channel in enumerate(STATISTICS_CHANNELS)
+            ],
+        ),
+        html.H3("Harmonic Spectrum"),
+        html.P(
+            "Amplitude spectrum of the plotted window in each frame. Balanced 5th (negative sequence) and "
+            + "7th (positive sequence) harmonics both appear as a 6th harmonic in the rotating dq frame."
+        ),
+        dcc.Graph(id="spectrum_plot"),
+        *recording_layout,
         html.P(id="ignore"),
+        dcc.Store(id="session_id", storage_type="session"),
+        dcc.Store(id="equation_values"),
+        dcc.Store(id="statistics_values"),
+        dcc.Store(id="stream_port", data=STREAM_PORT),
+        dcc.Store(
+            id="compute_settings",
+            data=get_compute_settings(
+                cpe, PHASE_SHIFTS, ZERO_SEQUENCE_OFFSETS, HARMONIC_ORDERS, FLAT_VIEW_AXES, AXIS_TITLES
+            ),
+        ),
         dcc.Interval(id="interval-component", interval=250, n_intervals=0, max_intervals=0),
     ],
     style={"width": "100%"},
@@ -1354,9 +2225,443 @@ app.clientside_callback(
     Input("focus_corner", "n_clicks"),
     Input("projection", "on"),
 )
+app.clientside_callback(
+    ClientsideFunction(namespace="equations", function_name="fill_tables"),
+    [
+        Output(f"three_phase_data_{row}_{column}", "children")
+        for row in range(PHASE_COUNT + 1)
+        for column in range(AXIS_COUNT)
+    ]
+    + [Output(f"clarke_data_{row}_0", "children") for row in range(PHASE_COUNT)]
+    + [Output(f"park_data_{row}_0", "children") for row in range(AXIS_COUNT)],
+    Input("equation_values", "data"),
+)
+app.clientside_callback(
+    ClientsideFunction(namespace="equations", function_name="fill_statistics"),
+    [
+        Output(f"statistics_{row}_{column}", "children")
+        for row in range(len(STATISTICS_CHANNELS))
+        for column in range(len(STATISTICS))
+    ],
+    Input("statistics_values", "data"),
+)
+app.clientside_callback(
+    ClientsideFunction(namespace="session", function_name="create_id"),
+    Output("session_id", "data"),
+    Input("session_id", "modified_timestamp"),
+    State("session_id", "data"),
+)
+app.clientside_callback(
+    ClientsideFunction(namespace="stream", function_name="toggle"),
+    Output("stream_status", "children"),
+    Input("live-stream", "on"),
+    State("stream_port", "data"),
+    State("session_id", "data"),
+)
+app.clientside_callback(
+    ClientsideFunction(namespace="compute", function_name="update"),
+    Output("equation_values", "data", allow_duplicate=True),
+    Output("unbalance", "children", allow_duplicate=True),
+    Input("browser-compute", "on"),
+    Input("time_slider", "value"),
+    Input("frequency_slider", "value"),
+    Input("phaseA_amplitude_slider", "value"),
+    Input("phaseB_amplitude_slider", "value"),
+    Input("phaseC_amplitude_slider", "value"),
+    Input("phaseA_phase_slider", "value"),
+    Input("phaseB_phase_slider", "value"),
+    Input("phaseC_phase_slider", "value"),
+    Input("zerosequence_slider", "value"),
+    Input("harmonic5_slider", "value"),
+    Input("harmonic7_slider", "value"),
+    Input("harmonic11_slider", "value"),
+    Input("harmonic13_slider", "value"),
+    Input({"type": PHASE_HARMONIC_AMPLITUDE, "phase": ALL, "order": ALL}, "value"),
+    Input({"type": PHASE_HARMONIC_PHASE, "phase": ALL, "order": ALL}, "value"),
+    State("compute_settings", "data"),
+    prevent_initial_call=True,
+)
+
+
+def update_scenarios(
+    text: str,
+    time_slider: float,
+    frequency_slider: float,
+    harmonic5_slider: float,
+    harmonic7_slider: float,
+    harmonic11_slider: float,
+    harmonic13_slider: float,
+    phase_harmonic_amplitudes: list,
+    phase_harmonic_phases: list,
+    session_id: str = None,
+) -> list:
+    """Compute and plot every scenario of the comparison.
+
+    The scenarios share the harmonics of the page, the session's harmonics with the current harmonic
+    controls applied, as its next update applies them.
+
+    Args:
+        text: scenario lines, see parse_scenarios
+        time_slider: time offset
+        frequency_slider: frequency
+        harmonic5_slider: 5th harmonic amplitude of every phase
+        harmonic7_slider: 7th harmonic amplitude of every phase
+        harmonic11_slider: 11th harmonic amplitude of every phase
+        harmonic13_slider: 13th harmonic amplitude of every phase
+        phase_harmonic_amplitudes: harmonic amplitude added to the sliders' for each phase and order
+        phase_harmonic_phases: harmonic phase in units of pi for each phase and order
+        session_id: id of the browser session whose time axis and harmonics the scenarios follow, see
+            SESSIONS
+
+    Returns:
+        comparison figure and status text
+    """
+    try:
+        scenarios = parse_scenarios(text)
+    except ValueError as error:
+        # the plot keeps the last valid scenarios while a line is being edited
+        return [dash.no_update, str(error)]
+    if len(scenarios) == 0:
+        return [{"data": [], "layout": {}}, "Add a scenario to compare."]
+    # the time axes of the session's workspace, which updates never write
+    with ClarkeParkExploration.SESSIONS.use(session_id) as instance:
+        time = instance.time.copy()
+        time_axis = instance.three_phase_data[PhaseEnum.A, AxisEnum.X, :].copy()
+        harmonic_amplitudes = instance.harmonic_amplitudes.copy()
+        harmonic_offsets = instance.harmonic_offsets.copy()
+    # this callback can run before the page's update applies the same controls to the session
+    set_harmonics(
+        harmonic_amplitudes,
+        harmonic_offsets,
+        [harmonic5_slider, harmonic7_slider, harmonic11_slider, harmonic13_slider],
+        phase_harmonic_amplitudes,
+        phase_harmonic_phases,
+    )
+    angle = (time + time_slider) * frequency_slider * TWO_PI
+    result = compute_scenarios(
+        angle,
+        [values for _, values in scenarios],
+        HARMONIC_ORDERS,
+        harmonic_amplitudes,
+        harmonic_offsets,
+    )
+    return [create_scenario_figure([name for name, _ in scenarios], result, time_axis), ""]
+
+
+def add_scenario(
+    n_clicks: int,
+    phaseA_amplitude_slider: float,
+    phaseB_amplitude_slider: float,
+    phaseC_amplitude_slider: float,
+    phaseA_phase_slider: float,
+    phaseB_phase_slider: float,
+    phaseC_phase_slider: float,
+    zero_sequence_slider: float,
+    text: str,
+) -> str:
+    """Append the settings of the sliders to the scenarios.
+
+    Args:
+        n_clicks: add button presses
+        phaseA_amplitude_slider: phase A amplitude
+        phaseB_amplitude_slider: phase B amplitude
+        phaseC_amplitude_slider: phase C amplitude
+        phaseA_phase_slider: phase A offset
+        phaseB_phase_slider: phase B offset
+        phaseC_phase_slider: phase C offset
+        zero_sequence_slider: zero sequence offset
+        text: scenario lines
+
+    Returns:
+        scenario lines with the new one
+    """
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    line = format_scenario(
+        f"Scenario {len(lines) + 1}",
+        [
+            phaseA_amplitude_slider,
+            phaseB_amplitude_slider,
+            phaseC_amplitude_slider,
+            phaseA_phase_slider,
+            phaseB_phase_slider,
+            phaseC_phase_slider,
+            zero_sequence_slider,
+        ],
+    )
+    return "\n".join(lines + [line])
+
+
+def update_recording(window: list, relayout_data: dict, time_slider: float, current_range: list) -> list:
+    """Serve the recording plot for the slider window, or for the range zoomed into on the plot.
+
+    Args:
+        window: start and stop of the slider window in seconds
+        relayout_data: plot layout changes made by the user
+        time_slider: time slider position, marked in the recording as that fraction of its duration
+        current_range: start and stop of the plotted window in seconds
+
+    Returns:
+        figure of the window and the plotted window
+    """
+    start, stop = current_range or window
+    changed_id = [p["prop_id"] for p in dash.callback_context.triggered][0]
+    if "recording_window" in changed_id:
+        start, stop = window
+    elif "relayoutData" in changed_id and relayout_data is not None:
+        if "xaxis.range[0]" in relayout_data:
+            start, stop = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+        elif "xaxis.autorange" in relayout_data:
+            start, stop = window
+    cursor = time_slider * RECORDING_VIEW.recording.duration
+    figure = create_recording_figure(RECORDING_VIEW.get_window(start, stop), start, stop, cursor)
+    return [figure, [start, stop]]
+
+
+def count_window_change(window: list, relayout_data: dict, changes: int) -> list:
+    """Count the changes of the recording window for the background jobs cancelled by them.
+
+    Args:
+        window: start and stop of the slider window in seconds
+        relayout_data: plot layout changes made by the user
+        changes: window changes counted so far
+
+    Returns:
+        window change count for the analysis job and for the fit job
+    """
+    return [changes + 1, changes + 1]
+
+
+def query_events(channel: str, mode: str, threshold: float) -> list:
+    """Find recording events and mark them on the time slider.
+
+    Args:
+        channel: recording channel name
+        mode: threshold comparison, see EVENT_MODES
+        threshold: threshold
+
+    Returns:
+        event choices, the event placeholder text and the time slider marks
+    """
+    marks = {0: "0", 1: "1"}
+    if threshold is None:
+        return [[], "Enter a threshold", marks]
+    events = RECORDING_EVENTS.query(channel, threshold, mode)
+    duration = RECORDING_VIEW.recording.duration
+    options = [
+        {"label": f"{start:0.3f} s to {stop:0.3f} s, reaching {extreme:0.3f}", "value": f"{start},{stop}"}
+        for start, stop, extreme in events[:MAX_EVENTS]
+    ]
+    for start, _, _ in events[:MAX_EVENTS]:
+        marks[round(start / duration, 6)] = "▲"
+    placeholder = f"{len(events)} events"
+    if len(events) > MAX_EVENTS:
+        placeholder += f", showing the first {MAX_EVENTS}"
+    return [options, placeholder, marks]
+
+
+def select_event(event: str) -> list:
+    """Move the time slider and the recording window to an event.
+
+    Args:
+        event: comma separated event start and stop in seconds
+
+    Returns:
+        time slider value and recording window
+    """
+    if not event:
+        raise dash.exceptions.PreventUpdate
+    start, stop = (float(value) for value in event.split(","))
+    recording = RECORDING_VIEW.recording
+    duration = recording.duration
+    # show some context on both sides, at least ten fundamental periods for short events
+    padding = max(stop - start, 10 / recording.frequency if recording.frequency > 0 else 0.1)
+    return [start / duration, [max(0.0, start - padding), min(duration, stop + padding)]]
+
+
+def analyze_recording(set_progress: Any, n_clicks: int, current_range: list) -> list:
+    """Analyze the plotted recording window.
+
+    Args:
+        set_progress: function updating the progress bar, None when jobs run as regular callbacks
+        n_clicks: analyze button presses
+        current_range: start and stop of the plotted window in seconds
+
+    Returns:
+        spectrum figure and analysis summary
+    """
+    recording = RECORDING_VIEW.recording
+    start, stop = current_range or [0, recording.duration]
+    progress = None if set_progress is None else lambda done, total: set_progress([str(done), str(total)])
+    result = analyze_window(recording, start, stop, progress)
+    distortion = [
+        f"{RECORDING_TRACES[channel][0]} {100 * thd:0.2f}%"
+        for channel, thd in zip(ANALYSIS_CHANNELS, result["thd"])
+        if not np.isnan(thd)
+    ]
+    summary = f"Spectrum of {start:0.3f} s to {stop:0.3f} s."
+    if distortion:
+        orders = f"{ANALYSIS_ORDERS[1]} to {ANALYSIS_ORDERS[-1]}"
+        summary += f" THD over orders {orders}: " + ", ".join(distortion) + "."
+    return [create_analysis_figure(result), summary]
+
+
+def fit_sliders(set_progress: Any, n_clicks: int, current_range: list) -> list:
+    """Fit the phase settings to the plotted recording window and move the sliders to them.
+
+    Args:
+        set_progress: function updating the progress bar, None when jobs run as regular callbacks
+        n_clicks: fit button presses
+        current_range: start and stop of the plotted window in seconds
+
+    Returns:
+        time, frequency, amplitude, offset and zero sequence slider values and the fit summary
+    """
+    recording = RECORDING_VIEW.recording
+    start, stop = current_range or [0, recording.duration]
+    frequency = recording.frequency if recording.frequency > 0 else 10 / max(stop - start, 1e-9)
+    progress = None if set_progress is None else lambda done, total: set_progress([str(done), str(total)])
+    fit = fit_recording(recording, start, stop, FIT_CYCLES / frequency, progress=progress)
+    if len(fit["start"]) == 0:
+        return [dash.no_update] * 9 + [f"The plotted window is shorter than {FIT_CYCLES} cycles."]
+    values = get_slider_values(fit, -1, float(fit["span"]))
+    low, high = np.percentile(fit["frequency"], [1, 99])
+    summary = (
+        f"Fitted {len(fit['start'])} windows of {start:0.3f} s to {stop:0.3f} s, frequency {low:0.3f} Hz to "
+        + f"{high:0.3f} Hz, RMS error up to {np.max(fit['rms_error']):0.4f}. The sliders show the window at "
+        + f"{fit['start'][-1]:0.3f} s, fitted at {fit['frequency'][-1]:0.3f} Hz."
+    )
+    return [
+        values["time_slider"],
+        values["frequency_slider"],
+        values["phaseA_amplitude_slider"],
+        values["phaseB_amplitude_slider"],
+        values["phaseC_amplitude_slider"],
+        values["phaseA_phase_slider"],
+        values["phaseB_phase_slider"],
+        values["phaseC_phase_slider"],
+        values["zerosequence_slider"],
+        summary,
+    ]
+
+
+app.callback(
+    Output("scenario_plot", "figure"),
+    Output("scenario_status", "children"),
+    Input("scenarios", "value"),
+    Input("time_slider", "value"),
+    Input("frequency_slider", "value"),
+    Input("harmonic5_slider", "value"),
+    Input("harmonic7_slider", "value"),
+    Input("harmonic11_slider", "value"),
+    Input("harmonic13_slider", "value"),
+    Input({"type": PHASE_HARMONIC_AMPLITUDE, "phase": ALL, "order": ALL}, "value"),
+    Input({"type": PHASE_HARMONIC_PHASE, "phase": ALL, "order": ALL}, "value"),
+    State("session_id", "data"),
+)(update_scenarios)
+app.callback(
+    Output("scenarios", "value"),
+    Input("scenario_add", "n_clicks"),
+    State("phaseA_amplitude_slider", "value"),
+    State("phaseB_amplitude_slider", "value"),
+    State("phaseC_amplitude_slider", "value"),
+    State("phaseA_phase_slider", "value"),
+    State("phaseB_phase_slider", "value"),
+    State("phaseC_phase_slider", "value"),
+    State("zerosequence_slider", "value"),
+    State("scenarios", "value"),
+    prevent_initial_call=True,
+)(add_scenario)
+
+if RECORDING_VIEW is not None:
+    app.callback(
+        Output("recording_plot", "figure"),
+        Output("recording_range", "data"),
+        Input("recording_window", "value"),
+        Input("recording_plot", "relayoutData"),
+        Input("time_slider", "value"),
+        State("recording_range", "data"),
+    )(update_recording)
+    app.callback(
+        Output("analysis_window_change", "data"),
+        Output("fit_window_change", "data"),
+        Input("recording_window", "value"),
+        Input("recording_plot", "relayoutData"),
+        State("analysis_window_change", "data"),
+        prevent_initial_call=True,
+    )(count_window_change)
+    app.callback(
+        Output("event_results", "options"),
+        Output("event_results", "placeholder"),
+        Output("time_slider", "marks"),
+        Input("event_channel", "value"),
+        Input("event_mode", "value"),
+        Input("event_threshold", "value"),
+    )(query_events)
+    app.callback(
+        Output("time_slider", "value", allow_duplicate=True),
+        Output("recording_window", "value"),
+        Input("event_results", "value"),
+        prevent_initial_call=True,
+    )(select_event)
+    register_job(
+        app,
+        fit_sliders,
+        Output("time_slider", "value", allow_duplicate=True),
+        Output("frequency_slider", "value"),
+        Output("phaseA_amplitude_slider", "value"),
+        Output("phaseB_amplitude_slider", "value"),
+        Output("phaseC_amplitude_slider", "value"),
+        Output("phaseA_phase_slider", "value"),
+        Output("phaseB_phase_slider", "value"),
+        Output("phaseC_phase_slider", "value"),
+        Output("zerosequence_slider", "value"),
+        Output("fit_status", "children"),
+        Input("fit_run", "n_clicks"),
+        State("recording_range", "data"),
+        progress=[Output("fit_progress", "value"), Output("fit_progress", "max")],
+        cancel=[
+            Input("fit_cancel", "n_clicks"),
+            Input("fit_window_change", "data"),
+        ],
+        running=[
+            (Output("fit_run", "disabled"), True, False),
+            (Output("fit_cancel", "disabled"), False, True),
+        ],
+        prevent_initial_call=True,
+    )
+    register_job(
+        app,
+        analyze_recording,
+        Output("analysis_plot", "figure"),
+        Output("analysis_status", "children"),
+        Input("analysis_run", "n_clicks"),
+        State("recording_range", "data"),
+        progress=[Output("analysis_progress", "value"), Output("analysis_progress", "max")],
+        cancel=[
+            Input("analysis_cancel", "n_clicks"),
+            Input("analysis_window_change", "data"),
+        ],
+        running=[
+            (Output("analysis_run", "disabled"), True, False),
+            (Output("analysis_cancel", "disabled"), False, True),
+        ],
+        prevent_initial_call=True,
+    )
 
 
-if DEBUG is True:
-    app.run_server(debug=True)
-else:
-    app.run_server("0.0.0.0", 8050)
+if __name__ == "__main__":
+    if SHARED_NAME != "":
+        SHARED_FRAMES.open(SHARED_NAME, capacity=cpe.sample_count)
+        atexit.register(SHARED_FRAMES.close)
+    # the debug reloader runs this module in a parent process too, only its child serves requests
+    if STREAM_PORT != 0 and (DEBUG is not True or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        BROADCASTER.start(port=STREAM_PORT)
+        StreamProducer(
+            ClarkeParkExploration.SESSIONS,
+            lambda: ClarkeParkExploration(sample_count=cpe.sample_count),
+            BROADCASTER,
+        ).start()
+    if DEBUG is True:
+        app.run(debug=True)
+    else:
+        app.run("0.0.0.0", 8050)
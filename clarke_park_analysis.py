@@ -0,0 +1,203 @@
+"""This python module holds batch analysis functions for three-phase data.
+
+The functions work on plain NumPy arrays of shape (..., samples) so they can
+be used on the data of the interactive plot as well as on long captured
+records, including memory mapped files. analyze_window applies them to a
+window of a recording for the page's background analysis job.
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+from clarke_park_recording import CHANNEL_INDEX, Recording
+
+# number of chunks transformed by each batched rfft call
+FFT_BATCH = 256
+
+# Fortescue matrix, rows give the zero, positive and negative sequence components of phases a, b, c
+FORTESCUE_ROTATION = np.exp(2j * np.pi / 3)
+FORTESCUE_MATRIX = (1 / 3) * np.array(
+    [
+        [1, 1, 1],
+        [1, FORTESCUE_ROTATION, FORTESCUE_ROTATION**2],
+        [1, FORTESCUE_ROTATION**2, FORTESCUE_ROTATION],
+    ]
+)
+
+# samples per block when reducing long records to unbalance factors
+SEQUENCE_CHUNK = 1 << 20
+
+# recorded channels analyzed by analyze_window, the Clarke and Park components
+ANALYSIS_CHANNELS = ["alpha", "beta", "zero", "d", "q"]
+
+# samples per spectrum chunk of analyze_window
+ANALYSIS_CHUNK = 4096
+
+# analyzed channels turning at the fundamental frequency, the others hold no fundamental to compare with
+FUNDAMENTAL_CHANNELS = ["alpha", "beta"]
+
+# harmonic orders reported by analyze_window, the fundamental first
+ANALYSIS_ORDERS = np.array([1, 5, 7, 11, 13])
+
+# smallest fundamental amplitude with a defined THD
+FUNDAMENTAL_FLOOR = 1e-6
+
+
+def chunked_spectrum(
+    signals: np.ndarray,
+    sample_rate: float,
+    chunk_size: int = 4096,
+    overlap: float = 0.5,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the averaged single sided amplitude spectrum of long records.
+
+    Records are split into Hann windowed chunks overlapping by the given
+    fraction (Welch's method), chunks are transformed in batches with rfft and
+    their power is averaged, so memory use depends on the chunk size rather
+    than the record length.
+
+    Args:
+        signals: real signals, shape (..., samples)
+        sample_rate: samples per unit time
+        chunk_size: samples per chunk, limited to the record length
+        overlap: fraction of each chunk shared with the next one, from 0 up to 1
+        progress: optional function called after each batch with the chunks done and the chunk count
+
+    Returns:
+        frequencies, shape (bins,) and amplitudes, shape (..., bins)
+    """
+    signals = np.asarray(signals)
+    sample_count = signals.shape[-1]
+    chunk_size = max(1, min(chunk_size, sample_count))
+    step = max(1, int(round(chunk_size * (1 - overlap))))
+    window = np.hanning(chunk_size) if chunk_size > 1 else np.ones(1)
+    starts = np.arange(0, sample_count - chunk_size + 1, step)
+
+    power = np.zeros(signals.shape[:-1] + (chunk_size // 2 + 1,))
+    for batch_start in range(0, len(starts), FFT_BATCH):
+        batch = starts[batch_start : batch_start + FFT_BATCH]
+        # (..., chunks, chunk_size) gathered one batch at a time
+        chunks = np.stack([signals[..., start : start + chunk_size] for start in batch], axis=-2)
+        spectrum = np.fft.rfft(chunks * window, axis=-1)
+        power += np.sum(spectrum.real**2 + spectrum.imag**2, axis=-2)
+        if progress is not None:
+            progress(batch_start + len(batch), len(starts))
+    power /= len(starts)
+
+    amplitude = np.sqrt(power) * (2 / np.sum(window))
+    amplitude[..., 0] /= 2
+    if chunk_size % 2 == 0:
+        amplitude[..., -1] /= 2
+    return np.fft.rfftfreq(chunk_size, 1 / sample_rate), amplitude
+
+
+def harmonic_amplitudes(
+    frequencies: np.ndarray,
+    amplitudes: np.ndarray,
+    fundamental: float,
+    orders: np.ndarray,
+) -> np.ndarray:
+    """Pick the amplitude of each harmonic order from a spectrum.
+
+    The Hann window spreads a tone over neighbouring bins, so the largest
+    amplitude within one bin of each harmonic frequency is used.
+
+    Args:
+        frequencies: spectrum frequencies, shape (bins,)
+        amplitudes: spectrum amplitudes, shape (..., bins)
+        fundamental: fundamental frequency
+        orders: harmonic orders, shape (orders,)
+
+    Returns:
+        amplitudes, shape (..., orders), zero for orders above the Nyquist frequency
+    """
+    resolution = frequencies[1] - frequencies[0] if len(frequencies) > 1 else 1.0
+    bins = np.rint(np.asarray(orders) * fundamental / resolution).astype(int)
+    result = np.zeros(amplitudes.shape[:-1] + (len(bins),))
+    for index, center in enumerate(bins):
+        if center < amplitudes.shape[-1]:
+            result[..., index] = np.max(amplitudes[..., max(center - 1, 0) : center + 2], axis=-1)
+    return result
+
+
+def symmetrical_components(phasors: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Decompose three phase phasors into zero, positive and negative sequence components.
+
+    Phase b lagging phase a by 120 degrees is positive sequence. The Fortescue
+    matrix is applied to every sample with one broadcast matrix product.
+
+    Args:
+        phasors: complex phasors of phases a, b and c, shape (..., 3, samples)
+        out: optional complex result array, shape (..., 3, samples)
+
+    Returns:
+        zero, positive and negative sequence components, shape (..., 3, samples)
+    """
+    return np.matmul(FORTESCUE_MATRIX, phasors, out=out)
+
+
+def unbalance_factors(phasors: np.ndarray, chunk_size: int = SEQUENCE_CHUNK) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the negative and zero sequence unbalance factors of records.
+
+    The factors are RMS sequence magnitudes relative to the positive sequence,
+    accumulated block by block so long records, including memory mapped files,
+    are never decomposed all at once.
+
+    Args:
+        phasors: complex phasors of phases a, b and c, shape (..., 3, samples)
+        chunk_size: samples per block
+
+    Returns:
+        negative / positive and zero / positive ratios, each shape (...)
+    """
+    phasors = np.asarray(phasors)
+    power = np.zeros(phasors.shape[:-2] + (3,))
+    for start in range(0, phasors.shape[-1], chunk_size):
+        components = symmetrical_components(phasors[..., start : start + chunk_size])
+        power += np.sum(components.real**2 + components.imag**2, axis=-1)
+    positive = np.sqrt(power[..., 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        negative = np.where(positive > 0, np.sqrt(power[..., 2]) / positive, 0.0)
+        zero = np.where(positive > 0, np.sqrt(power[..., 0]) / positive, 0.0)
+    return negative, zero
+
+
+def analyze_window(
+    recording: Recording,
+    start: float,
+    stop: float,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Compute the averaged spectrum of the Clarke and Park channels over a recording window.
+
+    Args:
+        recording: recording to analyze
+        start: window start in seconds
+        stop: window stop in seconds
+        progress: optional function called with the chunks done and the chunk count
+
+    Returns:
+        dictionary with "frequencies", shape (bins,), "amplitudes", shape (channels, bins),
+        "harmonics", amplitudes of ANALYSIS_ORDERS, shape (channels, orders), and "thd", the THD of the
+        orders above the fundamental, NaN for channels not in FUNDAMENTAL_CHANNELS, shape (channels,)
+    """
+    first = recording.get_index(min(start, stop))
+    last = max(recording.get_index(max(start, stop)), first + 1)
+    # the analyzed channels are contiguous, so this stays a view of the memory mapped file
+    channels = slice(CHANNEL_INDEX[ANALYSIS_CHANNELS[0]], CHANNEL_INDEX[ANALYSIS_CHANNELS[-1]] + 1)
+    frequencies, amplitudes = chunked_spectrum(
+        recording.data[channels, first:last], recording.sample_rate, ANALYSIS_CHUNK, progress=progress
+    )
+    harmonics = harmonic_amplitudes(frequencies, amplitudes, recording.frequency, ANALYSIS_ORDERS)
+    fundamental = harmonics[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        thd = np.sqrt(np.sum(harmonics[:, 1:] ** 2, axis=1)) / fundamental
+    defined = np.isin(ANALYSIS_CHANNELS, FUNDAMENTAL_CHANNELS) & (fundamental > FUNDAMENTAL_FLOOR)
+    return {
+        "frequencies": frequencies,
+        "amplitudes": amplitudes,
+        "harmonics": harmonics,
+        "thd": np.where(defined, thd, np.nan),
+    }
@@ -0,0 +1,468 @@
+"""This python module dispatches the Clarke and Park compute kernels to interchangeable backends.
+
+Each operation (waveform generation, Clarke transform, Park transform) has a
+pure NumPy reference kernel and, when the packages are installed, numexpr and
+Numba kernels. Numba kernels are compiled with cache=True so the compiled code
+is kept on disk between runs.
+
+The kernel used for each operation is picked by a short calibration benchmark
+the first time a sample count and precision are used, among the backends that
+pass the conformance check against the NumPy reference. The choice can be
+overridden with the CLARKE_PARK_BACKEND environment variable, either a single
+backend name for every operation or per operation, e.g.
+"generate=numba,clarke=numpy".
+
+Run as a script to check every backend against the reference and print the
+calibration timings.
+
+Usage:
+    python clarke_park_backends.py
+    python clarke_park_backends.py --samples 100 10000 --dtypes float32
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND_OVERRIDE = os.environ.get("CLARKE_PARK_BACKEND", "")
+REFERENCE = "numpy"
+OPERATIONS = ["generate", "clarke", "park"]
+
+# seconds spent timing each kernel during calibration
+CALIBRATION_TIME = 0.01
+
+# allowed difference from the reference kernel by precision
+TOLERANCES = {
+    np.dtype(np.float64): 1e-9,
+    np.dtype(np.float32): 1e-4,
+}
+
+
+def numpy_generate(
+    angle: np.ndarray,
+    amplitudes: np.ndarray,
+    shifts: np.ndarray,
+    zero_y: np.ndarray,
+    zero_z: np.ndarray,
+    out_y: np.ndarray,
+    out_z: np.ndarray,
+) -> None:
+    """Generate the fundamental of every phase.
+
+    Args:
+        angle: fundamental angle, shape (samples,)
+        amplitudes: amplitude of each phase, shape (phases,)
+        shifts: angle added to each phase, shape (phases,)
+        zero_y: real offset subtracted from each phase, shape (phases,)
+        zero_z: imaginary offset subtracted from each phase, shape (phases,)
+        out_y: real part of each phase, shape (phases, samples)
+        out_z: imaginary part of each phase, shape (phases, samples)
+    """
+    np.add(angle, shifts[:, np.newaxis], out=out_z)
+    np.cos(out_z, out=out_y)
+    np.sin(out_z, out=out_z)
+    out_y *= amplitudes[:, np.newaxis]
+    out_z *= amplitudes[:, np.newaxis]
+    out_y -= zero_y[:, np.newaxis]
+    out_z -= zero_z[:, np.newaxis]
+
+
+def numpy_clarke(matrix: np.ndarray, phases: np.ndarray, out: np.ndarray) -> None:
+    """Multiply the phases by the Clarke matrix.
+
+    Args:
+        matrix: Clarke matrix, shape (phases, phases)
+        phases: real part of each phase, shape (phases, samples)
+        out: alpha, beta and the remaining components, shape (phases, samples)
+    """
+    # matmul reads the strided phase rows in place, dot would copy them first
+    np.matmul(matrix, phases, out=out)
+
+
+def numpy_park(matrix: np.ndarray, clarke: np.ndarray, out: np.ndarray, product: np.ndarray) -> None:
+    """Multiply the Clarke components by the per-sample Park matrix.
+
+    Args:
+        matrix: Park matrix, shape (3, 3, samples)
+        clarke: alpha, beta and zero components, shape (3, samples)
+        out: d, q and zero components, shape (3, samples)
+        product: scratch space, shape (3, 3, samples)
+    """
+    np.multiply(matrix, clarke[:, np.newaxis, :], out=product)
+    np.sum(product, axis=0, out=out)
+
+
+def numexpr_generate(
+    angle: np.ndarray,
+    amplitudes: np.ndarray,
+    shifts: np.ndarray,
+    zero_y: np.ndarray,
+    zero_z: np.ndarray,
+    out_y: np.ndarray,
+    out_z: np.ndarray,
+) -> None:
+    """Generate the fundamental of every phase with numexpr, see numpy_generate."""
+    local_dict = {
+        "angle": angle[np.newaxis, :],
+        "amplitude": amplitudes[:, np.newaxis],
+        "shift": shifts[:, np.newaxis],
+        "zero_y": zero_y[:, np.newaxis],
+        "zero_z": zero_z[:, np.newaxis],
+    }
+    numexpr.evaluate("amplitude * cos(angle + shift) - zero_y", local_dict=local_dict, out=out_y)
+    numexpr.evaluate("amplitude * sin(angle + shift) - zero_z", local_dict=local_dict, out=out_z)
+
+
+def numexpr_clarke(matrix: np.ndarray, phases: np.ndarray, out: np.ndarray) -> None:
+    """Multiply the phases by the Clarke matrix with numexpr, see numpy_clarke."""
+    local_dict = {f"p{phase}": phases[phase] for phase in range(matrix.shape[1])}
+    expression = " + ".join(f"m{phase} * p{phase}" for phase in range(matrix.shape[1]))
+    for row in range(matrix.shape[0]):
+        # matrix scalars keep the workspace precision, so the result matches the output array
+        local_dict.update({f"m{phase}": value for phase, value in enumerate(matrix[row])})
+        numexpr.evaluate(expression, local_dict=local_dict, out=out[row])
+
+
+def numexpr_park(matrix: np.ndarray, clarke: np.ndarray, out: np.ndarray, product: np.ndarray) -> None:
+    """Multiply the Clarke components by the Park matrix with numexpr, see numpy_park."""
+    alpha, beta, zero = clarke
+    for column in range(matrix.shape[1]):
+        m0, m1, m2 = matrix[:, column]
+        numexpr.evaluate("m0 * alpha + m1 * beta + m2 * zero", out=out[column])
+
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def numba_generate(angle, amplitudes, shifts, zero_y, zero_z, out_y, out_z):
+        """Generate the fundamental of every phase with Numba, see numpy_generate."""
+        for phase in range(out_y.shape[0]):
+            for sample in range(angle.shape[0]):
+                phase_angle = angle[sample] + shifts[phase]
+                out_y[phase, sample] = amplitudes[phase] * np.cos(phase_angle) - zero_y[phase]
+                out_z[phase, sample] = amplitudes[phase] * np.sin(phase_angle) - zero_z[phase]
+
+    @numba.njit(cache=True)
+    def numba_clarke(matrix, phases, out):
+        """Multiply the phases by the Clarke matrix with Numba, see numpy_clarke."""
+        for row in range(matrix.shape[0]):
+            for sample in range(phases.shape[1]):
+                total = 0.0
+                for phase in range(matrix.shape[1]):
+                    total += matrix[row, phase] * phases[phase, sample]
+                out[row, sample] = total
+
+    @numba.njit(cache=True)
+    def numba_park_kernel(matrix, clarke, out):
+        """Multiply the Clarke components by the Park matrix with Numba, see numpy_park."""
+        for column in range(matrix.shape[1]):
+            for sample in range(clarke.shape[1]):
+                total = 0.0
+                for row in range(matrix.shape[0]):
+                    total += matrix[row, column, sample] * clarke[row, sample]
+                out[column, sample] = total
+
+    def numba_park(matrix: np.ndarray, clarke: np.ndarray, out: np.ndarray, product: np.ndarray) -> None:
+        """Multiply the Clarke components by the Park matrix with Numba, see numpy_park."""
+        numba_park_kernel(matrix, clarke, out)
+
+
+def get_test_case(operation: str, sample_count: int, dtype: Any) -> Tuple[tuple, List[np.ndarray]]:
+    """Create reproducible arguments for one operation.
+
+    The output arrays are strided views into a larger array, like the views the
+    plot passes in.
+
+    Args:
+        operation: operation name
+        sample_count: number of samples
+        dtype: floating point precision
+
+    Returns:
+        kernel arguments and the output arrays among them
+    """
+    rng = np.random.default_rng(0)
+    dtype = np.dtype(dtype)
+    data = np.zeros((4, 3, sample_count), dtype=dtype)
+    if operation == "generate":
+        arguments = (
+            np.linspace(0, -2 * np.pi, sample_count).astype(dtype),
+            rng.uniform(0, 1, 3).astype(dtype),
+            rng.uniform(-np.pi, np.pi, 3).astype(dtype),
+            rng.uniform(-0.5, 0.5, 3).astype(dtype),
+            rng.uniform(-0.5, 0.5, 3).astype(dtype),
+            data[:3, 1, :],
+            data[:3, 2, :],
+        )
+        return arguments, [data[:3, 1, :], data[:3, 2, :]]
+    if operation == "clarke":
+        matrix = (2 / 3) * np.array([[1, -0.5, -0.5], [0, np.sqrt(3) / 2, -np.sqrt(3) / 2], [0.5, 0.5, 0.5]])
+        data[:3, 1, :] = rng.uniform(-1, 1, (3, sample_count))
+        out = np.zeros((3, sample_count), dtype=dtype)
+        return (matrix.astype(dtype), data[:3, 1, :], out), [out]
+    out = np.zeros((3, sample_count), dtype=dtype)
+    arguments = (
+        rng.uniform(-1, 1, (3, 3, sample_count)).astype(dtype),
+        rng.uniform(-1, 1, (3, sample_count)).astype(dtype),
+        out,
+        np.empty((3, 3, sample_count), dtype=dtype),
+    )
+    return arguments, [out]
+
+
+def time_kernel(kernel: Callable, arguments: tuple) -> float:
+    """Time a kernel, after one untimed call so compilation is excluded.
+
+    Args:
+        kernel: kernel to time
+        arguments: kernel arguments
+
+    Returns:
+        best seconds per call
+    """
+    kernel(*arguments)
+    best = float("inf")
+    for _ in range(3):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            kernel(*arguments)
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= CALIBRATION_TIME / 3:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def parse_override(override: str) -> Dict[str, str]:
+    """Parse a backend override setting.
+
+    Args:
+        override: a backend name, or comma separated operation=backend pairs
+
+    Returns:
+        dictionary of operation name to backend name
+    """
+    choices: Dict[str, str] = {}
+    for item in filter(None, (part.strip() for part in override.split(","))):
+        if "=" in item:
+            operation, name = (part.strip() for part in item.split("=", 1))
+            choices[operation] = name
+        else:
+            choices.update({operation: item for operation in OPERATIONS})
+    return choices
+
+
+class BackendRegistry:
+    """Registered kernels of each operation and the calibrated choice per workspace size."""
+
+    def __init__(self, override: str = BACKEND_OVERRIDE) -> None:
+        """Create an empty registry.
+
+        Args:
+            override: backend override, see parse_override
+        """
+        self.kernels: Dict[str, Dict[str, Callable]] = {operation: {} for operation in OPERATIONS}
+        self.override = parse_override(override)
+        self.selections: Dict[Tuple[int, str], Dict[str, str]] = {}
+        self.timings: Dict[Tuple[int, str], Dict[str, Dict[str, float]]] = {}
+        self.lock = threading.Lock()
+
+    def register(self, backend: str, operation: str, kernel: Callable) -> None:
+        """Add a kernel.
+
+        Args:
+            backend: backend name
+            operation: operation name
+            kernel: kernel with the signature of the NumPy reference kernel
+        """
+        self.kernels[operation][backend] = kernel
+
+    def get_backends(self, operation: str) -> List[str]:
+        """Get the backends registered for an operation.
+
+        Args:
+            operation: operation name
+
+        Returns:
+            backend names, reference first
+        """
+        return sorted(self.kernels[operation], key=lambda name: (name != REFERENCE, name))
+
+    def check_conformance(self, backend: str, operation: str, sample_count: int, dtype: Any) -> float:
+        """Compare a kernel against the reference kernel.
+
+        Args:
+            backend: backend name
+            operation: operation name
+            sample_count: number of samples
+            dtype: floating point precision
+
+        Returns:
+            largest absolute difference from the reference
+        """
+        reference_arguments, reference_outputs = get_test_case(operation, sample_count, dtype)
+        arguments, outputs = get_test_case(operation, sample_count, dtype)
+        self.kernels[operation][REFERENCE](*reference_arguments)
+        self.kernels[operation][backend](*arguments)
+        return max(float(np.max(np.abs(a - b), initial=0.0)) for a, b in zip(outputs, reference_outputs))
+
+    def conforms(self, backend: str, operation: str, sample_count: int, dtype: Any) -> bool:
+        """Check whether a kernel matches the reference within the tolerance of its precision.
+
+        Args:
+            backend: backend name
+            operation: operation name
+            sample_count: number of samples
+            dtype: floating point precision
+
+        Returns:
+            whether the kernel can be used
+        """
+        try:
+            error = self.check_conformance(backend, operation, sample_count, dtype)
+        except Exception as error_info:  # a backend that cannot run is simply not used
+            print(f"backend {backend} failed {operation}: {error_info}", file=sys.stderr)
+            return False
+        return error <= TOLERANCES.get(np.dtype(dtype), 1e-9)
+
+    def calibrate(self, sample_count: int, dtype: Any) -> Dict[str, Dict[str, float]]:
+        """Time every conforming kernel of every operation.
+
+        Args:
+            sample_count: number of samples
+            dtype: floating point precision
+
+        Returns:
+            dictionary of operation name to dictionary of backend name to seconds per call
+        """
+        timings: Dict[str, Dict[str, float]] = {}
+        for operation in OPERATIONS:
+            arguments, _ = get_test_case(operation, sample_count, dtype)
+            timings[operation] = {
+                backend: time_kernel(self.kernels[operation][backend], arguments)
+                for backend in self.get_backends(operation)
+                if backend == REFERENCE or self.conforms(backend, operation, sample_count, dtype)
+            }
+        return timings
+
+    def select(self, sample_count: int, dtype: Any) -> Dict[str, Callable]:
+        """Get the kernel of each operation for a workspace, calibrating on first use.
+
+        Args:
+            sample_count: number of samples
+            dtype: floating point precision
+
+        Returns:
+            dictionary of operation name to kernel
+        """
+        key = (sample_count, np.dtype(dtype).name)
+        with self.lock:
+            if key not in self.selections:
+                choices = {}
+                pending = [operation for operation in OPERATIONS if operation not in self.override]
+                if pending:
+                    self.timings[key] = self.calibrate(sample_count, dtype)
+                for operation in OPERATIONS:
+                    if operation in self.override:
+                        choices[operation] = self.get_override(operation)
+                    else:
+                        choices[operation] = min(
+                            self.timings[key][operation], key=self.timings[key][operation].get
+                        )
+                self.selections[key] = choices
+        return {operation: self.kernels[operation][name] for operation, name in self.selections[key].items()}
+
+    def get_override(self, operation: str) -> str:
+        """Get the overridden backend of an operation, falling back to the reference if it is not available.
+
+        Args:
+            operation: operation name
+
+        Returns:
+            backend name
+        """
+        name = self.override[operation]
+        if name not in self.kernels[operation]:
+            print(f"backend {name} is not available for {operation}, using {REFERENCE}", file=sys.stderr)
+            return REFERENCE
+        return name
+
+
+BACKENDS = BackendRegistry()
+BACKENDS.register("numpy", "generate", numpy_generate)
+BACKENDS.register("numpy", "clarke", numpy_clarke)
+BACKENDS.register("numpy", "park", numpy_park)
+if numexpr is not None:
+    BACKENDS.register("numexpr", "generate", numexpr_generate)
+    BACKENDS.register("numexpr", "clarke", numexpr_clarke)
+    BACKENDS.register("numexpr", "park", numexpr_park)
+if numba is not None:
+    BACKENDS.register("numba", "generate", numba_generate)
+    BACKENDS.register("numba", "clarke", numba_clarke)
+    BACKENDS.register("numba", "park", numba_park)
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the conformance and calibration command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status, 1 if any backend does not conform
+    """
+    parser = argparse.ArgumentParser(description="Check and time the compute backends.")
+    parser.add_argument("--samples", type=int, nargs="+", default=[100, 10000], help="sample counts")
+    parser.add_argument(
+        "--dtypes", nargs="+", default=["float64", "float32"], help="floating point precisions"
+    )
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for sample_count in args.samples:
+        for dtype in args.dtypes:
+            for operation in OPERATIONS:
+                arguments, _ = get_test_case(operation, sample_count, dtype)
+                for backend in BACKENDS.get_backends(operation):
+                    try:
+                        error = BACKENDS.check_conformance(backend, operation, sample_count, dtype)
+                        seconds = time_kernel(BACKENDS.kernels[operation][backend], arguments)
+                    except Exception as error_info:
+                        print(f"{operation}[{sample_count},{dtype}] {backend}: {error_info}")
+                        failures += 1
+                        continue
+                    passed = error <= TOLERANCES.get(np.dtype(dtype), 1e-9)
+                    failures += not passed
+                    case = f"{operation}[{sample_count},{dtype}]"
+                    print(
+                        f"{case:<28} {backend:<8} {seconds * 1e6:>10.2f} us"
+                        + f"  max error {error:.2e} {'ok' if passed else 'FAIL'}"
+                    )
+            names = {
+                operation: kernel.__name__
+                for operation, kernel in BACKENDS.select(sample_count, dtype).items()
+            }
+            print(f"selected[{sample_count},{dtype}] {names}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""This python script benchmarks the Clarke and Park compute and render pipeline.
+
+Each stage is timed across sample counts and floating point precisions, the
+results are written as JSON and optionally compared against a baseline run.
+The script exits with a non-zero status when any stage is slower than the
+baseline by more than the threshold.
+
+With --check-allocations the script instead traces the Python heap with
+tracemalloc across many steady state time slider updates of a browser
+session, run like the update_graphs callback does: the session is held for a
+Flask request, the update runs through the profiler and its frame is
+published to shared memory. It exits with a non-zero status when the heap
+grows over the updates or an update holds more temporaries than a small fixed
+budget, whatever the sample count. Dash's JSON encoding of the response is
+not traced, it builds a new string of every figure by design.
+
+Usage:
+    python clarke_park_bench.py --output bench.json
+    python clarke_park_bench.py --baseline bench.json --threshold 0.25
+    python clarke_park_bench.py --check-allocations --updates 10000
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+import plotly
+from clarke_park_3d import ClarkeParkExploration, app
+from clarke_park_metrics import DASH_UPDATE_PATH
+from clarke_park_sessions import SessionPool
+from clarke_park_shm import SHARED_FRAMES
+
+DEFAULT_SAMPLE_COUNTS = [100, 1000, 10000]
+DEFAULT_DTYPES = ["float64", "float32"]
+
+# updates run before tracing starts, so caches and lazily built structures are in place
+WARMUP_UPDATES = 100
+
+# session id of the traced updates
+CHECK_SESSION = "allocation-check"
+
+# bytes the heap may differ by after the updates, the small objects the interpreter keeps on its free lists
+# for reuse, a few dozen depending on where the updates stop, while leaking one float per update adds 240 kB
+# over 10,000 updates
+GROWTH_TOLERANCE = 4 * 1024
+
+# bytes of temporaries an update may hold at once, the Python objects of its outputs plus the buffers NumPy
+# casts and broadcasts small operands through, up to np.getbufsize() elements of two float64 operands
+TRANSIENT_BYTES = 16 * 1024 + 2 * 8 * np.getbufsize()
+
+# slider values matching the defaults of the web page
+DEFAULT_CONTROLS = {
+    "interval": 0,
+    "time_slider": 0.0,
+    "frequency_slider": 1.0,
+    "phaseA_amplitude_slider": 1.0,
+    "phaseB_amplitude_slider": 1.0,
+    "phaseC_amplitude_slider": 1.0,
+    "phaseA_phase_slider": 0.0,
+    "phaseB_phase_slider": 0.0,
+    "phaseC_phase_slider": 0.0,
+    "size_slider": 700,
+    "zero_sequence_slider": 0.0,
+    "btn1": 0,
+    "btn2": 0,
+    "btn3": 0,
+    "btn4": 0,
+    "projection_isometric": False,
+    "run_mode": False,
+    "harmonic5_slider": 0.0,
+    "harmonic7_slider": 0.0,
+    "harmonic11_slider": 0.0,
+    "harmonic13_slider": 0.0,
+    "webgl_2d": False,
+}
+
+
+def create_instance(sample_count: int, dtype: str) -> ClarkeParkExploration:
+    """Create an instance primed with the default control values.
+
+    Args:
+        sample_count: number of samples along the time axis
+        dtype: floating point precision name
+
+    Returns:
+        instance ready for timing
+    """
+    cpe = ClarkeParkExploration(sample_count=sample_count, dtype=dtype)
+    cpe.update("time_slider.value", **DEFAULT_CONTROLS)
+    return cpe
+
+
+def simulate_update_graphs(cpe: ClarkeParkExploration) -> str:
+    """Run one time slider update and serialize the outputs like dash does.
+
+    Args:
+        cpe: instance to update
+
+    Returns:
+        JSON response body
+    """
+    controls = dict(DEFAULT_CONTROLS)
+    controls["time_slider"] = (cpe.time_offset + 1.0 / cpe.slider_count) % 1.0
+    outputs = cpe.update("time_slider.value", **controls)
+    return json.dumps(outputs, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def get_stages(cpe: ClarkeParkExploration) -> Dict[str, Callable]:
+    """Get the callables timed for every benchmark case.
+
+    Args:
+        cpe: instance to time
+
+    Returns:
+        dictionary of stage name to callable
+    """
+    return {
+        "generate_three_phase_data": cpe.generate_three_phase_data,
+        "do_clarke_transform": cpe.do_clarke_transform,
+        "do_park_transform": cpe.do_park_transform,
+        "generate_figure_data": cpe.generate_figure_data,
+        "update_graphs": lambda: simulate_update_graphs(cpe),
+    }
+
+
+def time_call(function: Callable, repeat: int, min_time: float) -> float:
+    """Time a callable and return the best per-call time.
+
+    Args:
+        function: callable to time
+        repeat: number of timing repeats
+        min_time: minimum seconds spent in each repeat
+
+    Returns:
+        best seconds per call
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(
+    sample_counts: List[int], dtypes: List[str], repeat: int, min_time: float
+) -> Dict[str, float]:
+    """Time every stage for every sample count and precision.
+
+    Args:
+        sample_counts: sample counts to benchmark
+        dtypes: precision names to benchmark
+        repeat: number of timing repeats
+        min_time: minimum seconds spent in each repeat
+
+    Returns:
+        dictionary of "stage[samples,dtype]" to best seconds per call
+    """
+    results = {}
+    for sample_count in sample_counts:
+        for dtype in dtypes:
+            cpe = create_instance(sample_count, dtype)
+            for name, function in get_stages(cpe).items():
+                key = f"{name}[{sample_count},{dtype}]"
+                results[key] = time_call(function, repeat, min_time)
+                print(f"{key:<50} {results[key] * 1e6:12.2f} us")
+    return results
+
+
+def find_regressions(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> Dict[str, float]:
+    """Compare results against a baseline.
+
+    Args:
+        results: current timings
+        baseline: previous timings
+        threshold: allowed fractional slow down, e.g. 0.2 for 20%
+
+    Returns:
+        dictionary of regressed case to slow down ratio
+    """
+    regressions = {}
+    for key, seconds in results.items():
+        if key in baseline and baseline[key] > 0:
+            ratio = seconds / baseline[key]
+            if ratio > 1 + threshold:
+                regressions[key] = ratio
+    return regressions
+
+
+def check_allocations(sample_count: int, dtype: str, updates: int) -> Dict[str, int]:
+    """Trace the memory of steady state time slider updates of a browser session.
+
+    Args:
+        sample_count: number of samples along the time axis
+        dtype: floating point precision name
+        updates: number of traced updates
+
+    Returns:
+        dictionary with "growth", the bytes still held after the updates, and "transient",
+        the largest bytes held at once during the updates, both relative to the start
+    """
+    cpe = create_instance(sample_count, dtype)
+    sessions = ClarkeParkExploration.SESSIONS
+    ClarkeParkExploration.SESSIONS = SessionPool(lambda: cpe, sessions.default)
+    SHARED_FRAMES.open(f"clarke_park_bench_{os.getpid()}", capacity=sample_count)
+    controls = dict(DEFAULT_CONTROLS)
+    tracemalloc.start()
+    try:
+        with app.server.test_request_context("/" + DASH_UPDATE_PATH, method="POST"):
+            for update in range(WARMUP_UPDATES + updates):
+                if update == WARMUP_UPDATES:
+                    start, _ = tracemalloc.get_traced_memory()
+                    tracemalloc.reset_peak()
+                controls["time_slider"] = (update % cpe.slider_count) / cpe.slider_count
+                # DEFAULT_CONTROLS is in the order of update's arguments
+                ClarkeParkExploration.update_session(CHECK_SESSION, "time_slider.value", *controls.values())
+                # the end of each dash request releases the session
+                ClarkeParkExploration.SESSIONS.release()
+            end, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        SHARED_FRAMES.close()
+        ClarkeParkExploration.SESSIONS = sessions
+    return {"growth": end - start, "transient": peak - start}
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the benchmark command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the Clarke and Park pipeline.")
+    parser.add_argument("--samples", type=int, nargs="+", default=DEFAULT_SAMPLE_COUNTS)
+    parser.add_argument("--dtypes", nargs="+", default=DEFAULT_DTYPES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per repeat")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed fractional slow down")
+    parser.add_argument(
+        "--check-allocations", action="store_true", help="check that updates do not grow the Python heap"
+    )
+    parser.add_argument("--updates", type=int, default=10000, help="updates traced by --check-allocations")
+    args = parser.parse_args(argv)
+
+    if args.check_allocations:
+        failed = False
+        for sample_count in args.samples:
+            for dtype in args.dtypes:
+                memory = check_allocations(sample_count, dtype, args.updates)
+                budget = TRANSIENT_BYTES
+                key = f"allocations[{sample_count},{dtype}]"
+                print(f"{key:<50} growth {memory['growth']:8d} B, transient {memory['transient']:10d} B")
+                if memory["growth"] > GROWTH_TOLERANCE or memory["transient"] > budget:
+                    print(f"ALLOCATION {key}: over {GROWTH_TOLERANCE} B growth or {budget} B transient")
+                    failed = True
+        return 1 if failed else 0
+
+    results = run_benchmarks(args.samples, args.dtypes, args.repeat, args.min_time)
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(
+            {
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "results": results,
+            },
+            output_file,
+            indent=2,
+        )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = find_regressions(results, baseline, args.threshold)
+        for key, ratio in regressions.items():
+            print(f"REGRESSION {key}: {ratio:0.2f}x baseline")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
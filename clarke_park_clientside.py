@@ -0,0 +1,215 @@
+"""This python module supports computing the interactive plot in the browser.
+
+With browser compute on, assets/compute.js generates the waveforms, applies
+the Clarke and Park transforms and restyles the plot from the sliders without
+a server round trip, the server skips those slider updates. The Python code of
+ClarkeParkExploration stays the reference: the settings the browser needs are
+taken from an instance, and running this module checks that both
+implementations agree for random control values, using Node.js.
+
+Usage:
+    python clarke_park_clientside.py --cases 50
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from typing import Any, Dict, List
+import numpy as np
+
+COMPUTE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "compute.js")
+
+# controls whose updates the browser computes, by component id
+BROWSER_CONTROLS = [
+    "time_slider",
+    "frequency_slider",
+    "phaseA_amplitude_slider",
+    "phaseB_amplitude_slider",
+    "phaseC_amplitude_slider",
+    "phaseA_phase_slider",
+    "phaseB_phase_slider",
+    "phaseC_phase_slider",
+    "zerosequence_slider",
+    "harmonic5_slider",
+    "harmonic7_slider",
+    "harmonic11_slider",
+    "harmonic13_slider",
+    "phase_harmonic_amplitude",
+    "phase_harmonic_phase",
+]
+
+# largest allowed difference between the browser and the Python results
+TOLERANCE = 1e-9
+
+
+def get_compute_settings(
+    cpe: Any,
+    phase_shifts: np.ndarray,
+    zero_sequence_offsets: np.ndarray,
+    harmonic_orders: np.ndarray,
+    flat_view_axes: Dict[Any, tuple],
+    axis_titles: Dict[str, str],
+) -> Dict[str, Any]:
+    """Get the constants the browser computes the figure with.
+
+    Args:
+        cpe: ClarkeParkExploration instance whose figure the browser updates
+        phase_shifts: nominal angle of every phase in radians
+        zero_sequence_offsets: complex offset of every phase per unit of zero sequence
+        harmonic_orders: harmonic orders of the harmonic sliders
+        flat_view_axes: (horizontal, vertical) trace axes of each planar view
+        axis_titles: axis title of each trace axis
+
+    Returns:
+        settings passed to the compute.get_frame function of assets/compute.js
+    """
+    data = cpe.figure_data["data"]
+    return {
+        "sample_count": cpe.sample_count,
+        "phase_shifts": np.asarray(phase_shifts, dtype=float).tolist(),
+        "zero_sequence_offsets": [[offset.real, offset.imag] for offset in zero_sequence_offsets.tolist()],
+        "clarke_matrix": np.asarray(cpe.clarke_matrix, dtype=float).tolist(),
+        "harmonic_orders": np.asarray(harmonic_orders).tolist(),
+        "names": [trace["name"] for trace in data],
+        "phasors": [
+            [next(index for index, trace in enumerate(data) if trace is slot[0]), slot[1]]
+            for slot in cpe.phasor_slots
+        ],
+        "flat_axes": {
+            f"{axis_titles[horizontal]}|{axis_titles[vertical]}": [horizontal, vertical]
+            for horizontal, vertical in flat_view_axes.values()
+        },
+    }
+
+
+def run_browser_compute(settings: Dict[str, Any], cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run compute.get_frame of assets/compute.js with Node.js.
+
+    Args:
+        settings: settings from get_compute_settings
+        cases: control values of each case
+
+    Returns:
+        frame of each case
+    """
+    script = (
+        "global.window = {};"
+        + f"require({json.dumps(COMPUTE_SCRIPT)});"
+        + "var input = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+        + "var compute = window.dash_clientside.compute;"
+        + "var frames = input.cases.map(function (controls) {"
+        + "    return compute.get_frame(input.settings, controls);"
+        + "});"
+        + "process.stdout.write(JSON.stringify(frames));"
+    )
+    completed = subprocess.run(
+        ["node", "-e", script],
+        input=json.dumps({"settings": settings, "cases": cases}),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def main(argv: List[str] = None) -> int:
+    """Check that the browser and Python implementations agree.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status, 1 if any value differs by more than the tolerance
+    """
+    parser = argparse.ArgumentParser(description="Check the browser compute mode against the Python code.")
+    parser.add_argument("--cases", type=int, default=20, help="number of random control sets")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+    if shutil.which("node") is None:
+        print("Node.js is needed to run assets/compute.js")
+        return 1
+
+    import clarke_park_3d as page
+
+    cpe = page.ClarkeParkExploration()
+    settings = get_compute_settings(
+        cpe,
+        page.PHASE_SHIFTS,
+        page.ZERO_SEQUENCE_OFFSETS,
+        page.HARMONIC_ORDERS,
+        page.FLAT_VIEW_AXES,
+        page.AXIS_TITLES,
+    )
+    rng = np.random.default_rng(args.seed)
+    phase_harmonics = page.PHASE_COUNT * len(page.HARMONIC_ORDERS)
+    cases = []
+    for case in range(args.cases):
+        harmonics = rng.uniform(0, 0.2, 4) * (case % 2)
+        # every third case adds per-phase harmonics
+        phase_amplitudes = rng.uniform(-0.1, 0.1, phase_harmonics) * (case % 3 == 0)
+        phase_phases = rng.uniform(-1, 1, phase_harmonics) * (case % 3 == 0)
+        cases.append(
+            {
+                "time": round(float(rng.uniform(0, 1)), 2),
+                "frequency": float(rng.uniform(0.5, 5)),
+                "amplitudes": rng.uniform(0, 1.5, 3).tolist(),
+                "offsets": rng.uniform(-1, 1, 3).tolist(),
+                "zero_sequence": float(rng.uniform(0, 1)),
+                "harmonics": harmonics.tolist(),
+                "phase_harmonic_amplitudes": phase_amplitudes.tolist(),
+                "phase_harmonic_phases": phase_phases.tolist(),
+            }
+        )
+    frames = run_browser_compute(settings, cases)
+
+    worst = 0.0
+    for controls, frame in zip(cases, frames):
+        amplitudes, offsets, harmonics = controls["amplitudes"], controls["offsets"], controls["harmonics"]
+        cpe.update(
+            "check",
+            interval=0,
+            time_slider=controls["time"],
+            frequency_slider=controls["frequency"],
+            phaseA_amplitude_slider=amplitudes[0],
+            phaseB_amplitude_slider=amplitudes[1],
+            phaseC_amplitude_slider=amplitudes[2],
+            phaseA_phase_slider=offsets[0],
+            phaseB_phase_slider=offsets[1],
+            phaseC_phase_slider=offsets[2],
+            size_slider=700,
+            zero_sequence_slider=controls["zero_sequence"],
+            btn1=0,
+            btn2=0,
+            btn3=0,
+            btn4=0,
+            projection_isometric=False,
+            run_mode=False,
+            harmonic5_slider=harmonics[0],
+            harmonic7_slider=harmonics[1],
+            harmonic11_slider=harmonics[2],
+            harmonic13_slider=harmonics[3],
+            webgl_2d=False,
+            phase_harmonic_amplitudes=controls["phase_harmonic_amplitudes"],
+            phase_harmonic_phases=controls["phase_harmonic_phases"],
+        )
+        data = cpe.figure_data["data"]
+        if frame["names"] != [trace["name"] for trace in data]:
+            print(f"trace names differ for {controls}")
+            return 1
+        for axis in ("y", "z"):
+            for trace, values in zip(data, frame["traces"][axis]):
+                worst = max(worst, float(np.max(np.abs(np.asarray(trace[axis], dtype=float) - values))))
+        worst = max(worst, float(np.max(np.abs(np.subtract(cpe.unbalance, frame["unbalance"])))))
+        equation_values = np.subtract(cpe.get_equation_values(), frame["equation_values"])
+        worst = max(worst, float(np.max(np.abs(equation_values))))
+    print(f"{len(cases)} cases, largest difference {worst:0.3g}, tolerance {TOLERANCE:0.0e}")
+    return 0 if worst <= TOLERANCE else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""This python module indexes recordings for fast event queries.
+
+The index is built in one streaming pass over a recording and stored next to
+the data, along with the recording's stamp so it is built again when the data
+is rewritten. For every block of EVENT_BLOCK samples of every channel it keeps the
+minimum, the maximum and the mean, plus each channel's blocks sorted by their
+largest magnitude along with those sorted magnitudes.
+
+Threshold queries such as "all intervals where |q| > 1.2" binary search the
+sorted magnitudes for the few blocks that can hold a crossing, then read only
+those blocks of raw data to place the crossings on exact samples. Drift queries
+compare the block means against the median block mean of the recording, for
+slow envelope excursions such as a drifting d axis or a neutral sum departing
+from zero.
+
+Usage:
+    python clarke_park_events.py capture q 1.2
+    python clarke_park_events.py capture d 0.05 --mode drift
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Tuple
+import numpy as np
+from clarke_park_recording import CHANNEL_INDEX, CHANNELS, Recording
+
+EVENT_BLOCK = 1024
+
+# query modes: |x| above the threshold, x above it, x below it, or block means drifting from the median
+EVENT_MODES = ["abs", "above", "below", "drift"]
+
+SUMMARY_FILE = "events_blocks.npy"
+ORDER_FILE = "events_order.npy"
+PEAKS_FILE = "events_peaks.npy"
+# block size and recording stamp of the index, written last
+INDEX_FILE = "events.json"
+
+# blocks summarized at a time
+CHUNK_BLOCKS = 1 << 10
+
+Interval = Tuple[float, float, float]
+
+
+def build_index(recording: Recording) -> None:
+    """Build and store the event index of a recording.
+
+    Args:
+        recording: recording to index
+    """
+    data = recording.data
+    blocks = -(-recording.sample_count // EVENT_BLOCK)
+    summary = np.lib.format.open_memmap(
+        recording.get_path(SUMMARY_FILE), mode="w+", dtype=np.float32, shape=(3, len(CHANNELS), blocks)
+    )
+    step = CHUNK_BLOCKS * EVENT_BLOCK
+    for start in range(0, recording.sample_count, step):
+        chunk = np.asarray(data[:, start : start + step], dtype=np.float64)
+        first = start // EVENT_BLOCK
+        count = chunk.shape[1] // EVENT_BLOCK
+        if count > 0:
+            full = chunk[:, : count * EVENT_BLOCK].reshape(len(CHANNELS), count, EVENT_BLOCK)
+            summary[0, :, first : first + count] = np.min(full, axis=2)
+            summary[1, :, first : first + count] = np.max(full, axis=2)
+            summary[2, :, first : first + count] = np.mean(full, axis=2)
+        if chunk.shape[1] % EVENT_BLOCK:
+            # the last block of the recording is partial
+            rest = chunk[:, count * EVENT_BLOCK :]
+            summary[:, :, first + count] = [np.min(rest, axis=1), np.max(rest, axis=1), np.mean(rest, axis=1)]
+    summary.flush()
+
+    peaks = np.maximum(np.abs(summary[0]), np.abs(summary[1]))
+    order = np.argsort(peaks, axis=1, kind="stable").astype(np.int64)
+    np.save(recording.get_path(PEAKS_FILE), np.take_along_axis(peaks, order, axis=1))
+    np.save(recording.get_path(ORDER_FILE), order)
+    with open(recording.get_path(INDEX_FILE), "w", encoding="utf-8") as index_file:
+        json.dump({"event_block": EVENT_BLOCK, "stamp": recording.get_stamp()}, index_file, indent=2)
+
+
+def is_index_current(recording: Recording) -> bool:
+    """Check that the stored event index was built from the current data with the current block size.
+
+    Args:
+        recording: recording
+
+    Returns:
+        True if the index can be used
+    """
+    if not os.path.exists(recording.get_path(INDEX_FILE)):
+        return False
+    with open(recording.get_path(INDEX_FILE), encoding="utf-8") as index_file:
+        settings = json.load(index_file)
+    return settings.get("event_block") == EVENT_BLOCK and settings.get("stamp") == recording.get_stamp()
+
+
+def merge_runs(starts: np.ndarray, stops: np.ndarray, gap: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge sorted runs separated by fewer than gap samples.
+
+    Args:
+        starts: first index of each run, sorted
+        stops: index after the last of each run
+        gap: largest gap merged
+
+    Returns:
+        merged starts and stops
+    """
+    if len(starts) == 0:
+        return starts, stops
+    keep = np.concatenate([[True], starts[1:] - stops[:-1] > gap])
+    merged_starts = starts[keep]
+    merged_stops = np.maximum.reduceat(stops, np.flatnonzero(keep))
+    return merged_starts, merged_stops
+
+
+def get_extreme(values: np.ndarray, mode: str) -> float:
+    """Get the value furthest past the threshold.
+
+    Args:
+        values: values past the threshold
+        mode: one of "abs", "above" or "below"
+
+    Returns:
+        largest magnitude, maximum or minimum
+    """
+    if mode == "abs":
+        return float(values[np.argmax(np.abs(values))])
+    return float(np.max(values) if mode == "above" else np.min(values))
+
+
+def get_extremes(values: np.ndarray, starts: np.ndarray, mode: str) -> np.ndarray:
+    """Get the value furthest past the threshold of every segment at once.
+
+    Args:
+        values: values, the segments are back to back
+        starts: first index of each segment, sorted, a segment ends where the next one starts
+        mode: one of "abs", "above" or "below"
+
+    Returns:
+        largest magnitude, maximum or minimum of each segment
+    """
+    if mode == "below":
+        return np.minimum.reduceat(values, starts)
+    largest = np.maximum.reduceat(values, starts)
+    if mode == "above":
+        return largest
+    smallest = np.minimum.reduceat(values, starts)
+    return np.where(largest >= -smallest, largest, smallest)
+
+
+def find_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the runs of true values.
+
+    Args:
+        mask: boolean values
+
+    Returns:
+        first index of each run and the index after its last
+    """
+    edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class EventIndex:
+    """Range queries over the block summaries of a recording."""
+
+    def __init__(self, recording: Recording) -> None:
+        """Open the event index of a recording, building it first if it is missing or out of date.
+
+        Args:
+            recording: recording to query
+        """
+        self.recording = recording
+        if not is_index_current(recording):
+            build_index(recording)
+        self.summary = np.load(recording.get_path(SUMMARY_FILE), mmap_mode="r")
+        self.order = np.load(recording.get_path(ORDER_FILE), mmap_mode="r")
+        self.peaks = np.load(recording.get_path(PEAKS_FILE), mmap_mode="r")
+        self.medians = np.median(self.summary[2], axis=1)
+
+    def get_candidate_blocks(self, channel: int, threshold: float, mode: str) -> np.ndarray:
+        """Get the blocks that can hold a sample past a threshold.
+
+        Args:
+            channel: channel index
+            threshold: threshold
+            mode: one of "abs", "above" or "below"
+
+        Returns:
+            sorted block numbers
+        """
+        if mode == "abs":
+            # blocks are sorted by peak magnitude, so the candidates are a tail of the order
+            first = np.searchsorted(self.peaks[channel], threshold, side="right")
+            return np.sort(self.order[channel, first:])
+        if mode == "above":
+            return np.flatnonzero(self.summary[1, channel] > threshold)
+        return np.flatnonzero(self.summary[0, channel] < threshold)
+
+    def query(self, channel: str, threshold: float, mode: str = "abs", gap: float = None) -> List[Interval]:
+        """Find the intervals where a channel passes a threshold.
+
+        Args:
+            channel: channel name, see CHANNELS
+            threshold: threshold, for "drift" the largest departure of block means from their median
+            mode: one of EVENT_MODES
+            gap: events closer than this many seconds are merged, one fundamental period by default
+
+        Returns:
+            start and stop in seconds and the extreme value of each interval
+        """
+        index = CHANNEL_INDEX[channel]
+        rate = self.recording.sample_rate
+        if gap is None:
+            gap = 1 / self.recording.frequency if self.recording.frequency > 0 else EVENT_BLOCK / rate
+        gap_samples = int(round(gap * rate))
+
+        if mode == "drift":
+            departure = np.asarray(self.summary[2, index], dtype=np.float64) - self.medians[index]
+            starts, stops = find_runs(np.abs(departure) > threshold)
+            starts, stops = merge_runs(starts, stops, -(-gap_samples // EVENT_BLOCK))
+            return [
+                (
+                    float(start * EVENT_BLOCK / rate),
+                    float(min(stop * EVENT_BLOCK, self.recording.sample_count) / rate),
+                    get_extreme(departure[start:stop], "abs") + float(self.medians[index]),
+                )
+                for start, stop in zip(starts, stops)
+            ]
+
+        # read only the candidate blocks, grouped into contiguous runs of blocks
+        candidates = self.get_candidate_blocks(index, threshold, mode)
+        if len(candidates) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(candidates) != 1) + 1
+        block_starts = candidates[np.concatenate([[0], breaks])]
+        block_stops = candidates[np.concatenate([breaks, [len(candidates)]]) - 1] + 1
+        # values outside the runs are replaced by one that never wins, so each run's extreme is the
+        # extreme of the segment from its start to the next run's start
+        fill = {"abs": 0.0, "above": -np.inf, "below": np.inf}[mode]
+        starts, stops, extremes = [], [], []
+        for block_start, block_stop in zip(block_starts, block_stops):
+            first = block_start * EVENT_BLOCK
+            values = self.recording.data[index, first : block_stop * EVENT_BLOCK].astype(np.float64)
+            if mode == "abs":
+                mask = np.abs(values) > threshold
+            elif mode == "above":
+                mask = values > threshold
+            else:
+                mask = values < threshold
+            run_starts, run_stops = find_runs(mask)
+            if len(run_starts) > 0:
+                starts.append(first + run_starts)
+                stops.append(first + run_stops)
+                extremes.append(get_extremes(np.where(mask, values, fill), run_starts, mode))
+        if not starts:
+            return []
+
+        run_starts = np.concatenate(starts).astype(np.int64)
+        run_stops = np.concatenate(stops).astype(np.int64)
+        merged_starts, merged_stops = merge_runs(run_starts, run_stops, gap_samples)
+        # runs are sorted, so the runs of each event are back to back
+        run_events = np.searchsorted(merged_starts, run_starts, side="right") - 1
+        event_firsts = np.concatenate([[0], np.flatnonzero(np.diff(run_events)) + 1])
+        event_extremes = get_extremes(np.concatenate(extremes), event_firsts, mode)
+        return list(
+            zip(
+                (merged_starts / rate).tolist(),
+                (merged_stops / rate).tolist(),
+                event_extremes.tolist(),
+            )
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the event query command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Find events in a recording.")
+    parser.add_argument("directory", help="recording directory")
+    parser.add_argument("channel", choices=CHANNELS, help="channel to search")
+    parser.add_argument("threshold", type=float, help="threshold")
+    parser.add_argument("--mode", choices=EVENT_MODES, default="abs", help="comparison with the threshold")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index first")
+    args = parser.parse_args(argv)
+    recording = Recording(args.directory)
+    if args.rebuild:
+        build_index(recording)
+    for start, stop, extreme in EventIndex(recording).query(args.channel, args.threshold, args.mode):
+        print(f"{start:12.4f} s  {stop:12.4f} s  {extreme:10.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""This python script exports Clarke and Park animations as image sequences and videos.
+
+Every frame is built by the same figure code as the web page, for a time
+offset stepping through the requested range, and rendered to PNG across a
+process pool. Frames are rendered by a small NumPy rasterizer by default, or by
+kaleido (plotly's static image exporter) when it is installed and selected.
+The PNG frames are assembled into an MP4 or GIF with a local ffmpeg.
+
+Usage:
+    python clarke_park_export.py --frames 600 --output clip.mp4
+    python clarke_park_export.py --start 0 --stop 2 --phaseB-amplitude 0.9 --output sag.gif
+    python clarke_park_export.py --frames 100 --output frames/
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from clarke_park_3d import CAMERA_PRESETS, FLAT_VIEW_AXES, HARMONIC_ORDERS, ClarkeParkExploration, FocusAxis
+
+BACKGROUND = (34, 34, 34)
+
+# (on, period) lengths in pixels of the plotly dash styles
+DASH_PATTERNS = {
+    "solid": None,
+    "dot": (3, 6),
+    "dash": (9, 14),
+}
+
+# instance used by each worker process
+WORKER: Optional[ClarkeParkExploration] = None
+
+
+def parse_color(color: str) -> Optional[Tuple[int, int, int]]:
+    """Convert a plotly color string to RGB.
+
+    Args:
+        color: "#RRGGBB" or "rgba(...)" color
+
+    Returns:
+        RGB tuple, or None for transparent colors
+    """
+    if color.startswith("#"):
+        return (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+    values = [float(value) for value in color[color.index("(") + 1 : color.index(")")].split(",")]
+    if len(values) == 4 and values[3] == 0:
+        return None
+    return (int(values[0]), int(values[1]), int(values[2]))
+
+
+def get_projection(focus: FocusAxis) -> np.ndarray:
+    """Get the orthographic projection of a camera preset.
+
+    Args:
+        focus: camera preset
+
+    Returns:
+        2x3 matrix mapping normalized scene coordinates to screen right/up coordinates
+    """
+    camera = CAMERA_PRESETS[focus]
+    eye = np.array([camera["eye"]["x"], camera["eye"]["y"], camera["eye"]["z"]])
+    up = np.array([camera["up"]["x"], camera["up"]["y"], camera["up"]["z"]])
+    forward = -eye / np.linalg.norm(eye)
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+    return np.array([right, np.cross(right, forward)])
+
+
+def draw_polyline(
+    image: np.ndarray,
+    columns: np.ndarray,
+    rows: np.ndarray,
+    color: Tuple[int, int, int],
+    width: float,
+    dash: str,
+) -> None:
+    """Draw a polyline into an image by stamping points along every segment.
+
+    Args:
+        image: RGB image, updated in place
+        columns: pixel columns of the vertices
+        rows: pixel rows of the vertices
+        color: RGB line color
+        width: line width in pixels
+        dash: plotly dash style
+    """
+    if len(columns) < 2:
+        return
+    lengths = np.hypot(np.diff(columns), np.diff(rows))
+    steps = np.ceil(lengths).astype(int) + 1
+    segment = np.repeat(np.arange(len(lengths)), steps)
+    fraction = (np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(
+        np.maximum(steps - 1, 1), steps
+    )
+    x = columns[segment] + fraction * (columns[segment + 1] - columns[segment])
+    y = rows[segment] + fraction * (rows[segment + 1] - rows[segment])
+    pattern = DASH_PATTERNS.get(dash)
+    if pattern is not None:
+        distance = np.concatenate([[0.0], np.cumsum(lengths)])[segment] + fraction * lengths[segment]
+        keep = (distance % pattern[1]) < pattern[0]
+        x = x[keep]
+        y = y[keep]
+    radius = max(int(width // 2), 0)
+    height, image_width, _ = image.shape
+    # stamp a square brush on every distinct pixel center in one fancy indexing pass
+    centers = np.unique(np.rint(y).astype(int) * image_width + np.rint(x).astype(int))
+    brush = np.arange(-radius, radius + 1)
+    stamp_rows = (centers // image_width)[:, np.newaxis, np.newaxis] + brush[np.newaxis, :, np.newaxis]
+    stamp_columns = (centers % image_width)[:, np.newaxis, np.newaxis] + brush[np.newaxis, np.newaxis, :]
+    stamp_rows, stamp_columns = np.broadcast_arrays(stamp_rows, stamp_columns)
+    inside = (stamp_rows >= 0) & (stamp_rows < height) & (stamp_columns >= 0) & (stamp_columns < image_width)
+    image[stamp_rows[inside], stamp_columns[inside]] = color
+
+
+def rasterize_figure(figure: dict, focus: FocusAxis, width: int, height: int) -> np.ndarray:
+    """Render the line traces of a figure into an RGB image.
+
+    3D figures are drawn with an orthographic projection of the focus camera
+    and axes scaled to a cube, 2D figures are drawn on their own axes.
+
+    Args:
+        figure: plotly figure dictionary
+        focus: camera preset of 3D figures, or the planar view of 2D figures
+        width: image width in pixels
+        height: image height in pixels
+
+    Returns:
+        image, shape (height, width, 3)
+    """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = BACKGROUND
+    traces = [
+        trace
+        for trace in figure["data"]
+        if trace.get("visible", True) is True and parse_color(trace["line"]["color"]) is not None
+    ]
+    flat = figure["data"][0]["type"] != "scatter3d"
+    points = [
+        np.array([trace["x"], trace["y"]] if flat else [trace["x"], trace["y"], trace["z"]], dtype=float)
+        for trace in traces
+    ]
+    ranges = np.array(figure["data"][0]["y"], dtype=float)
+    extent = max(abs(ranges[0]), abs(ranges[1]), 1e-9)
+    if flat:
+        # the time axis runs from 0 to 1, the others from -extent to extent
+        axes = FLAT_VIEW_AXES[focus]
+        scale = np.array([[2.0 if axis == "x" else 1 / extent] for axis in axes])
+        shift = np.array([[-1.0 if axis == "x" else 0.0] for axis in axes])
+        screens = [point * scale + shift for point in points]
+        limit = 1.0
+    else:
+        projection = get_projection(focus)
+        scale = np.array([[2.0], [1 / extent], [1 / extent]])
+        shift = np.array([[-1.0], [0.0], [0.0]])
+        screens = [projection @ (point * scale + shift) for point in points]
+        limit = np.sqrt(3)
+    pixels = 0.48 * min(width, height) / limit
+    for trace, screen in zip(traces, screens):
+        columns = width / 2 + screen[0] * pixels
+        rows = height / 2 - screen[1] * pixels
+        line = trace["line"]
+        draw_polyline(
+            image, columns, rows, parse_color(line["color"]), line["width"], line.get("dash", "solid")
+        )
+    return image
+
+
+def write_png(path: str, image: np.ndarray) -> None:
+    """Write an RGB image as a PNG file.
+
+    Args:
+        path: output file path
+        image: image, shape (height, width, 3) of uint8
+    """
+    height, width, _ = image.shape
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        checksum = struct.pack(">I", zlib.crc32(kind + payload))
+        return struct.pack(">I", len(payload)) + kind + payload + checksum
+
+    with open(path, "wb") as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n")
+        png_file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        png_file.write(chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 1)))
+        png_file.write(chunk(b"IEND", b""))
+
+
+def init_worker(controls: Dict) -> None:
+    """Create the figure instance of a worker process.
+
+    Args:
+        controls: instance attribute values, plus "sample_count" and "harmonics"
+    """
+    global WORKER
+    WORKER = ClarkeParkExploration(sample_count=controls["sample_count"])
+    for name, value in controls.items():
+        if name not in ("sample_count", "harmonics"):
+            setattr(WORKER, name, value)
+    WORKER.harmonic_amplitudes[:] = controls["harmonics"]
+
+
+def render_frames(frames: List[Tuple[int, float]], directory: str, renderer: str) -> List[str]:
+    """Render frames in a worker process.
+
+    Args:
+        frames: (frame index, time offset) pairs
+        directory: directory receiving the PNG files
+        renderer: "numpy" or "kaleido"
+
+    Returns:
+        paths of the written frames
+    """
+    paths = []
+    for index, time_offset in frames:
+        WORKER.time_offset = time_offset
+        WORKER.generate_figure_data()
+        figure = WORKER.get_figure()
+        path = os.path.join(directory, f"frame_{index:05d}.png")
+        if renderer == "kaleido":
+            import plotly.io  # pylint: disable=import-outside-toplevel
+
+            plotly.io.write_image(figure, path, format="png", width=WORKER.width, height=WORKER.height)
+        else:
+            image = rasterize_figure(figure, WORKER.focus_selection, int(WORKER.width), int(WORKER.height))
+            write_png(path, image)
+        paths.append(path)
+    return paths
+
+
+def export_frames(
+    controls: Dict, start: float, stop: float, frame_count: int, directory: str, workers: int, renderer: str
+) -> List[str]:
+    """Render every frame of a time range across a process pool.
+
+    Frames left in the directory by an earlier export are removed first, so a
+    shorter export does not pick up the extra frames of a longer one.
+
+    Args:
+        controls: instance attribute values, plus "sample_count" and "harmonics"
+        start: first time offset
+        stop: last time offset
+        frame_count: number of frames
+        directory: directory receiving the PNG files
+        workers: number of worker processes
+        renderer: "numpy" or "kaleido"
+
+    Returns:
+        paths of the written frames in order
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.startswith("frame_") and name.endswith(".png"):
+            os.remove(os.path.join(directory, name))
+    frames = list(enumerate(np.linspace(start, stop, frame_count, endpoint=False)))
+    batches = [frames[index::workers] for index in range(workers)]
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(controls,)) as pool:
+        for batch_paths in pool.map(render_frames, batches, [directory] * workers, [renderer] * workers):
+            paths.extend(batch_paths)
+    return sorted(paths)
+
+
+def encode_video(directory: str, output: str, fps: int) -> None:
+    """Assemble PNG frames into an MP4 or GIF with ffmpeg.
+
+    Args:
+        directory: directory holding frame_00000.png and onwards
+        output: video file path, the extension selects the format
+        fps: frames per second
+
+    Raises:
+        RuntimeError: if ffmpeg is not installed
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError(f"ffmpeg was not found, the frames are in {directory}")
+    command = [ffmpeg, "-y", "-loglevel", "error", "-framerate", str(fps)]
+    command += ["-i", os.path.join(directory, "frame_%05d.png")]
+    if output.lower().endswith(".gif"):
+        command += ["-vf", "split[a][b];[a]palettegen[p];[b][p]paletteuse"]
+    else:
+        command += ["-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+    subprocess.run(command + [output], check=True)
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the export command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Export Clarke and Park animations.")
+    parser.add_argument(
+        "--output", default="clarke_park.mp4", help=".mp4, .gif, or a directory for PNG frames"
+    )
+    parser.add_argument("--start", type=float, default=0.0, help="first time offset")
+    parser.add_argument("--stop", type=float, default=1.0, help="time offset after the last frame")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--renderer", choices=["numpy", "kaleido"], default="numpy")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--size", type=int, default=700, help="image height, the width is 1.25 times larger")
+    parser.add_argument("--view", choices=[focus.name for focus in CAMERA_PRESETS], default="XYZ")
+    parser.add_argument("--webgl-2d", action="store_true", help="draw planar views as 2D plots")
+    parser.add_argument("--frequency", type=float, default=1.0)
+    parser.add_argument("--zero-sequence", type=float, default=0.0)
+    for phase in "ABC":
+        parser.add_argument(f"--phase{phase}-amplitude", type=float, default=1.0)
+        parser.add_argument(f"--phase{phase}-offset", type=float, default=0.0)
+    for order in HARMONIC_ORDERS:
+        parser.add_argument(
+            f"--harmonic{order}", type=float, default=0.0, help=f"{order}th harmonic amplitude"
+        )
+    args = parser.parse_args(argv)
+
+    controls = {
+        "sample_count": args.samples,
+        "harmonics": [getattr(args, f"harmonic{order}") for order in HARMONIC_ORDERS],
+        "frequency": args.frequency,
+        "zero_sequence": args.zero_sequence,
+        "height": args.size,
+        "width": args.size * 1.25,
+        "focus_selection": FocusAxis[args.view],
+        "webgl_2d": args.webgl_2d,
+        "projection": "orthographic",
+    }
+    for phase in "ABC":
+        controls[f"phase{phase}_amplitude"] = getattr(args, f"phase{phase}_amplitude")
+        controls[f"phase{phase}_offset"] = getattr(args, f"phase{phase}_offset")
+
+    video = os.path.splitext(args.output)[1].lower() in (".mp4", ".gif")
+    directory = os.path.splitext(args.output)[0] + "_frames" if video else args.output
+    started = time.perf_counter()
+    paths = export_frames(
+        controls, args.start, args.stop, args.frames, directory, args.workers, args.renderer
+    )
+    print(f"rendered {len(paths)} frames to {directory} in {time.perf_counter() - started:0.2f} s")
+    if video:
+        encode_video(directory, args.output, args.fps)
+        print(f"wrote {args.output} in {time.perf_counter() - started:0.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""This python module fits the page's phase settings to measured three-phase windows.
+
+For a known frequency every phase of ClarkeParkExploration.generate_three_phase_data
+is linear in a cosine, a sine and a constant:
+
+    A cos(ωt + φ) - c = A cos φ cos ωt - A sin φ sin ωt - c
+
+so the amplitudes, offsets and zero sequence of a window come from one linear
+least squares solve. The normal equations of every window are built with
+batched matrix products and solved together by np.linalg.solve over a
+(windows, 3, 3) stack, so thousands of windows cost a few NumPy calls instead
+of a Python loop or an iterative optimizer per window.
+
+Unknown frequencies are searched over a range, by default one spectrum bin
+around the mean phase step of each window's Clarke space vector α + jβ. The
+residual of every window is computed at once on a grid of candidates a quarter
+of a bin apart, and the best candidate is refined by a batched parabolic search:
+every window's residual at three candidate frequencies is computed at once and
+the parabola through them moves each estimate.
+
+Times are measured back from the last sample of a window, like the page's time
+axis, so the fitted offsets reproduce the window on the page with the time
+slider at 0.
+
+Usage:
+    python clarke_park_fit.py --windows 5000 --samples 200
+    python clarke_park_fit.py --recording capture --window 0.05
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from clarke_park_multiphase import get_phase_shifts, get_zero_sequence_offsets
+from clarke_park_recording import CHANNEL_INDEX, Recording
+
+TWO_PI = 2 * np.pi
+PHASE_COUNT = 3
+PHASE_SHIFTS = get_phase_shifts(PHASE_COUNT)
+
+# constant each phase is shifted by per unit of zero sequence, the page subtracts the real offsets
+ZERO_SEQUENCE_SHIFTS = -get_zero_sequence_offsets(PHASE_COUNT).real
+
+# parabolic search steps refining the frequency
+REFINE_ITERATIONS = 6
+
+# frequency search grid spacing and refinement start step, in spectrum bins of a window
+SEARCH_STEP = 0.25
+
+# part of a recording's nominal frequency searched on either side of it
+NOMINAL_DEVIATION = 0.1
+
+# fundamental periods in each window fitted to a recording for the sliders
+FIT_CYCLES = 2
+
+# windows of a recording fitted together, between progress reports
+FIT_BATCH = 1024
+
+# range of each slider the fitted values are pushed to
+SLIDER_RANGES = {
+    "frequency_slider": (0.5, 5.0),
+    "phaseA_amplitude_slider": (0.1, 2.0),
+    "phaseB_amplitude_slider": (0.1, 2.0),
+    "phaseC_amplitude_slider": (0.1, 2.0),
+    "phaseA_phase_slider": (-1.0, 1.0),
+    "phaseB_phase_slider": (-1.0, 1.0),
+    "phaseC_phase_slider": (-1.0, 1.0),
+    "zerosequence_slider": (0.0, 1.0),
+}
+
+
+def split_windows(phases: np.ndarray, window_size: int) -> np.ndarray:
+    """Split phase samples into back to back windows, a partial last window is dropped.
+
+    Args:
+        phases: phases a, b and c, shape (3, samples)
+        window_size: samples per window
+
+    Returns:
+        windows, shape (windows, 3, window_size)
+    """
+    count = np.shape(phases)[1] // window_size
+    windows = np.asarray(phases[:, : count * window_size], dtype=np.float64)
+    return windows.reshape(PHASE_COUNT, count, window_size).transpose(1, 0, 2)
+
+
+def get_window_times(window_size: int, sample_rate: float) -> np.ndarray:
+    """Get the sample times of a window, measured back from its last sample.
+
+    Args:
+        window_size: samples per window
+        sample_rate: samples per second
+
+    Returns:
+        seconds, from -(window_size - 1) / sample_rate to 0
+    """
+    return (np.arange(window_size) - (window_size - 1)) / sample_rate
+
+
+def solve_linear(windows: np.ndarray, frequency: np.ndarray, sample_rate: float) -> Dict[str, np.ndarray]:
+    """Fit the cosine, sine and constant of every phase of every window at known frequencies.
+
+    Args:
+        windows: phases a, b and c of each window, shape (windows, 3, samples)
+        frequency: fundamental frequency of each window in Hz, shape (windows,)
+        sample_rate: samples per second
+
+    Returns:
+        dictionary with "coefficients", the cosine, sine and constant weights of each phase,
+        shape (windows, 3, phases), and "residual", the sum of squared errors of each window, shape (windows,)
+    """
+    angle = (TWO_PI * np.asarray(frequency, dtype=np.float64))[:, np.newaxis] * get_window_times(
+        windows.shape[2], sample_rate
+    )
+    basis = np.empty((windows.shape[0], 3, windows.shape[2]))
+    np.cos(angle, out=basis[:, 0])
+    np.sin(angle, out=basis[:, 1])
+    basis[:, 2] = 1.0
+    gram = basis @ basis.transpose(0, 2, 1)
+    projection = basis @ windows.transpose(0, 2, 1)
+    coefficients = np.linalg.solve(gram, projection)
+    residual = np.einsum("wps,wps->w", windows, windows) - np.einsum("wbp,wbp->w", coefficients, projection)
+    return {"coefficients": coefficients, "residual": np.maximum(residual, 0.0)}
+
+
+def estimate_frequency(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+    """Estimate the fundamental frequency of every window from the rotation of its Clarke space vector.
+
+    Args:
+        windows: phases a, b and c of each window, shape (windows, 3, samples)
+        sample_rate: samples per second
+
+    Returns:
+        frequency of each window in Hz, shape (windows,)
+    """
+    centered = windows - windows.mean(axis=2, keepdims=True)
+    alpha = (2 * centered[:, 0] - centered[:, 1] - centered[:, 2]) / 3
+    beta = (centered[:, 1] - centered[:, 2]) / np.sqrt(3)
+    vector = alpha + 1j * beta
+    step = np.angle(np.sum(vector[:, 1:] * np.conj(vector[:, :-1]), axis=1))
+    return np.abs(step) * sample_rate / TWO_PI
+
+
+def get_bin_width(windows: np.ndarray, sample_rate: float) -> float:
+    """Get the spectrum bin width of the windows.
+
+    Args:
+        windows: phases a, b and c of each window, shape (windows, 3, samples)
+        sample_rate: samples per second
+
+    Returns:
+        frequency in Hz
+    """
+    return sample_rate / windows.shape[2]
+
+
+def search_frequency(
+    windows: np.ndarray, sample_rate: float, low: np.ndarray, high: np.ndarray
+) -> np.ndarray:
+    """Find the grid frequency with the smallest least squares residual for every window.
+
+    Args:
+        windows: phases a, b and c of each window, shape (windows, 3, samples)
+        sample_rate: samples per second
+        low: lowest frequency in Hz, one for all or one per window
+        high: highest frequency in Hz, one for all or one per window
+
+    Returns:
+        frequency of each window in Hz, shape (windows,)
+    """
+    spacing = SEARCH_STEP * get_bin_width(windows, sample_rate)
+    low = np.broadcast_to(np.maximum(low, 2 * spacing), (windows.shape[0],))
+    high = np.broadcast_to(np.maximum(high, low), (windows.shape[0],))
+    count = int(np.ceil(np.max(high - low) / spacing)) + 1
+    best = low.copy()
+    smallest = np.full(windows.shape[0], np.inf)
+    for candidate in range(count):
+        frequency = np.minimum(low + candidate * spacing, high)
+        residual = solve_linear(windows, frequency, sample_rate)["residual"]
+        better = residual < smallest
+        best[better] = frequency[better]
+        smallest[better] = residual[better]
+    return best
+
+
+def refine_frequency(
+    windows: np.ndarray, frequency: np.ndarray, sample_rate: float, iterations: int = REFINE_ITERATIONS
+) -> np.ndarray:
+    """Refine frequencies by a parabolic search of the least squares residual of every window at once.
+
+    Args:
+        windows: phases a, b and c of each window, shape (windows, 3, samples)
+        frequency: starting frequency of each window in Hz, shape (windows,)
+        sample_rate: samples per second
+        iterations: search steps, each shrinks the step by four
+
+    Returns:
+        frequency of each window in Hz, shape (windows,)
+    """
+    # below half a bin the cosine and the constant blur together
+    lowest = SEARCH_STEP * get_bin_width(windows, sample_rate)
+    frequency = np.maximum(np.array(frequency, dtype=np.float64), 2 * lowest)
+    step = np.full(len(frequency), lowest)
+    for _ in range(iterations):
+        below, center, above = (
+            solve_linear(windows, frequency + offset, sample_rate)["residual"]
+            for offset in (-step, 0.0, step)
+        )
+        curvature = below - 2 * center + above
+        # the vertex of the parabola through the three residuals, or a step downhill where it opens downwards
+        vertex = np.where(
+            curvature > 0,
+            0.5 * step * (below - above) / np.where(curvature > 0, curvature, 1.0),
+            np.where(below < above, -step, step),
+        )
+        frequency = np.maximum(frequency + np.clip(vertex, -step, step), 2 * lowest)
+        step /= 4
+    return frequency
+
+
+def fit_windows(
+    windows: np.ndarray,
+    sample_rate: float,
+    frequency: Optional[np.ndarray] = None,
+    frequency_range: Optional[Tuple[float, float]] = None,
+    iterations: int = REFINE_ITERATIONS,
+) -> Dict[str, np.ndarray]:
+    """Fit the page's phase settings to every window.
+
+    Args:
+        windows: phases a, b and c of each window, shape (windows, 3, samples)
+        sample_rate: samples per second
+        frequency: optional known frequency in Hz, one for all or one per window, skips the frequency search
+        frequency_range: optional lowest and highest frequency in Hz searched, by default one spectrum bin
+            around the rotation of each window's Clarke space vector
+        iterations: frequency refinement steps
+
+    Returns:
+        dictionary with "frequency" in Hz, shape (windows,), "amplitudes" and "offsets" in units of pi
+        relative to each phase's nominal angle at the last sample, shape (windows, 3), "zero_sequence",
+        shape (windows,), and "rms_error", the RMS residual of each window, shape (windows,)
+    """
+    windows = np.asarray(windows, dtype=np.float64)
+    if frequency is None:
+        if frequency_range is None:
+            estimate = estimate_frequency(windows, sample_rate)
+            bin_width = get_bin_width(windows, sample_rate)
+            frequency_range = (estimate - bin_width, estimate + bin_width)
+        frequency = search_frequency(windows, sample_rate, *frequency_range)
+        frequency = refine_frequency(windows, frequency, sample_rate, iterations)
+    frequency = np.broadcast_to(np.asarray(frequency, dtype=np.float64), (windows.shape[0],))
+    solution = solve_linear(windows, frequency, sample_rate)
+    cosine, sine, constant = solution["coefficients"].transpose(1, 0, 2)
+    angle = np.arctan2(-sine, cosine) - PHASE_SHIFTS
+    # the least squares zero sequence of the constants, phase A stays in place
+    zero_sequence = constant @ ZERO_SEQUENCE_SHIFTS / np.dot(ZERO_SEQUENCE_SHIFTS, ZERO_SEQUENCE_SHIFTS)
+    return {
+        "frequency": np.array(frequency),
+        "amplitudes": np.hypot(cosine, sine),
+        "offsets": (angle / np.pi + 1.0) % 2.0 - 1.0,
+        "zero_sequence": zero_sequence,
+        "rms_error": np.sqrt(solution["residual"] / (PHASE_COUNT * windows.shape[2])),
+    }
+
+
+def get_slider_values(fit: Dict[str, np.ndarray], index: int, window_seconds: float) -> Dict[str, float]:
+    """Get the slider values reproducing a fitted window on the page.
+
+    The page's time axis spans one unit, so its frequency slider is the
+    number of cycles in the window. Values outside a slider's range are
+    clipped to it.
+
+    Args:
+        fit: result of fit_windows
+        index: window index
+        window_seconds: time from the first to the last sample of the window
+
+    Returns:
+        value of each slider in SLIDER_RANGES, and the time slider at 0
+    """
+    values = {"frequency_slider": fit["frequency"][index] * window_seconds}
+    for phase, name in enumerate("ABC"):
+        values[f"phase{name}_amplitude_slider"] = fit["amplitudes"][index, phase]
+        values[f"phase{name}_phase_slider"] = fit["offsets"][index, phase]
+    values["zerosequence_slider"] = fit["zero_sequence"][index]
+    values = {name: float(np.clip(value, *SLIDER_RANGES[name])) for name, value in values.items()}
+    values["time_slider"] = 0.0
+    return values
+
+
+def fit_recording(
+    recording: Recording,
+    start: float,
+    stop: float,
+    window_seconds: float,
+    known_frequency: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, np.ndarray]:
+    """Fit back to back windows of a recorded interval.
+
+    The frequency is searched within NOMINAL_DEVIATION of the recording's
+    nominal frequency, or around each window's estimate if it has none.
+    Windows are fitted in batches of FIT_BATCH, every window is fitted on its
+    own so the batches do not change the results.
+
+    Args:
+        recording: recording
+        start: interval start in seconds
+        stop: interval stop in seconds
+        window_seconds: window length in seconds
+        known_frequency: use the recording's nominal frequency instead of searching
+        progress: optional function called after each batch with the windows done and the window count
+
+    Returns:
+        result of fit_windows, plus "start", the start of each window in seconds, and "span", the time
+        from the first to the last sample of a window
+    """
+    window_size = max(3, int(round(window_seconds * recording.sample_rate)))
+    first, last = recording.get_index(start), recording.get_index(stop)
+    phases = recording.data[CHANNEL_INDEX["a"] : CHANNEL_INDEX["c"] + 1, first:last]
+    windows = split_windows(phases, window_size)
+    frequency = recording.frequency if known_frequency else None
+    frequency_range = None
+    if recording.frequency > 0:
+        frequency_range = (
+            recording.frequency * (1 - NOMINAL_DEVIATION),
+            recording.frequency * (1 + NOMINAL_DEVIATION),
+        )
+    batches = []
+    for batch_start in range(0, len(windows), FIT_BATCH):
+        batch = windows[batch_start : batch_start + FIT_BATCH]
+        batches.append(fit_windows(batch, recording.sample_rate, frequency, frequency_range))
+        if progress is not None:
+            progress(batch_start + len(batch), len(windows))
+    if batches:
+        fit = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+    else:
+        # the interval is shorter than one window, there is nothing to search the frequency in
+        fit = {
+            "frequency": np.empty(0),
+            "amplitudes": np.empty((0, PHASE_COUNT)),
+            "offsets": np.empty((0, PHASE_COUNT)),
+            "zero_sequence": np.empty(0),
+            "rms_error": np.empty(0),
+        }
+    fit["start"] = (first + window_size * np.arange(len(windows))) / recording.sample_rate
+    fit["span"] = np.array((window_size - 1) / recording.sample_rate)
+    return fit
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the fitting command line interface.
+
+    Without a recording, windows are generated by the page's generator from
+    random settings and the fitted settings are compared with them.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Fit phase settings to three-phase windows.")
+    parser.add_argument("--recording", help="recording directory, every window of it is fitted")
+    parser.add_argument("--window", type=float, default=0.05, help="recording window length in seconds")
+    parser.add_argument("--known-frequency", action="store_true", help="use the nominal recording frequency")
+    parser.add_argument("--windows", type=int, default=2000, help="generated windows")
+    parser.add_argument("--samples", type=int, default=100, help="samples per generated window")
+    parser.add_argument("--noise", type=float, default=0.0, help="noise added to generated windows")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.recording:
+        recording = Recording(args.recording)
+        start = time.perf_counter()
+        fit = fit_recording(recording, 0.0, recording.duration, args.window, args.known_frequency)
+        elapsed = time.perf_counter() - start
+        print(f"{len(fit['start'])} windows of {args.window} s fitted in {elapsed:0.3f} s")
+        for name in ["frequency", "amplitudes", "offsets", "zero_sequence", "rms_error"]:
+            low, median, high = np.percentile(fit[name], [1, 50, 99], axis=0)
+            print(
+                f"{name:<14} 1% {np.array2string(np.atleast_1d(low), precision=4)}"
+                + f"  median {np.array2string(np.atleast_1d(median), precision=4)}"
+                + f"  99% {np.array2string(np.atleast_1d(high), precision=4)}"
+            )
+        return 0
+
+    # the page module imports this one
+    from clarke_park_3d import ClarkeParkExploration  # pylint: disable=import-outside-toplevel
+
+    rng = np.random.default_rng(args.seed)
+    cpe = ClarkeParkExploration(sample_count=args.samples)
+    settings = np.column_stack(
+        [
+            rng.uniform(0.5, 5.0, args.windows),
+            rng.uniform(0.1, 2.0, (args.windows, PHASE_COUNT)),
+            rng.uniform(-0.9, 0.9, (args.windows, PHASE_COUNT)),
+            rng.uniform(0.0, 1.0, args.windows),
+        ]
+    )
+    windows = np.empty((args.windows, PHASE_COUNT, args.samples))
+    for index, values in enumerate(settings):
+        cpe.frequency = values[0]
+        cpe.phaseA_amplitude, cpe.phaseB_amplitude, cpe.phaseC_amplitude = values[1:4]
+        cpe.phaseA_offset, cpe.phaseB_offset, cpe.phaseC_offset = values[4:7]
+        cpe.zero_sequence = values[7]
+        cpe.generate_three_phase_data()
+        # the page's time axis runs backwards from its first sample
+        windows[index] = cpe.three_phase_data[0:PHASE_COUNT, 1, ::-1]
+    windows += rng.normal(0.0, args.noise, windows.shape)
+    # the page's time axis spans one unit
+    sample_rate = args.samples - 1
+
+    start = time.perf_counter()
+    fit = fit_windows(windows, sample_rate, frequency_range=SLIDER_RANGES["frequency_slider"])
+    elapsed = time.perf_counter() - start
+    offset_error = (fit["offsets"] - settings[:, 4:7] + 1.0) % 2.0 - 1.0
+    print(f"{args.windows} windows of {args.samples} samples fitted in {elapsed * 1e3:0.1f} ms")
+    print(f"largest frequency error {np.max(np.abs(fit['frequency'] - settings[:, 0])):0.2e}")
+    print(f"largest amplitude error {np.max(np.abs(fit['amplitudes'] - settings[:, 1:4])):0.2e}")
+    print(f"largest offset error    {np.max(np.abs(offset_error)):0.2e}")
+    print(f"largest zero sequence error {np.max(np.abs(fit['zero_sequence'] - settings[:, 7])):0.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
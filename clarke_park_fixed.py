@@ -0,0 +1,648 @@
+"""This python module runs the generator and the Clarke and Park transforms in fixed point.
+
+Motor control firmware commonly computes the transforms in Q15 (int16) or Q31
+(int32) arithmetic. This module follows that arithmetic with vectorized NumPy
+integer operations so firmware can be checked against the float64 reference
+on whole recorded test vectors:
+
+* values are stored as signed integers holding value / full_scale in
+  [-1, 1), with 15 or 31 fractional bits
+* products are formed in the next wider integer type, int32 or int64, and
+  accumulated there, as a multiply accumulate unit would
+* results are shifted back with truncation (arithmetic shift), round to
+  nearest (half up) or convergent rounding (half to even) and saturated
+  to the narrow type
+* angles are uint32 phase accumulators, 2^32 to a turn, and sines and
+  cosines come from a sine table, optionally with linear interpolation. The
+  table has 2^10 entries for Q15 and 2^16 for Q31, where a smaller table
+  would dominate the error, and --table-bits picks another size
+
+The Park transform takes a unit reference vector at the phase A angle, like
+firmware with an angle sensor, and the float64 reference uses the same
+reference through clarke_park_recording.transform_chunk. Inputs and outputs
+stay in the narrow integer type, so a Q15 batch needs a quarter of the
+memory of float64, and is processed in chunks of CHUNK_SIZE samples.
+
+Usage:
+    python clarke_park_fixed.py generate --samples 1000000 --format q15 --rounding nearest
+    python clarke_park_fixed.py compare capture --format q31
+    python clarke_park_fixed.py compare phases.npy --rate 20000 --frequency 60
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import os
+import sys
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+from clarke_park_multiphase import generate_phases, get_clarke_matrix, get_phase_shifts
+from clarke_park_recording import CHANNEL_INDEX, CHUNK_SIZE, Recording, transform_chunk
+
+TWO_PI = 2 * np.pi
+PHASE_COUNT = 3
+
+# bits of the sine table index of each format, the remaining bits of a phase accumulator interpolate
+TABLE_BITS = {"q15": 10, "q31": 16}
+# table sizes the interpolation products fit in the wide types for
+TABLE_BITS_RANGE = (4, 24)
+TURN = 1 << 32
+
+ROUNDING_MODES = ["truncate", "nearest", "convergent"]
+
+# channels of a fixed point transform, the phases are the generator output
+FIXED_CHANNELS = ["a", "b", "c", "alpha", "beta", "zero", "d", "q"]
+
+# values are in [-FULL_SCALE, FULL_SCALE) unless another full scale is given
+FULL_SCALE = 2.0
+
+
+class FixedFormat:
+    """Storage and arithmetic types of a Q format."""
+
+    def __init__(self, name: str, dtype: type, wide: type, fraction_bits: int, table_bits: int) -> None:
+        """Describe a Q format.
+
+        Args:
+            name: format name
+            dtype: signed integer storage type
+            wide: signed integer type of products and sums
+            fraction_bits: fractional bits of a stored value
+            table_bits: bits of the sine table index, in TABLE_BITS_RANGE
+        """
+        if not TABLE_BITS_RANGE[0] <= table_bits <= TABLE_BITS_RANGE[1]:
+            raise ValueError(f"table bits {table_bits} outside {TABLE_BITS_RANGE}")
+        self.name = name
+        self.dtype = dtype
+        self.wide = wide
+        self.fraction_bits = fraction_bits
+        self.table_bits = table_bits
+        self.one = 1 << fraction_bits
+        self.min = int(np.iinfo(dtype).min)
+        self.max = int(np.iinfo(dtype).max)
+
+
+FORMATS = {
+    "q15": FixedFormat("q15", np.int16, np.int32, 15, TABLE_BITS["q15"]),
+    "q31": FixedFormat("q31", np.int32, np.int64, 31, TABLE_BITS["q31"]),
+}
+
+
+def shift_round(values: np.ndarray, shift: int, rounding: str) -> np.ndarray:
+    """Shift wide integer values right with rounding.
+
+    Args:
+        values: signed integers
+        shift: bits to drop, at least 1
+        rounding: one of ROUNDING_MODES
+
+    Returns:
+        shifted values, same type as values
+    """
+    if rounding == "truncate":
+        return values >> shift
+    half = values.dtype.type(1 << (shift - 1))
+    if rounding == "nearest":
+        return (values + half) >> shift
+    if rounding == "convergent":
+        shifted = values >> shift
+        remainder = values & values.dtype.type((1 << shift) - 1)
+        shifted += (remainder > half) | ((remainder == half) & (shifted & 1).astype(bool))
+        return shifted
+    raise ValueError(f"unknown rounding mode {rounding}, expected one of {ROUNDING_MODES}")
+
+
+def saturate(
+    values: np.ndarray, fixed: FixedFormat, counts: Optional[Dict[str, int]] = None, channel: str = ""
+) -> np.ndarray:
+    """Clip wide values to the storage type.
+
+    Args:
+        values: wide signed integers
+        fixed: Q format
+        counts: optional saturated sample count of each channel, updated in place
+        channel: channel name in counts
+
+    Returns:
+        values in the storage type
+    """
+    if counts is not None:
+        counts[channel] = counts.get(channel, 0) + int(
+            np.count_nonzero((values > fixed.max) | (values < fixed.min))
+        )
+    return np.clip(values, fixed.min, fixed.max).astype(fixed.dtype)
+
+
+def to_fixed(
+    values: np.ndarray,
+    fixed: FixedFormat,
+    full_scale: float = FULL_SCALE,
+    counts: Optional[Dict[str, int]] = None,
+) -> np.ndarray:
+    """Quantize float values to the nearest fixed point value, saturating at full scale.
+
+    Args:
+        values: float values
+        fixed: Q format
+        full_scale: float value of 1.0 in the Q format
+        counts: optional saturated sample count of each channel, "input" is updated in place
+
+    Returns:
+        fixed point values
+    """
+    scaled = np.rint(np.asarray(values, dtype=np.float64) * (fixed.one / full_scale))
+    np.clip(scaled, fixed.min - 1, fixed.max + 1, out=scaled)
+    return saturate(scaled.astype(fixed.wide), fixed, counts, "input")
+
+
+def to_float(values: np.ndarray, fixed: FixedFormat, full_scale: float = FULL_SCALE) -> np.ndarray:
+    """Convert fixed point values to float64.
+
+    Args:
+        values: fixed point values
+        fixed: Q format
+        full_scale: float value of 1.0 in the Q format
+
+    Returns:
+        float values
+    """
+    return values * (full_scale / fixed.one)
+
+
+def to_turns(angle: np.ndarray) -> np.ndarray:
+    """Convert angles to phase accumulator values.
+
+    Args:
+        angle: radians
+
+    Returns:
+        uint32 angles, 2^32 to a turn
+    """
+    return (np.rint((np.asarray(angle, dtype=np.float64) / TWO_PI % 1.0) * TURN) % TURN).astype(np.uint32)
+
+
+@lru_cache(maxsize=None)
+def get_sine_table(name: str, table_bits: int) -> np.ndarray:
+    """Get the sine table of a Q format, with the first entry repeated at the end for interpolation.
+
+    Args:
+        name: Q format name
+        table_bits: bits of the table index
+
+    Returns:
+        sine values, shape (2^table_bits + 1,), in the wide type
+    """
+    fixed = FORMATS[name]
+    angles = TWO_PI * np.arange((1 << table_bits) + 1) / (1 << table_bits)
+    table = np.clip(np.rint(np.sin(angles) * fixed.one), fixed.min, fixed.max).astype(fixed.wide)
+    table.flags.writeable = False
+    return table
+
+
+def lookup_sine(turns: np.ndarray, fixed: FixedFormat, interpolate: bool = True) -> np.ndarray:
+    """Look up the sine of phase accumulator angles.
+
+    Args:
+        turns: uint32 angles
+        fixed: Q format
+        interpolate: interpolate linearly between table entries, otherwise the entry below is used
+
+    Returns:
+        sines in the wide type, scaled by 2^fraction_bits
+    """
+    table = get_sine_table(fixed.name, fixed.table_bits)
+    index = turns >> np.uint32(32 - fixed.table_bits)
+    values = table[index]
+    if interpolate:
+        # the bits below the index, as a fraction with fraction_bits bits
+        fraction_shift = 32 - fixed.table_bits - fixed.fraction_bits
+        mask = np.uint32((1 << (32 - fixed.table_bits)) - 1)
+        if fraction_shift >= 0:
+            fraction = ((turns & mask) >> np.uint32(fraction_shift)).astype(fixed.wide)
+        else:
+            fraction = (turns & mask).astype(fixed.wide) << fixed.wide(-fraction_shift)
+        values = values + (((table[index + 1] - values) * fraction) >> fixed.fraction_bits)
+    return values
+
+
+def lookup_cosine(turns: np.ndarray, fixed: FixedFormat, interpolate: bool = True) -> np.ndarray:
+    """Look up the cosine of phase accumulator angles as the sine a quarter turn ahead.
+
+    Args:
+        turns: uint32 angles
+        fixed: Q format
+        interpolate: interpolate linearly between table entries
+
+    Returns:
+        cosines in the wide type, scaled by 2^fraction_bits
+    """
+    return lookup_sine(turns + np.uint32(TURN // 4), fixed, interpolate)
+
+
+def generate_fixed(
+    turns: np.ndarray,
+    amplitudes: np.ndarray,
+    offsets: np.ndarray,
+    zero_sequence: float,
+    orders: np.ndarray,
+    harmonic_amplitudes: np.ndarray,
+    fixed: FixedFormat,
+    rounding: str = "nearest",
+    full_scale: float = FULL_SCALE,
+    interpolate: bool = True,
+    counts: Optional[Dict[str, int]] = None,
+) -> np.ndarray:
+    """Generate the real parts of the three phases in fixed point.
+
+    The waveforms follow clarke_park_multiphase.generate_phases: every phase
+    and each of its harmonics is a table cosine times a fixed point
+    amplitude, summed in the wide type with the zero sequence offset before
+    one rounding and saturation. The wide type has one guard bit, so the
+    amplitudes, harmonic amplitudes and zero sequence of a phase must add up
+    to less than twice the full scale.
+
+    Args:
+        turns: uint32 fundamental angle of phase A before its offset, shape (samples,)
+        amplitudes: amplitude of each phase, shape (phases,)
+        offsets: angle added to each phase in radians, shape (phases,)
+        zero_sequence: zero sequence offset
+        orders: harmonic orders, shape (orders,)
+        harmonic_amplitudes: amplitude of each harmonic of each phase, shape (phases, orders)
+        fixed: Q format
+        rounding: one of ROUNDING_MODES
+        full_scale: float value of 1.0 in the Q format
+        interpolate: interpolate the sine table
+        counts: optional saturated sample count of each channel, updated in place
+
+    Returns:
+        phases a, b and c, shape (phases, samples)
+
+    Raises:
+        ValueError: when a phase could overflow the wide type
+    """
+    shifts = to_turns(get_phase_shifts(PHASE_COUNT) + np.asarray(offsets))
+    amplitude_q = to_fixed(amplitudes, fixed, full_scale, counts).astype(fixed.wide)
+    harmonic_q = to_fixed(harmonic_amplitudes, fixed, full_scale, counts).astype(fixed.wide)
+    # per unit of zero sequence every phase but A moves along its nominal direction mirrored about A
+    zero_offsets = zero_sequence * np.cos(TWO_PI * np.arange(PHASE_COUNT) / PHASE_COUNT)
+    zero_offsets[0] = 0.0
+    zero_q = to_fixed(zero_offsets, fixed, full_scale, counts).astype(fixed.wide)
+    headroom = np.abs(amplitude_q) + np.sum(np.abs(harmonic_q), axis=1) + np.abs(zero_q)
+    if np.any(headroom >= 2 * fixed.one):
+        raise ValueError(f"phase amplitudes must add up to less than {2 * full_scale}")
+    zero_q <<= fixed.wide(fixed.fraction_bits)
+    out = np.empty((PHASE_COUNT, len(turns)), dtype=fixed.dtype)
+    for phase in range(PHASE_COUNT):
+        phase_turns = turns + shifts[phase]
+        total = amplitude_q[phase] * lookup_cosine(phase_turns, fixed, interpolate)
+        for order, amplitude in zip(orders, harmonic_q[phase]):
+            if amplitude != 0:
+                # the product wraps modulo a turn, which is the angle of the harmonic
+                harmonic_turns = phase_turns * np.uint32(order)
+                total += amplitude * lookup_cosine(harmonic_turns, fixed, interpolate)
+        total -= zero_q[phase]
+        out[phase] = saturate(shift_round(total, fixed.fraction_bits, rounding), fixed, counts, "abc"[phase])
+    return out
+
+
+def get_clarke_coefficients(fixed: FixedFormat) -> np.ndarray:
+    """Get the Clarke matrix in fixed point.
+
+    Args:
+        fixed: Q format
+
+    Returns:
+        coefficients in the wide type, shape (3, 3)
+    """
+    return to_fixed(get_clarke_matrix(PHASE_COUNT), fixed, 1.0).astype(fixed.wide)
+
+
+def transform_fixed(
+    phases: np.ndarray,
+    turns: np.ndarray,
+    fixed: FixedFormat,
+    rounding: str = "nearest",
+    interpolate: bool = True,
+    counts: Optional[Dict[str, int]] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Run the Clarke and Park transforms in fixed point.
+
+    Each output is a sum of products in the wide type, rounded and saturated
+    once, like a multiply accumulate loop. The Park reference is the unit
+    vector at the given angle, d = sin α - cos β and q = cos α + sin β.
+
+    Args:
+        phases: phases a, b and c in the Q format, shape (3, samples)
+        turns: uint32 Park reference angle, shape (samples,)
+        fixed: Q format
+        rounding: one of ROUNDING_MODES
+        interpolate: interpolate the sine table
+        counts: optional saturated sample count of each channel, updated in place
+        out: optional output, shape (5, samples), in the storage type
+
+    Returns:
+        α, β, zero, d and q in the Q format, shape (5, samples)
+    """
+    if out is None:
+        out = np.empty((5, phases.shape[1]), dtype=fixed.dtype)
+    wide = phases.astype(fixed.wide)
+    coefficients = get_clarke_coefficients(fixed)
+    for row, channel in enumerate(["alpha", "beta", "zero"]):
+        total = coefficients[row, 0] * wide[0]
+        total += coefficients[row, 1] * wide[1]
+        total += coefficients[row, 2] * wide[2]
+        out[row] = saturate(shift_round(total, fixed.fraction_bits, rounding), fixed, counts, channel)
+    sine = lookup_sine(turns, fixed, interpolate)
+    cosine = lookup_cosine(turns, fixed, interpolate)
+    alpha = out[0].astype(fixed.wide)
+    beta = out[1].astype(fixed.wide)
+    d = sine * alpha - cosine * beta
+    out[3] = saturate(shift_round(d, fixed.fraction_bits, rounding), fixed, counts, "d")
+    q = cosine * alpha + sine * beta
+    out[4] = saturate(shift_round(q, fixed.fraction_bits, rounding), fixed, counts, "q")
+    return out
+
+
+class ErrorReport:
+    """Running error statistics of fixed point channels against a float64 reference."""
+
+    def __init__(self, fixed: FixedFormat, full_scale: float = FULL_SCALE) -> None:
+        """Create an empty report.
+
+        Args:
+            fixed: Q format
+            full_scale: float value of 1.0 in the Q format
+        """
+        self.fixed = fixed
+        self.full_scale = full_scale
+        self.samples = 0
+        self.largest: Dict[str, float] = {}
+        self.squares: Dict[str, float] = {}
+        self.saturated: Dict[str, int] = {}
+
+    def add(self, channels: List[str], values: np.ndarray, reference: np.ndarray) -> None:
+        """Add a chunk of fixed point values and their float64 reference.
+
+        Args:
+            channels: channel names, in FIXED_CHANNELS
+            values: fixed point values, shape (channels, samples)
+            reference: float values, shape (channels, samples)
+        """
+        error = to_float(values, self.fixed, self.full_scale) - reference
+        for row, channel in enumerate(channels):
+            self.largest[channel] = max(self.largest.get(channel, 0.0), float(np.max(np.abs(error[row]))))
+            self.squares[channel] = self.squares.get(channel, 0.0) + float(np.dot(error[row], error[row]))
+
+    def get_rows(self) -> List[Dict[str, float]]:
+        """Get the statistics of each channel.
+
+        Returns:
+            channel, largest and RMS error in float units and in least significant bits, and saturated samples
+        """
+        lsb = self.full_scale / self.fixed.one
+        return [
+            {
+                "channel": channel,
+                "max": self.largest[channel],
+                "rms": np.sqrt(self.squares[channel] / max(self.samples, 1)),
+                "max_lsb": self.largest[channel] / lsb,
+                "rms_lsb": np.sqrt(self.squares[channel] / max(self.samples, 1)) / lsb,
+                "saturated": self.saturated.get(channel, 0),
+            }
+            for channel in FIXED_CHANNELS
+            if channel in self.largest
+        ]
+
+    def format(self) -> str:
+        """Format the statistics as a table.
+
+        Returns:
+            table text
+        """
+        lines = [
+            f"{'channel':<8} {'max error':>12} {'rms error':>12} {'max LSB':>10} {'rms LSB':>10} "
+            + f"{'saturated':>10}"
+        ]
+        for row in self.get_rows():
+            lines.append(
+                f"{row['channel']:<8} {row['max']:>12.3e} {row['rms']:>12.3e} {row['max_lsb']:>10.2f} "
+                + f"{row['rms_lsb']:>10.3f} {row['saturated']:>10d}"
+            )
+        if self.saturated.get("input"):
+            lines.append(
+                f"{self.saturated['input']} input values saturated at full scale {self.full_scale:g}"
+            )
+        return "\n".join(lines)
+
+
+def compare_vectors(
+    phases: np.ndarray,
+    angle: np.ndarray,
+    fixed: FixedFormat,
+    rounding: str = "nearest",
+    full_scale: float = FULL_SCALE,
+    interpolate: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+):
+    """Transform recorded phase samples in fixed point and compare them with the float64 transforms.
+
+    Integer phases are taken as raw fixed point values, e.g. firmware test
+    vectors, float phases are quantized first. Integers outside the storage
+    type, e.g. int32 vectors compared in Q15, are saturated and counted as
+    saturated input.
+
+    Args:
+        phases: phases a, b and c, shape (3, samples), may be memory mapped
+        angle: Park reference angle in radians, shape (samples,)
+        fixed: Q format
+        rounding: one of ROUNDING_MODES
+        full_scale: float value of 1.0 in the Q format
+        interpolate: interpolate the sine table
+        chunk_size: samples converted at a time
+
+    Returns:
+        the fixed point α, β, zero, d and q, shape (5, samples), and the error report
+    """
+    sample_count = np.shape(phases)[1]
+    report = ErrorReport(fixed, full_scale)
+    out = np.empty((5, sample_count), dtype=fixed.dtype)
+    for start in range(0, sample_count, chunk_size):
+        stop = min(start + chunk_size, sample_count)
+        chunk = np.asarray(phases[:, start:stop])
+        if np.can_cast(chunk.dtype, fixed.dtype):
+            chunk_q = chunk.astype(fixed.dtype)
+        elif np.issubdtype(chunk.dtype, np.integer):
+            chunk_q = saturate(chunk, fixed, report.saturated, "input")
+        else:
+            chunk_q = to_fixed(chunk, fixed, full_scale, report.saturated)
+        chunk_angle = np.asarray(angle[start:stop], dtype=np.float64)
+        transform_fixed(
+            chunk_q, to_turns(chunk_angle), fixed, rounding, interpolate, report.saturated, out[:, start:stop]
+        )
+        # the reference transforms the phases the fixed point path sees
+        reference = transform_chunk(to_float(chunk_q, fixed, full_scale), chunk_angle)
+        report.add(FIXED_CHANNELS[3:], out[:, start:stop], reference[CHANNEL_INDEX["alpha"] :])
+        report.samples += stop - start
+    return out, report
+
+
+def compare_generator(
+    sample_count: int,
+    sample_rate: float,
+    frequency: float,
+    amplitudes: np.ndarray,
+    offsets: np.ndarray,
+    zero_sequence: float,
+    orders: np.ndarray,
+    harmonic_amplitudes: np.ndarray,
+    fixed: FixedFormat,
+    rounding: str = "nearest",
+    full_scale: float = FULL_SCALE,
+    interpolate: bool = True,
+    chunk_size: int = CHUNK_SIZE,
+) -> ErrorReport:
+    """Generate and transform phases in fixed point and compare them with the float64 generator.
+
+    Args:
+        sample_count: number of samples
+        sample_rate: samples per second
+        frequency: fundamental frequency in Hz
+        amplitudes: amplitude of each phase, shape (phases,)
+        offsets: angle added to each phase in radians, shape (phases,)
+        zero_sequence: zero sequence offset
+        orders: harmonic orders, shape (orders,)
+        harmonic_amplitudes: amplitude of each harmonic of each phase, shape (phases, orders)
+        fixed: Q format
+        rounding: one of ROUNDING_MODES
+        full_scale: float value of 1.0 in the Q format
+        interpolate: interpolate the sine table
+        chunk_size: samples generated at a time
+
+    Returns:
+        error report
+    """
+    report = ErrorReport(fixed, full_scale)
+    # the phase accumulator advances by a whole number of steps, the reference uses the same angle
+    step = int(round(frequency / sample_rate * TURN)) % TURN
+    for start in range(0, sample_count, chunk_size):
+        index = np.arange(start, min(start + chunk_size, sample_count), dtype=np.uint64)
+        turns = ((index * np.uint64(step)) % np.uint64(TURN)).astype(np.uint32)
+        angle = index * (TWO_PI * step / TURN)
+        phases_q = generate_fixed(
+            turns,
+            amplitudes,
+            offsets,
+            zero_sequence,
+            orders,
+            harmonic_amplitudes,
+            fixed,
+            rounding,
+            full_scale,
+            interpolate,
+            report.saturated,
+        )
+        reference_turns = turns + to_turns(offsets[0])
+        channels_q = transform_fixed(
+            phases_q, reference_turns, fixed, rounding, interpolate, report.saturated
+        )
+        phases, _ = generate_phases(
+            angle, amplitudes, offsets, zero_sequence, orders=orders, harmonic_amplitudes=harmonic_amplitudes
+        )
+        reference = transform_chunk(phases, angle + offsets[0])
+        report.add(FIXED_CHANNELS[0:3], phases_q, phases)
+        report.add(FIXED_CHANNELS[3:], channels_q, reference[CHANNEL_INDEX["alpha"] :])
+        report.samples += len(index)
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the fixed point comparison command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Compare the fixed point transforms with float64.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="q15", help="Q format")
+    parser.add_argument("--rounding", choices=ROUNDING_MODES, default="nearest", help="rounding mode")
+    parser.add_argument("--full-scale", type=float, default=FULL_SCALE, help="float value of Q format 1.0")
+    parser.add_argument("--no-interpolation", action="store_true", help="use the sine table entry below")
+    parser.add_argument(
+        "--table-bits",
+        type=int,
+        help=f"sine table index bits in {TABLE_BITS_RANGE[0]} to {TABLE_BITS_RANGE[1]}, "
+        + f"default {TABLE_BITS['q15']} for Q15 and {TABLE_BITS['q31']} for Q31",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="generate phases in fixed point")
+    generate.add_argument("--samples", type=int, default=1000000)
+    generate.add_argument("--rate", type=float, default=20000.0, help="samples per second")
+    generate.add_argument("--frequency", type=float, default=60.0, help="fundamental frequency in Hz")
+    generate.add_argument("--amplitudes", type=float, nargs=3, default=[1.0, 1.0, 1.0])
+    generate.add_argument("--offsets", type=float, nargs=3, default=[0.0, 0.0, 0.0], help="units of pi")
+    generate.add_argument("--zero-sequence", type=float, default=0.0)
+    generate.add_argument(
+        "--harmonics", type=float, nargs=4, default=[0.0, 0.0, 0.0, 0.0], help="orders 5, 7, 11 and 13"
+    )
+    compare = commands.add_parser("compare", help="transform a recording or a .npy file of phases")
+    compare.add_argument("phases", help="recording directory, or .npy phases a, b and c, shape (3, samples)")
+    compare.add_argument("--rate", type=float, help="samples per second of a .npy file")
+    compare.add_argument("--frequency", type=float, help="fundamental frequency of a .npy file in Hz")
+    compare.add_argument("--angle", help="optional .npy Park reference angle in radians, shape (samples,)")
+    args = parser.parse_args(argv)
+
+    fixed = FORMATS[args.format]
+    if args.table_bits is not None:
+        if not TABLE_BITS_RANGE[0] <= args.table_bits <= TABLE_BITS_RANGE[1]:
+            parser.error(f"--table-bits must be in {TABLE_BITS_RANGE[0]} to {TABLE_BITS_RANGE[1]}")
+        fixed = FixedFormat(fixed.name, fixed.dtype, fixed.wide, fixed.fraction_bits, args.table_bits)
+    interpolate = not args.no_interpolation
+    start = time.perf_counter()
+    if args.command == "generate":
+        harmonic_amplitudes = np.tile(args.harmonics, (PHASE_COUNT, 1))
+        report = compare_generator(
+            args.samples,
+            args.rate,
+            args.frequency,
+            np.array(args.amplitudes),
+            np.array(args.offsets) * np.pi,
+            args.zero_sequence,
+            np.array([5, 7, 11, 13]),
+            harmonic_amplitudes,
+            fixed,
+            args.rounding,
+            args.full_scale,
+            interpolate,
+        )
+    else:
+        if os.path.isdir(args.phases):
+            recording = Recording(args.phases)
+            phases = recording.data[CHANNEL_INDEX["a"] : CHANNEL_INDEX["c"] + 1]
+            sample_rate, frequency = recording.sample_rate, recording.frequency
+        else:
+            if args.angle is None and (args.rate is None or args.frequency is None):
+                parser.error("a .npy file needs --rate and --frequency, or --angle")
+            phases = np.load(args.phases, mmap_mode="r")
+            sample_rate, frequency = args.rate, args.frequency
+        if args.angle is not None:
+            angle = np.load(args.angle, mmap_mode="r")
+        else:
+            angle = (TWO_PI * frequency / sample_rate) * np.arange(phases.shape[1])
+        out, report = compare_vectors(phases, angle, fixed, args.rounding, args.full_scale, interpolate)
+        print(f"outputs take {out.nbytes / 1e6:0.1f} MB instead of {out.size * 8 / 1e6:0.1f} MB in float64")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{report.samples} samples in {fixed.name} with a 2^{fixed.table_bits} entry sine table and "
+        + f"{args.rounding} rounding in {elapsed:0.2f} s"
+    )
+    print(report.format())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""This python module runs heavy computations as background jobs.
+
+Jobs are Dash background callbacks run in worker processes by a
+DiskcacheManager, which keeps job state in a local cache directory and needs
+no external broker. The server workers stay free for the interactive
+controls while a job runs, the job reports its progress, and it is cancelled
+when the user changes its inputs again instead of piling up behind them.
+
+The manager needs the optional diskcache package, installed with
+pip install "dash[diskcache]". Without it jobs run as regular callbacks,
+without progress reports or cancellation.
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import functools
+import os
+import tempfile
+from typing import Any, Callable, List, Optional
+import dash
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+JOB_CACHE_PATH = os.environ.get(
+    "CLARKE_PARK_JOB_CACHE", os.path.join(tempfile.gettempdir(), "clarke_park_jobs")
+)
+
+
+def create_manager(path: str = JOB_CACHE_PATH) -> Optional[Any]:
+    """Create the background callback manager.
+
+    Args:
+        path: job cache directory
+
+    Returns:
+        manager, or None if diskcache and the packages the manager runs on are not installed
+    """
+    if diskcache is None:
+        return None
+    try:
+        return dash.DiskcacheManager(diskcache.Cache(path))
+    except ImportError:
+        # the manager also needs psutil and multiprocess
+        return None
+
+
+JOB_MANAGER = create_manager()
+
+
+def register_job(
+    app: dash.Dash,
+    function: Callable,
+    *dependencies: Any,
+    progress: List[dash.Output],
+    cancel: List[dash.Input],
+    **options: Any,
+) -> None:
+    """Register a heavy computation as a background callback.
+
+    Args:
+        app: dash application
+        function: callback taking a function that sets the progress outputs, then the callback arguments
+        dependencies: outputs, inputs and states of the callback
+        progress: outputs updated while the job runs
+        cancel: inputs that cancel a running job when they change
+        options: other callback options
+    """
+    if JOB_MANAGER is None:
+        app.callback(*dependencies, **options)(functools.partial(function, None))
+    else:
+        app.callback(
+            *dependencies,
+            background=True,
+            manager=JOB_MANAGER,
+            progress=progress,
+            cancel=cancel,
+            **options,
+        )(function)
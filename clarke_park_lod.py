@@ -0,0 +1,215 @@
+"""This python module serves windows of long recordings at a bounded number of plotted points.
+
+A min/max level of detail pyramid is built once per recording in a streaming
+pass and stored next to the data, along with the recording's stamp so it is
+built again when the data is rewritten. Level 0 keeps the minimum and maximum of
+each channel over blocks of BASE_BLOCK samples and every following level
+merges FACTOR blocks of the level below. A window is served from the raw data
+when it fits the point budget, otherwise from the finest level that does, so
+the work per window depends on the point budget rather than on the length of
+the recording or of the window.
+
+Usage:
+    python clarke_park_lod.py capture
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List
+import numpy as np
+from clarke_park_recording import Recording
+
+BASE_BLOCK = 16
+FACTOR = 4
+
+# the pyramid stops at the first level with at most this many blocks
+MIN_BLOCKS = 1024
+
+# plotted points per channel
+POINT_BUDGET = 4000
+
+LOD_FILE = "lod.json"
+
+# blocks of the level below merged at a time
+CHUNK_BLOCKS = 1 << 16
+
+
+def get_level_file(level: int) -> str:
+    """Get the file name of a pyramid level.
+
+    Args:
+        level: level number
+
+    Returns:
+        file name
+    """
+    return f"lod_{level}.npy"
+
+
+def reduce_blocks(source: np.ndarray, destination: np.ndarray, factor: int) -> None:
+    """Write the minimum and maximum of every group of source blocks, a chunk at a time.
+
+    Args:
+        source: minima and maxima, shape (channels, 2, blocks), or samples, shape (channels, samples)
+        destination: minima and maxima, shape (channels, 2, blocks)
+        factor: source blocks or samples per destination block
+    """
+    raw = source.ndim == 2
+    count = source.shape[-1]
+    step = CHUNK_BLOCKS * factor
+    for start in range(0, count, step):
+        stop = min(start + step, count)
+        full = (stop - start) // factor
+        lows = source[..., start:stop] if raw else source[:, 0, start:stop]
+        highs = lows if raw else source[:, 1, start:stop]
+        first = start // factor
+        if full > 0:
+            end = start + full * factor
+            shape = (lows.shape[0], full, factor)
+            destination[:, 0, first : first + full] = np.min(lows[:, : end - start].reshape(shape), axis=2)
+            destination[:, 1, first : first + full] = np.max(highs[:, : end - start].reshape(shape), axis=2)
+        if (stop - start) % factor:
+            # the last block of the recording is partial
+            destination[:, 0, first + full] = np.min(lows[:, full * factor :], axis=1)
+            destination[:, 1, first + full] = np.max(highs[:, full * factor :], axis=1)
+
+
+def build_pyramid(recording: Recording) -> int:
+    """Build and store the level of detail pyramid of a recording.
+
+    Args:
+        recording: recording to index
+
+    Returns:
+        number of levels
+    """
+    source: Any = recording.data
+    factor = BASE_BLOCK
+    level = 0
+    while True:
+        blocks = -(-source.shape[-1] // factor)
+        destination = np.lib.format.open_memmap(
+            recording.get_path(get_level_file(level)),
+            mode="w+",
+            dtype=np.float32,
+            shape=(source.shape[0], 2, blocks),
+        )
+        reduce_blocks(source, destination, factor)
+        destination.flush()
+        source = destination
+        factor = FACTOR
+        level += 1
+        if blocks <= MIN_BLOCKS:
+            break
+    with open(recording.get_path(LOD_FILE), "w", encoding="utf-8") as lod_file:
+        settings = {"base_block": BASE_BLOCK, "factor": FACTOR, "levels": level}
+        json.dump(dict(settings, stamp=recording.get_stamp()), lod_file, indent=2)
+    return level
+
+
+def load_settings(recording: Recording) -> Dict[str, Any]:
+    """Load the pyramid settings of a recording.
+
+    Args:
+        recording: recording
+
+    Returns:
+        settings, empty if the pyramid has not been built
+    """
+    if not os.path.exists(recording.get_path(LOD_FILE)):
+        return {}
+    with open(recording.get_path(LOD_FILE), encoding="utf-8") as lod_file:
+        return json.load(lod_file)
+
+
+class LodView:
+    """Windows of a recording at the finest resolution within a point budget."""
+
+    def __init__(self, recording: Recording) -> None:
+        """Open the pyramid of a recording, building it first if it is missing or the data has changed.
+
+        Args:
+            recording: recording to view
+        """
+        self.recording = recording
+        settings = load_settings(recording)
+        if settings.get("stamp") != recording.get_stamp():
+            build_pyramid(recording)
+            settings = load_settings(recording)
+        self.levels = [
+            np.load(recording.get_path(get_level_file(level)), mmap_mode="r")
+            for level in range(settings["levels"])
+        ]
+        self.block_sizes = [
+            settings["base_block"] * settings["factor"] ** level for level in range(len(self.levels))
+        ]
+
+    def get_window(self, start: float, stop: float, budget: int = POINT_BUDGET) -> Dict[str, Any]:
+        """Get the samples, or the block minima and maxima, of a time window.
+
+        Args:
+            start: window start in seconds
+            stop: window stop in seconds
+            budget: largest number of points per channel
+
+        Returns:
+            dictionary with "time", shape (points,), "values", shape (channels, points),
+            "level", -1 for raw samples, and "block_size", samples per pair of points
+        """
+        rate = self.recording.sample_rate
+        # a window starting at or past the end shows the last sample
+        first = min(self.recording.get_index(min(start, stop)), self.recording.sample_count - 1)
+        last = max(self.recording.get_index(max(start, stop)), first + 1)
+        if last - first <= budget:
+            return {
+                "time": np.arange(first, last) / rate,
+                "values": np.asarray(self.recording.data[:, first:last]),
+                "level": -1,
+                "block_size": 1,
+            }
+
+        level = len(self.levels) - 1
+        for index, block_size in enumerate(self.block_sizes):
+            if 2 * -(-(last - first) // block_size) <= budget:
+                level = index
+                break
+        block_size = self.block_sizes[level]
+        first_block = first // block_size
+        last_block = min(-(-last // block_size), self.levels[level].shape[2])
+        extremes = np.asarray(self.levels[level][:, :, first_block:last_block])
+        # each block is drawn as its minimum then its maximum, a quarter and three quarters through the block
+        values = np.swapaxes(extremes, 1, 2).reshape(extremes.shape[0], -1)
+        blocks = np.arange(first_block, last_block)
+        time = np.repeat(blocks, 2) + np.tile([0.25, 0.75], len(blocks))
+        return {
+            "time": time * (block_size / rate),
+            "values": values,
+            "level": level,
+            "block_size": block_size,
+        }
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the pyramid build command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Build the level of detail pyramid of a recording.")
+    parser.add_argument("directory", help="recording directory")
+    args = parser.parse_args(argv)
+    recording = Recording(args.directory)
+    levels = build_pyramid(recording)
+    print(f"built {levels} levels for {recording.sample_count} samples")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
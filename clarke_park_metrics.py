@@ -0,0 +1,224 @@
+"""This python module collects latency metrics for the Clarke and Park web page.
+
+Stage timings of every update are recorded in histograms labelled by stage and
+by the control that triggered the update, then exposed on a Prometheus text
+format "/metrics" endpoint of the Flask server. The trigger comes from the
+client, so only the registered input ids of the page are used as labels and
+everything else is counted as "other", and label values are escaped.
+
+Metrics are disabled unless the CLARKE_PARK_METRICS environment variable is set
+to something other than "0", in which case every timer is a shared do-nothing
+object.
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+import flask
+
+METRICS_ENABLED = os.environ.get("CLARKE_PARK_METRICS", "0") not in ("", "0")
+
+# histogram bucket upper bounds in seconds
+BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+DASH_UPDATE_PATH = "_dash-update-component"
+
+# trigger label of updates not triggered by a registered input
+OTHER_TRIGGER = "other"
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value for the Prometheus text exposition format.
+
+    Args:
+        value: label value
+
+    Returns:
+        value with backslashes, double quotes and line feeds escaped
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class LatencyHistogram:
+    """Cumulative histogram of latencies."""
+
+    def __init__(self) -> None:
+        """Create an empty histogram."""
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        """Add one observation.
+
+        Args:
+            seconds: observed latency
+        """
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class NullTimer:
+    """Stage timer used when metrics are disabled."""
+
+    def lap(self, stage: str) -> None:
+        """Do nothing.
+
+        Args:
+            stage: name of the stage that just finished
+        """
+
+    def finish(self) -> None:
+        """Do nothing."""
+
+
+NULL_TIMER = NullTimer()
+
+
+class StageTimer:
+    """Timer that records the time between laps as stage latencies."""
+
+    def __init__(self, registry: "MetricsRegistry", trigger: str) -> None:
+        """Start timing an update.
+
+        Args:
+            registry: registry receiving the observations
+            trigger: property id of the control that triggered the update
+        """
+        self.registry = registry
+        self.trigger = trigger
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def lap(self, stage: str) -> None:
+        """Record the time since the previous lap.
+
+        Args:
+            stage: name of the stage that just finished
+        """
+        now = time.perf_counter()
+        self.registry.observe(stage, self.trigger, now - self.last)
+        self.last = now
+
+    def finish(self) -> None:
+        """Record the total callback time."""
+        total = time.perf_counter() - self.start
+        self.registry.observe("callback", self.trigger, total)
+        if flask.has_request_context():
+            flask.g.metrics_callback = (self.trigger, total)
+
+
+class MetricsRegistry:
+    """Thread safe collection of stage latency histograms."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED) -> None:
+        """Create an empty registry.
+
+        Args:
+            enabled: whether timers record anything
+        """
+        self.enabled = enabled
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        # property ids used as trigger labels, see set_triggers
+        self.triggers: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def set_triggers(self, triggers: Iterable[str]) -> None:
+        """Set the property ids that get their own trigger label, the number of histograms stays bounded.
+
+        Args:
+            triggers: property ids of the page's inputs, e.g. "time_slider.value"
+        """
+        self.triggers = set(triggers)
+
+    def start_timer(self, trigger: str):
+        """Start timing one update.
+
+        Args:
+            trigger: property id of the control that triggered the update
+
+        Returns:
+            a stage timer, or the shared null timer when disabled
+        """
+        if self.enabled is False:
+            return NULL_TIMER
+        return StageTimer(self, trigger if trigger in self.triggers else OTHER_TRIGGER)
+
+    def observe(self, stage: str, trigger: str, seconds: float) -> None:
+        """Add one stage latency.
+
+        Args:
+            stage: name of the stage
+            trigger: property id of the control that triggered the update
+            seconds: observed latency
+        """
+        with self.lock:
+            histogram = self.histograms.get((stage, trigger))
+            if histogram is None:
+                histogram = self.histograms[(stage, trigger)] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def render(self) -> str:
+        """Render every histogram in the Prometheus text exposition format.
+
+        Returns:
+            metrics text
+        """
+        lines = [
+            "# HELP clarke_park_stage_seconds Time spent in each stage of a plot update.",
+            "# TYPE clarke_park_stage_seconds histogram",
+        ]
+        with self.lock:
+            for (stage, trigger), histogram in sorted(self.histograms.items()):
+                labels = f'stage="{escape_label(stage)}",trigger="{escape_label(trigger)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'clarke_park_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"clarke_park_stage_seconds_sum{{{labels}}} {histogram.total}")
+                lines.append(f"clarke_park_stage_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def install(self, server: flask.Flask) -> None:
+        """Add the "/metrics" endpoint and request timing hooks to a Flask server.
+
+        The time between the end of the callback and the end of the request is
+        recorded as the "serialize" stage, it is dominated by JSON encoding.
+
+        Args:
+            server: Flask server of the dash app
+        """
+        if self.enabled is False:
+            return
+
+        @server.before_request
+        def start_request_timer():
+            if flask.request.path.endswith(DASH_UPDATE_PATH):
+                flask.g.metrics_start = time.perf_counter()
+
+        @server.after_request
+        def stop_request_timer(response):
+            start = flask.g.pop("metrics_start", None)
+            callback = flask.g.pop("metrics_callback", None)
+            if start is not None and callback is not None:
+                trigger, callback_seconds = callback
+                request_seconds = time.perf_counter() - start
+                self.observe("request", trigger, request_seconds)
+                self.observe("serialize", trigger, request_seconds - callback_seconds)
+            return response
+
+        @server.route("/metrics")
+        def metrics():
+            return flask.Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+METRICS = MetricsRegistry()
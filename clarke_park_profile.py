@@ -0,0 +1,280 @@
+"""This python module profiles Clarke and Park web page callbacks.
+
+A sampled fraction of callbacks is run under cProfile and each profile is
+written to a file named after the triggering control and a timestamp.
+Profiling is enabled by the CLARKE_PARK_PROFILE environment variable, holding
+the fraction of callbacks to profile. When the server also sets
+CLARKE_PARK_PROFILE_QUERY=1, a single browser can pick its own fraction by
+opening the page with a "profile" query parameter, e.g.
+http://localhost:8050/?profile=1, otherwise the parameter is ignored so
+clients cannot turn on profiling and its disk writes. Profiles are written to
+the CLARKE_PARK_PROFILE_DIR directory, "profiles" by default.
+
+Run as a script to aggregate profile files into the folded stack format read
+by flamegraph.pl, speedscope and similar flame graph tools.
+
+Usage:
+    python clarke_park_profile.py profiles/*.prof --output callbacks.folded
+    python clarke_park_profile.py profiles --trigger time_slider
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import cProfile
+import glob
+import math
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import flask
+
+PROFILE_QUERY = "profile"
+
+
+def parse_rate(text: Optional[str]) -> Optional[float]:
+    """Parse a fraction of callbacks to profile.
+
+    Args:
+        text: number, e.g. "0.1"
+
+    Returns:
+        fraction limited to 0 through 1, None if the text is not a number
+    """
+    try:
+        rate = float(text or "")
+    except ValueError:
+        return None
+    if math.isnan(rate):
+        return None
+    return min(max(rate, 0.0), 1.0)
+
+
+PROFILE_RATE = parse_rate(os.environ.get("CLARKE_PARK_PROFILE") or "0")
+if PROFILE_RATE is None:
+    print("CLARKE_PARK_PROFILE is not a number, profiling is disabled", file=sys.stderr)
+    PROFILE_RATE = 0.0
+PROFILE_DIR = os.environ.get("CLARKE_PARK_PROFILE_DIR", "profiles")
+PROFILE_QUERY_ENABLED = os.environ.get("CLARKE_PARK_PROFILE_QUERY", "0") not in ("", "0")
+
+# deepest stack written to folded output
+MAX_DEPTH = 64
+
+FunctionKey = Tuple[str, int, str]
+
+
+class CallbackProfiler:
+    """Runs a sampled fraction of callbacks under cProfile."""
+
+    def __init__(
+        self,
+        rate: float = PROFILE_RATE,
+        directory: str = PROFILE_DIR,
+        allow_query: bool = PROFILE_QUERY_ENABLED,
+    ) -> None:
+        """Create a profiler.
+
+        Args:
+            rate: fraction of callbacks to profile, 0 disables everything but the query parameter
+            directory: directory receiving the profile files
+            allow_query: let the "profile" query parameter of a page override the rate
+        """
+        self.rate = rate
+        self.directory = directory
+        self.allow_query = allow_query
+        # held while a callback is profiled, since Python 3.12 only one profiler can be active per process
+        self.lock = threading.Lock()
+
+    def get_rate(self) -> float:
+        """Get the sampling rate for the current request.
+
+        Dash callback requests carry the page address in the referrer header,
+        so when allowed a "profile" query parameter on the page overrides the
+        global rate. A parameter that is not a number is ignored.
+
+        Returns:
+            fraction of callbacks to profile
+        """
+        if self.allow_query and flask.has_request_context() and flask.request.referrer:
+            query = parse_qs(urlparse(flask.request.referrer).query)
+            if PROFILE_QUERY in query:
+                rate = parse_rate(query[PROFILE_QUERY][0])
+                if rate is not None:
+                    return rate
+        return self.rate
+
+    def run(self, trigger: str, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Call a function, profiling it if this call is sampled.
+
+        A sampled call runs unprofiled while another callback is being profiled, or while another
+        profiling tool is active, rather than failing.
+
+        Args:
+            trigger: property id of the control that triggered the callback
+            function: callback body
+            args: positional arguments of the function
+            kwargs: keyword arguments of the function
+
+        Returns:
+            return value of the function
+        """
+        rate = self.get_rate()
+        if rate <= 0 or random.random() >= rate or not self.lock.acquire(blocking=False):
+            return function(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # another profiling tool holds the process wide profiler slot
+                return function(*args, **kwargs)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.disable()
+                self.write(profile, trigger)
+        finally:
+            self.lock.release()
+
+    def write(self, profile: cProfile.Profile, trigger: str) -> str:
+        """Write a profile to the profile directory.
+
+        Args:
+            profile: finished profile
+            trigger: property id of the control that triggered the callback
+
+        Returns:
+            path of the profile file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1e6) % 1000000:06d}"
+        name = re.sub(r"[^A-Za-z0-9_-]+", "_", trigger or "initial").strip("_") or "initial"
+        path = os.path.join(self.directory, f"{name}_{stamp}.prof")
+        profile.dump_stats(path)
+        return path
+
+
+PROFILER = CallbackProfiler()
+
+
+def get_label(function: FunctionKey) -> str:
+    """Get a flame graph frame label for a pstats function key.
+
+    Args:
+        function: pstats (file name, line number, function name) key
+
+    Returns:
+        frame label
+    """
+    filename, line, name = function
+    if filename == "~":
+        return name.replace(";", ",")
+    return f"{os.path.basename(filename)}:{line}({name})".replace(";", ",")
+
+
+def fold_stats(stats: pstats.Stats) -> Dict[str, float]:
+    """Convert aggregated pstats to folded stacks.
+
+    cProfile keeps only caller/callee pairs, so every path through the call
+    graph is weighted by the share of each callee's time spent under that
+    caller.
+
+    Args:
+        stats: aggregated profile statistics
+
+    Returns:
+        dictionary of semicolon separated stack to seconds of self time
+    """
+    entries = stats.stats  # type: ignore
+    callees: Dict[FunctionKey, Dict[FunctionKey, float]] = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            callees.setdefault(caller, {})[function] = edge_cumulative
+
+    folded: Dict[str, float] = {}
+
+    def walk(function: FunctionKey, stack: List[str], budget: float, visiting: set) -> None:
+        _, _, self_time, cumulative, _ = entries[function]
+        if cumulative <= 0 or budget <= 0:
+            return
+        share = budget / cumulative
+        stack = stack + [get_label(function)]
+        key = ";".join(stack)
+        folded[key] = folded.get(key, 0.0) + self_time * share
+        if len(stack) >= MAX_DEPTH:
+            return
+        visiting.add(function)
+        for callee, edge_cumulative in callees.get(function, {}).items():
+            if callee not in visiting and callee in entries:
+                walk(callee, stack, edge_cumulative * share, visiting)
+        visiting.discard(function)
+
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        if not callers:
+            walk(function, [], cumulative, set())
+    return folded
+
+
+def find_profiles(paths: List[str], trigger: str = "") -> List[str]:
+    """Expand profile files and directories.
+
+    Args:
+        paths: profile files, directories or glob patterns
+        trigger: only keep files whose name contains this text
+
+    Returns:
+        sorted profile file paths
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.prof")))
+        else:
+            files.extend(glob.glob(path))
+    return sorted(f for f in files if trigger in os.path.basename(f))
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the profile aggregation command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Aggregate callback profiles into folded stacks.")
+    parser.add_argument("paths", nargs="*", default=[PROFILE_DIR], help="profile files or directories")
+    parser.add_argument("--trigger", default="", help="only use profiles of this triggering control")
+    parser.add_argument("--output", help="folded stack file, standard output by default")
+    parser.add_argument("--top", type=int, default=0, help="also print the top functions by cumulative time")
+    args = parser.parse_args(argv)
+
+    files = find_profiles(args.paths, args.trigger)
+    if not files:
+        print("no profiles found", file=sys.stderr)
+        return 1
+    stats = pstats.Stats(*files, stream=sys.stderr)
+    if args.top:
+        stats.sort_stats("cumulative").print_stats(args.top)
+
+    lines = [f"{stack} {int(round(seconds * 1e6))}" for stack, seconds in sorted(fold_stats(stats).items())]
+    lines = [line for line in lines if not line.endswith(" 0")]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+    print(f"aggregated {len(files)} profiles", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""This python module stores long three-phase recordings with their Clarke and Park transforms.
+
+A recording is a directory holding "meta.json" and "data.npy", a float32 array
+of shape (channels, samples) with phases a, b and c, their neutral sum, the
+Clarke α, β and zero components and the Park d and q components. Each channel
+is contiguous, so windows of one channel are read from the memory mapped file
+without touching the others. Derived data such as level of detail pyramids is
+stored in the same directory.
+
+Recordings are written in chunks, so captures larger than memory can be
+converted from memory mapped .npy files.
+
+Usage:
+    python clarke_park_recording.py synthesize capture --seconds 3600 --rate 5000
+    python clarke_park_recording.py import capture phases.npy --rate 20000 --frequency 60
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+import numpy as np
+from clarke_park_multiphase import get_clarke_matrix
+
+CHANNELS = ["a", "b", "c", "n", "alpha", "beta", "zero", "d", "q"]
+CHANNEL_INDEX = {name: index for index, name in enumerate(CHANNELS)}
+
+# channel groups plotted together
+CHANNEL_GROUPS = {
+    "abc": ["a", "b", "c", "n"],
+    "αβ0": ["alpha", "beta", "zero"],
+    "dq": ["d", "q"],
+}
+
+RECORDING_PATH = os.environ.get("CLARKE_PARK_RECORDING", "")
+
+META_FILE = "meta.json"
+DATA_FILE = "data.npy"
+
+# samples converted at a time
+CHUNK_SIZE = 1 << 20
+
+# Clarke transform, matching ClarkeParkExploration.clarke_matrix
+CLARKE_MATRIX = get_clarke_matrix(3)
+
+
+def transform_chunk(phases: np.ndarray, angle: np.ndarray) -> np.ndarray:
+    """Compute every recorded channel of a chunk of phase samples.
+
+    The Park transform follows ClarkeParkExploration.do_park_transform with a
+    unit phase A reference vector at the given angle.
+
+    Args:
+        phases: phases a, b and c, shape (3, samples)
+        angle: Park reference angle in radians, shape (samples,)
+
+    Returns:
+        channels in CHANNELS order, shape (channels, samples)
+    """
+    out = np.empty((len(CHANNELS), phases.shape[1]), dtype=np.float64)
+    out[0:3] = phases
+    np.sum(phases, axis=0, out=out[3])
+    np.dot(CLARKE_MATRIX, phases, out=out[4:7])
+    cos = np.cos(angle)
+    sin = np.sin(angle)
+    alpha, beta = out[4], out[5]
+    out[7] = sin * alpha - cos * beta
+    out[8] = cos * alpha + sin * beta
+    return out
+
+
+class Recording:
+    """Read access to a recording directory."""
+
+    def __init__(self, directory: str) -> None:
+        """Open a recording.
+
+        Args:
+            directory: recording directory
+        """
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as meta_file:
+            self.meta: Dict[str, Any] = json.load(meta_file)
+        self.sample_rate = float(self.meta["sample_rate"])
+        self.frequency = float(self.meta.get("frequency", 0.0))
+        self.data = np.load(os.path.join(directory, DATA_FILE), mmap_mode="r")
+
+    @property
+    def sample_count(self) -> int:
+        """Get the number of samples of each channel.
+
+        Returns:
+            number of samples
+        """
+        return self.data.shape[1]
+
+    @property
+    def duration(self) -> float:
+        """Get the recording length.
+
+        Returns:
+            seconds
+        """
+        return self.sample_count / self.sample_rate
+
+    def get_path(self, name: str) -> str:
+        """Get the path of a file stored alongside the data.
+
+        Args:
+            name: file name
+
+        Returns:
+            file path
+        """
+        return os.path.join(self.directory, name)
+
+    def get_stamp(self) -> Dict[str, int]:
+        """Identify the current data, files derived from it store the stamp and are rebuilt when it changes.
+
+        Returns:
+            dictionary with the "sample_count" and the "modified" time of the data file in nanoseconds
+        """
+        return {
+            "sample_count": self.sample_count,
+            "modified": os.stat(self.get_path(DATA_FILE)).st_mtime_ns,
+        }
+
+    def get_index(self, seconds: float) -> int:
+        """Get the sample index of a time, clipped to the recording.
+
+        Args:
+            seconds: time from the start of the recording
+
+        Returns:
+            sample index
+        """
+        return int(np.clip(round(seconds * self.sample_rate), 0, self.sample_count))
+
+
+def create_recording(
+    directory: str,
+    phases: np.ndarray,
+    sample_rate: float,
+    frequency: float,
+    angle: Optional[np.ndarray] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Recording:
+    """Write a recording from phase samples.
+
+    Args:
+        directory: recording directory, created if needed
+        phases: phases a, b and c, shape (3, samples), may be memory mapped
+        sample_rate: samples per second
+        frequency: fundamental frequency in Hz, the Park reference turns at this rate unless angle is given
+        angle: optional Park reference angle in radians, shape (samples,)
+        chunk_size: samples converted at a time
+
+    Returns:
+        the new recording
+    """
+    os.makedirs(directory, exist_ok=True)
+    sample_count = np.shape(phases)[1]
+    data = np.lib.format.open_memmap(
+        os.path.join(directory, DATA_FILE), mode="w+", dtype=np.float32, shape=(len(CHANNELS), sample_count)
+    )
+    for start in range(0, sample_count, chunk_size):
+        stop = min(start + chunk_size, sample_count)
+        if angle is None:
+            chunk_angle = (2 * np.pi * frequency / sample_rate) * np.arange(start, stop)
+        else:
+            chunk_angle = np.asarray(angle[start:stop], dtype=np.float64)
+        chunk = np.asarray(phases[:, start:stop], dtype=np.float64)
+        data[:, start:stop] = transform_chunk(chunk, chunk_angle)
+    data.flush()
+    del data
+    with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as meta_file:
+        meta = {"sample_rate": sample_rate, "frequency": frequency, "channels": CHANNELS}
+        json.dump(meta, meta_file, indent=2)
+    return Recording(directory)
+
+
+def synthesize_phases(
+    seconds: float,
+    sample_rate: float,
+    frequency: float,
+    seed: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+):
+    """Generate chunks of a synthetic capture with a few disturbances.
+
+    Every 10 minutes of capture phase B sags by 20% for a second, the q axis
+    sees a 50 ms current spike and the neutral picks up a zero sequence offset
+    for two seconds. The phase angle wanders slowly away from the nominal
+    frequency, which shows as a drift of the d axis, and a little noise is added.
+
+    Args:
+        seconds: capture length
+        sample_rate: samples per second
+        frequency: fundamental frequency in Hz
+        seed: random seed of the noise
+        chunk_size: samples per chunk
+
+    Yields:
+        phase chunks, shape (3, samples)
+    """
+    rng = np.random.default_rng(seed)
+    sample_count = int(seconds * sample_rate)
+    shifts = np.array([0.0, -2 * np.pi / 3, 2 * np.pi / 3])[:, np.newaxis]
+    period = 600.0
+    for start in range(0, sample_count, chunk_size):
+        time = np.arange(start, min(start + chunk_size, sample_count)) / sample_rate
+        cycle = time % period
+        angle = 2 * np.pi * frequency * time + 0.1 * np.sin(2 * np.pi * time / 900)
+        amplitudes = np.ones((3, len(time)))
+        amplitudes[1] -= 0.2 * ((cycle > 120) & (cycle < 121))
+        amplitudes *= 1 + 0.5 * ((cycle > 300) & (cycle < 300.05))
+        zero_sequence = 0.1 * ((cycle > 450) & (cycle < 452))
+        chunk = amplitudes * np.cos(angle + shifts) + zero_sequence
+        chunk += rng.normal(0.0, 0.005, chunk.shape)
+        yield chunk
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the recording command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Create Clarke and Park recordings.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    synthesize = commands.add_parser("synthesize", help="write a synthetic capture")
+    synthesize.add_argument("directory", help="recording directory")
+    synthesize.add_argument("--seconds", type=float, default=3600.0, help="capture length")
+    synthesize.add_argument("--rate", type=float, default=5000.0, help="samples per second")
+    synthesize.add_argument("--frequency", type=float, default=60.0, help="fundamental frequency in Hz")
+    synthesize.add_argument("--seed", type=int, default=0, help="random seed of the noise")
+    convert = commands.add_parser("import", help="convert a .npy file of phases a, b and c")
+    convert.add_argument("directory", help="recording directory")
+    convert.add_argument("phases", help="phase samples, shape (3, samples)")
+    convert.add_argument("--rate", type=float, required=True, help="samples per second")
+    convert.add_argument("--frequency", type=float, required=True, help="fundamental frequency in Hz")
+    args = parser.parse_args(argv)
+
+    if args.command == "synthesize":
+        sample_count = int(args.seconds * args.rate)
+        os.makedirs(args.directory, exist_ok=True)
+        # phases go through a temporary memory mapped file so hours of capture never sit in memory
+        phases_path = os.path.join(args.directory, "phases.tmp.npy")
+        phases = np.lib.format.open_memmap(phases_path, mode="w+", dtype=np.float32, shape=(3, sample_count))
+        start = 0
+        for chunk in synthesize_phases(args.seconds, args.rate, args.frequency, args.seed):
+            phases[:, start : start + chunk.shape[1]] = chunk
+            start += chunk.shape[1]
+        recording = create_recording(args.directory, phases, args.rate, args.frequency)
+        del phases
+        os.remove(phases_path)
+    else:
+        phases = np.load(args.phases, mmap_mode="r")
+        recording = create_recording(args.directory, phases, args.rate, args.frequency)
+    print(f"wrote {recording.sample_count} samples ({recording.duration:0.1f} s) to {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,498 @@
+"""This python module aligns phases captured at different or irregular rates onto a common time grid.
+
+The generator and the transforms assume one uniform time base, but captured
+phases often come from separate ADCs with their own sample rates and clock
+jitter. Two streaming stages bring them onto one grid before the Clarke and
+Park transforms:
+
+* PolyphaseResampler changes a uniform rate by a rational factor up / down.
+  A Kaiser windowed sinc low pass filter is split into up phases, and each
+  output sample is the dot product of one phase with the latest inputs. The
+  outputs of a chunk are computed as batched products of sliding input
+  windows with their filter phases, in blocks of outputs so the gathered
+  windows stay small.
+* TimestampResampler interpolates timestamped samples linearly onto the grid
+  with np.interp.
+
+Rate changes use the exact ratio of the rates. A uniform channel whose ratio
+needs factors above MAX_FACTOR, e.g. 20001 Hz onto 20000 Hz, would need a
+filter bank of that many phases, it is interpolated from its sample times
+instead and reported by ChannelAligner.interpolated.
+
+Both take chunks of any size and carry their filter history, or their last
+sample, over to the next chunk, so a long capture is processed in bounded
+memory and the result does not depend on where the chunks are split.
+ChannelAligner runs one stage per channel and releases the grid samples every
+channel has reached.
+
+Usage:
+    python clarke_park_resample.py check
+    python clarke_park_resample.py benchmark --rates 19200 20000 25000 --rate 20000
+    python clarke_park_resample.py import out a.npy:19200 b.npy:20000 c.npy:25000 --rate 20000 --frequency 50
+    python clarke_park_resample.py import out a_time.npy b_time.npy c_time.npy --rate 20000 --frequency 50
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+from fractions import Fraction
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from clarke_park_recording import create_recording
+
+# input samples each filter phase spans, longer filters have sharper cutoffs
+TAPS_PER_PHASE = 16
+
+# Kaiser window shape, higher values trade transition width for stopband attenuation
+KAISER_BETA = 8.0
+
+# part of the new Nyquist frequency passed by the filter
+CUTOFF = 0.9
+
+# largest upsampling and downsampling factor of a polyphase rate change
+MAX_FACTOR = 1000
+
+# input values gathered for one block of polyphase outputs
+BLOCK_VALUES = 1 << 18
+
+# grid samples aligned per step of the import command, the working memory grows with it
+IMPORT_CHUNK = 1 << 16
+
+
+def get_rate_ratio(sample_rate: float, source_rate: float) -> Fraction:
+    """Get the exact ratio of two rates.
+
+    Rates are taken as the decimal numbers they print as, so 19200.5 is 38401 / 2
+    rather than the nearest binary fraction.
+
+    Args:
+        sample_rate: grid samples per second
+        source_rate: samples per second of a channel
+
+    Returns:
+        sample_rate / source_rate in lowest terms
+    """
+    return Fraction(repr(float(sample_rate))) / Fraction(repr(float(source_rate)))
+
+
+def design_lowpass(up: int, down: int, taps_per_phase: int = TAPS_PER_PHASE) -> np.ndarray:
+    """Design the anti-aliasing and anti-imaging filter of a rate change.
+
+    Args:
+        up: upsampling factor
+        down: downsampling factor
+        taps_per_phase: input samples each filter phase spans
+
+    Returns:
+        odd length filter at the upsampled rate, with a gain of up
+    """
+    half_length = taps_per_phase * max(up, down) // 2
+    taps = np.arange(-half_length, half_length + 1)
+    cutoff = CUTOFF / max(up, down)
+    return up * cutoff * np.sinc(cutoff * taps) * np.kaiser(len(taps), KAISER_BETA)
+
+
+class PolyphaseResampler:
+    """Streaming rational rate change of several channels."""
+
+    def __init__(self, up: int, down: int, channels: int = 1, taps_per_phase: int = TAPS_PER_PHASE) -> None:
+        """Create a resampler at the start of a stream.
+
+        The output is aligned with the input: output sample m lies at input
+        sample m * down / up, the filter delay is compensated.
+
+        Args:
+            up: upsampling factor
+            down: downsampling factor
+            channels: channels resampled together
+            taps_per_phase: input samples each filter phase spans
+        """
+        divisor = np.gcd(up, down)
+        self.up = up // divisor
+        self.down = down // divisor
+        self.channels = channels
+        lowpass = design_lowpass(self.up, self.down, taps_per_phase)
+        self.delay = (len(lowpass) - 1) // 2
+        self.taps = -(-len(lowpass) // self.up)
+        # bank[phase, k] weights input sample i - k of an output at upsampled index i * up + phase
+        padded = np.zeros(self.taps * self.up)
+        padded[: len(lowpass)] = lowpass
+        self.bank = padded.reshape(self.taps, self.up).T.copy()
+        # the last taps - 1 inputs, zeros before the stream starts
+        self.history = np.zeros((channels, self.taps - 1))
+        self.consumed = 0
+        self.produced = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Resample the next chunk of the stream.
+
+        Args:
+            chunk: inputs, shape (channels, samples)
+
+        Returns:
+            every output whose filter window is complete, shape (channels, outputs)
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(self.channels, -1)
+        buffer = np.concatenate([self.history, chunk], axis=1)
+        first = self.consumed - (self.taps - 1)
+        self.consumed += chunk.shape[1]
+        # output m sits at upsampled index m * down + delay, it needs the input at that index divided by up
+        last_index = self.consumed - 1
+        stop = (last_index * self.up + self.up - 1 - self.delay) // self.down + 1
+        stop = max(stop, self.produced)
+        outputs = np.arange(self.produced, stop)
+        position = outputs * self.down + self.delay
+        newest = position // self.up - first
+        phase = position % self.up
+        self.produced = stop
+        self.history = buffer[:, buffer.shape[1] - (self.taps - 1) :]
+        if len(outputs) == 0:
+            # an empty or short chunk may not complete any filter window, the buffer can be shorter than one
+            return np.empty((self.channels, 0))
+        out = np.empty((self.channels, len(outputs)))
+        # windows[c, m, k] is input newest[m] - taps + 1 + k, matched to the reversed filter phase
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps, axis=1)
+        block = max(1, BLOCK_VALUES // (self.channels * self.taps))
+        for start in range(0, len(outputs), block):
+            stop = start + block
+            np.einsum(
+                "cmk,mk->cm",
+                windows[:, newest[start:stop] - self.taps + 1],
+                self.bank[phase[start:stop], ::-1],
+                out=out[:, start:stop],
+            )
+        return out
+
+    def flush(self) -> np.ndarray:
+        """Finish the stream, the last outputs are computed with zeros after the final input.
+
+        Returns:
+            the remaining outputs up to the end of the input, shape (channels, outputs)
+        """
+        total = -(-self.consumed * self.up // self.down)
+        padding = -(-(self.delay + 1) // self.up) + 1
+        out = self.process(np.zeros((self.channels, padding)))
+        self.consumed -= padding
+        return out[:, : max(0, total - (self.produced - out.shape[1]))]
+
+
+class TimestampResampler:
+    """Streaming linear interpolation of timestamped samples onto a uniform grid."""
+
+    def __init__(self, sample_rate: float, start: float = 0.0) -> None:
+        """Create a resampler at the start of a stream.
+
+        Args:
+            sample_rate: grid samples per second
+            start: time of the first grid sample in seconds
+        """
+        self.sample_rate = sample_rate
+        self.start = start
+        self.produced = 0
+        self.last_time: Optional[float] = None
+        self.last_value: Optional[np.ndarray] = None
+
+    def process(self, times: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Interpolate the next chunk of the stream.
+
+        Args:
+            times: increasing sample times in seconds, shape (samples,)
+            values: samples, shape (channels, samples)
+
+        Returns:
+            every grid sample up to the chunk's last time, shape (channels, outputs)
+        """
+        times = np.asarray(times, dtype=np.float64)
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        if self.last_time is not None:
+            # the previous chunk's last sample bridges the gap between the chunks
+            times = np.concatenate([[self.last_time], times])
+            values = np.concatenate([self.last_value, values], axis=1)
+        if len(times) == 0:
+            return np.empty((values.shape[0], 0))
+        stop = int(np.floor((times[-1] - self.start) * self.sample_rate)) + 1
+        grid = self.start + np.arange(self.produced, max(stop, self.produced)) / self.sample_rate
+        self.produced += len(grid)
+        self.last_time = times[-1]
+        self.last_value = values[:, -1:]
+        return np.array([np.interp(grid, times, channel) for channel in values])
+
+
+class ChannelAligner:
+    """Aligns channels of different rates, or timestamped channels, onto one grid."""
+
+    def __init__(self, sample_rate: float, source_rates: List[Optional[float]]) -> None:
+        """Create one resampling stage per channel.
+
+        Uniform channels whose exact rate ratio needs factors above MAX_FACTOR
+        are interpolated from their sample times, their indices are kept in
+        interpolated.
+
+        Args:
+            sample_rate: grid samples per second
+            source_rates: samples per second of each channel, None for a timestamped channel
+        """
+        self.source_rates = source_rates
+        self.stages: List[object] = []
+        self.interpolated: List[int] = []
+        for channel, source_rate in enumerate(source_rates):
+            ratio = None if source_rate is None else get_rate_ratio(sample_rate, source_rate)
+            if ratio is not None and max(ratio.numerator, ratio.denominator) <= MAX_FACTOR:
+                self.stages.append(PolyphaseResampler(ratio.numerator, ratio.denominator))
+            else:
+                if source_rate is not None:
+                    self.interpolated.append(channel)
+                self.stages.append(TimestampResampler(sample_rate))
+        self.consumed = [0 for _ in source_rates]
+        self.pending = [np.empty(0) for _ in source_rates]
+
+    def process(self, chunks: List[Tuple[Optional[np.ndarray], np.ndarray]]) -> np.ndarray:
+        """Resample the next chunk of every channel.
+
+        Args:
+            chunks: sample times, None for uniform channels, and samples of each channel
+
+        Returns:
+            the grid samples every channel has reached, shape (channels, outputs)
+        """
+        for channel, (times, values) in enumerate(chunks):
+            stage = self.stages[channel]
+            if times is None and channel in self.interpolated:
+                times = (self.consumed[channel] + np.arange(len(values))) / self.source_rates[channel]
+            self.consumed[channel] += len(values)
+            out = stage.process(values) if times is None else stage.process(times, values)
+            self.pending[channel] = np.concatenate([self.pending[channel], out[0]])
+        return self.release(min(len(pending) for pending in self.pending))
+
+    def flush(self) -> np.ndarray:
+        """Finish every stream.
+
+        Returns:
+            the remaining grid samples every channel has reached, shape (channels, outputs)
+        """
+        for channel, stage in enumerate(self.stages):
+            if isinstance(stage, PolyphaseResampler):
+                self.pending[channel] = np.concatenate([self.pending[channel], stage.flush()[0]])
+        return self.release(min(len(pending) for pending in self.pending))
+
+    def release(self, count: int) -> np.ndarray:
+        """Take the first grid samples of every channel.
+
+        Args:
+            count: number of grid samples
+
+        Returns:
+            samples, shape (channels, count)
+        """
+        out = np.array([pending[:count] for pending in self.pending])
+        self.pending = [pending[count:] for pending in self.pending]
+        return out
+
+
+def parse_source(text: str) -> Tuple[str, Optional[float]]:
+    """Parse a channel source argument.
+
+    Args:
+        text: "path.npy:rate" for a uniform capture, or "path.npy" for a timestamped capture holding
+            times and samples, shape (2, samples)
+
+    Returns:
+        path and samples per second, None for a timestamped capture
+    """
+    path, separator, rate = text.rpartition(":")
+    if separator and rate and not os.path.exists(text):
+        return path, float(rate)
+    return text, None
+
+
+def report_interpolated(aligner: ChannelAligner) -> None:
+    """Print the uniform channels that are interpolated instead of filtered.
+
+    Args:
+        aligner: channel aligner
+    """
+    for channel in aligner.interpolated:
+        print(
+            f"channel {channel} at {aligner.source_rates[channel]:g} Hz needs a rate change factor above "
+            + f"{MAX_FACTOR}, it is interpolated linearly"
+        )
+
+
+def check_chunking(stage: Callable[[], object], sources: np.ndarray, times: np.ndarray, sizes: np.ndarray) -> float:
+    """Compare a stage run on chunks of a stream with the same stage run on the whole stream.
+
+    Args:
+        stage: function creating the resampling stage, PolyphaseResampler or TimestampResampler
+        sources: samples, shape (channels, samples)
+        times: sample times in seconds, None for a uniform stream
+        sizes: chunk sizes adding up to the number of samples, zero sizes send empty chunks
+
+    Returns:
+        largest difference of the chunked outputs from the whole stream outputs, inf if their lengths
+            differ
+    """
+    results = []
+    for chunk_sizes in ([sources.shape[1]], sizes):
+        resampler = stage()
+        edges = np.concatenate([[0], np.cumsum(chunk_sizes)])
+        outputs = []
+        for first, last in zip(edges[:-1], edges[1:]):
+            if times is None:
+                outputs.append(resampler.process(sources[:, first:last]))
+            else:
+                outputs.append(resampler.process(times[first:last], sources[:, first:last]))
+        if isinstance(resampler, PolyphaseResampler):
+            outputs.append(resampler.flush())
+        results.append(np.concatenate(outputs, axis=1))
+    whole, chunked = results
+    if whole.shape != chunked.shape:
+        return np.inf
+    return float(np.max(np.abs(whole - chunked), initial=0.0))
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the resampling command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Align phases captured at different rates.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("check", help="check that chunking does not change the outputs")
+    check.add_argument("--rates", type=float, nargs="+", default=[19200.0, 20000.0, 25000.0])
+    check.add_argument("--rate", type=float, default=20000.0, help="grid samples per second")
+    check.add_argument("--samples", type=int, default=20000, help="samples per stream")
+    benchmark = commands.add_parser("benchmark", help="time resampling against real time")
+    benchmark.add_argument("--rates", type=float, nargs=3, default=[19200.0, 20000.0, 25000.0])
+    benchmark.add_argument("--rate", type=float, default=20000.0, help="grid samples per second")
+    benchmark.add_argument("--seconds", type=float, default=10.0, help="capture length")
+    benchmark.add_argument("--chunk", type=float, default=0.05, help="seconds per chunk")
+    benchmark.add_argument("--jitter", type=float, default=0.0, help="timestamp jitter in seconds")
+    convert = commands.add_parser("import", help="align phase captures and write a recording")
+    convert.add_argument("directory", help="recording directory")
+    convert.add_argument("sources", nargs=3, help="phases a, b and c, path.npy:rate or timestamped path.npy")
+    convert.add_argument("--rate", type=float, required=True, help="grid samples per second")
+    convert.add_argument("--frequency", type=float, required=True, help="fundamental frequency in Hz")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        rng = np.random.default_rng(0)
+        sources = rng.standard_normal((2, args.samples))
+        # chunks of every size from empty to several thousand samples, with runs of empty chunks
+        sizes = rng.choice([0, 0, 1, 2, 7, 100, 1000, 5000], size=args.samples)
+        sizes = sizes[np.cumsum(sizes) <= args.samples]
+        sizes = np.append(sizes, [args.samples - np.sum(sizes), 0])
+        failures = 0
+        cases = []
+        for source_rate in args.rates:
+            ratio = get_rate_ratio(args.rate, source_rate)
+            if max(ratio.numerator, ratio.denominator) <= MAX_FACTOR:
+                stage = functools.partial(PolyphaseResampler, ratio.numerator, ratio.denominator, channels=2)
+                cases.append((f"polyphase {source_rate:g} Hz", stage, None))
+        times = np.sort(rng.uniform(0, args.samples / args.rate, args.samples))
+        cases.append(("timestamps", lambda: TimestampResampler(args.rate), times))
+        for name, stage, stage_times in cases:
+            error = check_chunking(stage, sources, stage_times, sizes)
+            passed = error <= 1e-12
+            failures += not passed
+            result = "ok" if passed else "FAIL"
+            print(f"{name:<24} {len(sizes)} chunks, largest difference {error:.2e} {result}")
+        return 1 if failures else 0
+
+    if args.command == "benchmark":
+        frequency = 60.0
+        rng = np.random.default_rng(0)
+        sources = []
+        for phase, source_rate in enumerate(args.rates):
+            times = np.arange(int(args.seconds * source_rate)) / source_rate
+            if args.jitter > 0:
+                times = np.sort(times + rng.uniform(-args.jitter, args.jitter, len(times)))
+            sources.append((times, np.cos(2 * np.pi * frequency * times - 2 * np.pi * phase / 3)))
+        aligner = ChannelAligner(args.rate, [None if args.jitter > 0 else rate for rate in args.rates])
+        report_interpolated(aligner)
+        outputs = []
+        start = time.perf_counter()
+        edges = np.arange(int(np.ceil(args.seconds / args.chunk)) + 1) * args.chunk
+        for block_start, block_stop in zip(edges[:-1], edges[1:]):
+            chunks = []
+            for times, values in sources:
+                first, last = np.searchsorted(times, [block_start, block_stop])
+                chunk_times = times[first:last] if args.jitter > 0 else None
+                chunks.append((chunk_times, values[first:last]))
+            outputs.append(aligner.process(chunks))
+        outputs.append(aligner.flush())
+        elapsed = time.perf_counter() - start
+        aligned = np.concatenate(outputs, axis=1)
+        grid = np.arange(aligned.shape[1]) / args.rate
+        expected = np.cos(2 * np.pi * frequency * grid - 2 * np.pi * np.arange(3)[:, np.newaxis] / 3)
+        # the filters start and end on zeros, the error is measured away from the ends
+        edge = int(0.01 * args.rate)
+        error = np.max(np.abs(aligned - expected)[:, edge:-edge])
+        print(
+            f"{args.seconds:0.1f} s of capture aligned in {elapsed:0.3f} s, "
+            + f"{args.seconds / elapsed:0.0f}x real time, {aligned.shape[1]} grid samples, "
+            + f"largest error {error:0.2e}"
+        )
+        return 0
+
+    channels = []
+    durations = []
+    for text in args.sources:
+        path, source_rate = parse_source(text)
+        data = np.load(path, mmap_mode="r")
+        channels.append((data, source_rate))
+        durations.append(data.shape[-1] / source_rate if source_rate is not None else float(data[0, -1]))
+    aligner = ChannelAligner(args.rate, [source_rate for _, source_rate in channels])
+    report_interpolated(aligner)
+    os.makedirs(args.directory, exist_ok=True)
+    # phases go through a temporary memory mapped file like the recording module's synthesize command, sized
+    # for the shortest channel
+    phases_path = os.path.join(args.directory, "phases.tmp.npy")
+    capacity = int(np.ceil(min(durations) * args.rate)) + 1
+    phases = np.lib.format.open_memmap(phases_path, mode="w+", dtype=np.float32, shape=(3, capacity))
+    sample_count = 0
+    positions = [0] * len(channels)
+    # every channel is read up to the same time, so no channel runs ahead and piles up pending samples
+    chunk_seconds = IMPORT_CHUNK / args.rate
+    step = 0
+    while True:
+        step += 1
+        chunks = []
+        for channel, (data, source_rate) in enumerate(channels):
+            length = data.shape[-1]
+            first = positions[channel]
+            if source_rate is None:
+                stop = int(np.searchsorted(data[0], step * chunk_seconds))
+            else:
+                stop = min(int(np.ceil(step * chunk_seconds * source_rate)), length)
+            stop = max(stop, first)
+            positions[channel] = stop
+            if source_rate is None:
+                chunks.append((data[0, first:stop], data[1, first:stop]))
+            else:
+                chunks.append((None, data[first:stop]))
+        final = all(position == data.shape[-1] for position, (data, _) in zip(positions, channels)) and all(
+            len(values) == 0 for _, values in chunks
+        )
+        block = aligner.flush() if final else aligner.process(chunks)
+        block = block[:, : capacity - sample_count]
+        phases[:, sample_count : sample_count + block.shape[1]] = block
+        sample_count += block.shape[1]
+        if final:
+            break
+    recording = create_recording(args.directory, phases[:, :sample_count], args.rate, args.frequency)
+    del phases
+    os.remove(phases_path)
+    print(f"wrote {recording.sample_count} samples ({recording.duration:0.1f} s) to {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""This python module computes many sets of phase settings side by side.
+
+A scenario is a named set of phase amplitudes, phase offsets and zero
+sequence. All scenarios are generated and transformed together over a
+(scenarios, phases, samples) array, so comparing K scenarios costs one pass
+of NumPy operations instead of K page updates.
+
+Every scenario shares the time axis and frequency, so each phase and each of
+its harmonics is a weighted sum of the cosine and sine of the shared angle
+times the harmonic order. Those are computed once for all scenarios and the
+generator becomes one matrix product of per phase weights with them, with no
+trigonometry per scenario. The Clarke matrix product, the Park transform and
+the unbalance factors then broadcast over the scenarios.
+
+Scenarios are written one per line as "name: A amplitude, B amplitude,
+C amplitude, A offset, B offset, C offset, zero sequence", with offsets in
+units of pi like the page's sliders.
+
+Usage:
+    python clarke_park_scenarios.py --scenarios 1 4 16 64 --samples 1000
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import sys
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from clarke_park_analysis import unbalance_factors
+from clarke_park_multiphase import get_clarke_matrix, get_phase_shifts, get_zero_sequence_offsets
+from clarke_park_recording import CHANNEL_INDEX, CHANNELS
+
+PHASE_COUNT = 3
+TWO_PI = 2 * np.pi
+
+# largest number of scenarios compared at once
+MAX_SCENARIOS = 12
+
+# values of each scenario line after its name
+SCENARIO_FIELDS = [
+    "A amplitude",
+    "B amplitude",
+    "C amplitude",
+    "A offset",
+    "B offset",
+    "C offset",
+    "zero sequence",
+]
+
+DEFAULT_SCENARIOS = "\n".join(
+    [
+        "Balanced: 1, 1, 1, 0, 0, 0, 0",
+        "Phase B sag 10%: 1, 0.9, 1, 0, 0, 0, 0",
+        "Phase C offset error: 1, 1, 1, 0, 0, 0.05, 0",
+    ]
+)
+
+Scenario = Tuple[str, List[float]]
+
+
+def parse_scenarios(text: str) -> List[Scenario]:
+    """Parse scenario lines, blank lines are skipped.
+
+    Args:
+        text: one "name: values" line per scenario, see SCENARIO_FIELDS
+
+    Returns:
+        name and values of each scenario
+
+    Raises:
+        ValueError: for lines that do not hold a name and every value, or too many scenarios
+    """
+    scenarios = []
+    for number, line in enumerate((text or "").splitlines(), start=1):
+        if not line.strip():
+            continue
+        name, separator, values = line.rpartition(":")
+        fields = [field.strip() for field in values.split(",")]
+        if not separator or not name.strip() or len(fields) != len(SCENARIO_FIELDS):
+            raise ValueError(f"line {number} should be 'name: {', '.join(SCENARIO_FIELDS)}'")
+        try:
+            scenarios.append((name.strip(), [float(field) for field in fields]))
+        except ValueError as error:
+            raise ValueError(f"line {number}: {error}") from error
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"at most {MAX_SCENARIOS} scenarios can be compared")
+    return scenarios
+
+
+def format_scenario(name: str, values: List[float]) -> str:
+    """Format a scenario line.
+
+    Args:
+        name: scenario name
+        values: values in SCENARIO_FIELDS order
+
+    Returns:
+        line read back by parse_scenarios
+    """
+    return f"{name}: " + ", ".join(f"{value:g}" for value in values)
+
+
+def compute_scenarios(
+    angle: np.ndarray,
+    values: np.ndarray,
+    orders: np.ndarray = None,
+    harmonic_amplitudes: np.ndarray = None,
+    harmonic_offsets: np.ndarray = None,
+) -> Dict[str, np.ndarray]:
+    """Generate and transform every scenario in one batch.
+
+    The waveforms follow ClarkeParkExploration.generate_three_phase_data and
+    the Park transform uses the phase A waveform of each scenario as its
+    reference, like the page.
+
+    Args:
+        angle: fundamental angle of phase A in radians, shape (samples,)
+        values: scenario values in SCENARIO_FIELDS order, shape (scenarios, 7)
+        orders: optional harmonic orders shared by every scenario, shape (orders,)
+        harmonic_amplitudes: amplitude of each harmonic of each phase, shape (phases, orders)
+        harmonic_offsets: optional phase of each harmonic of each phase in units of pi, added after the
+            harmonic is shifted with its phase, shape (phases, orders)
+
+    Returns:
+        dictionary with "channels", every channel of CHANNELS, shape (scenarios, channels, samples), and
+        "negative" and "zero", the unbalance factors of each scenario, shape (scenarios,)
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(SCENARIO_FIELDS))
+    count = values.shape[0]
+    sample_count = len(angle)
+    shifts = values[:, PHASE_COUNT : 2 * PHASE_COUNT] * np.pi + get_phase_shifts(PHASE_COUNT)
+    zero_offsets = values[:, 2 * PHASE_COUNT, np.newaxis] * get_zero_sequence_offsets(PHASE_COUNT)
+
+    # amplitude of the fundamental and of each harmonic of every phase, shape (scenarios, phases, orders)
+    all_orders = np.array([1])
+    weights = values[:, 0:PHASE_COUNT, np.newaxis]
+    if orders is not None and harmonic_amplitudes is not None and np.any(harmonic_amplitudes):
+        all_orders = np.concatenate([all_orders, orders])
+        harmonics = np.broadcast_to(harmonic_amplitudes, (count, PHASE_COUNT, len(orders)))
+        weights = np.concatenate([weights, harmonics], axis=2)
+
+    # A cos(n (angle + shift)) = A cos(n shift) cos(n angle) - A sin(n shift) sin(n angle), and the same
+    # for the sine, so the waveforms are one product of weights with the shared cosines and sines
+    order_angle = all_orders * angle[:, np.newaxis]
+    basis = np.concatenate([np.cos(order_angle), np.sin(order_angle)], axis=1).T
+    shift_angle = all_orders * shifts[:, :, np.newaxis]
+    if len(all_orders) > 1 and harmonic_offsets is not None:
+        shift_angle[:, :, 1:] += np.asarray(harmonic_offsets) * np.pi
+    cos_weights = weights * np.cos(shift_angle)
+    sin_weights = weights * np.sin(shift_angle)
+    out_y = np.concatenate([cos_weights, -sin_weights], axis=2) @ basis
+    out_z = np.concatenate([sin_weights, cos_weights], axis=2) @ basis
+    out_y -= zero_offsets.real[:, :, np.newaxis]
+    out_z -= zero_offsets.imag[:, :, np.newaxis]
+
+    channels = np.empty((count, len(CHANNELS), sample_count))
+    channels[:, 0:PHASE_COUNT] = out_y
+    np.sum(out_y, axis=1, out=channels[:, CHANNEL_INDEX["n"]])
+    clarke = channels[:, CHANNEL_INDEX["alpha"] : CHANNEL_INDEX["zero"] + 1]
+    np.matmul(get_clarke_matrix(PHASE_COUNT), out_y, out=clarke)
+    alpha, beta = clarke[:, 0], clarke[:, 1]
+    reference_y, reference_z = out_y[:, 0], out_z[:, 0]
+    channels[:, CHANNEL_INDEX["d"]] = reference_z * alpha - reference_y * beta
+    channels[:, CHANNEL_INDEX["q"]] = reference_y * alpha + reference_z * beta
+
+    negative, zero = unbalance_factors(out_y + 1j * out_z)
+    return {"channels": channels, "negative": negative, "zero": zero}
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the scenario batch timing command line interface.
+
+    Random scenarios are computed in one batch and one at a time by the page's
+    update code, the two results are compared and both are timed.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    # the page module imports this one
+    from clarke_park_3d import (  # pylint: disable=import-outside-toplevel
+        HARMONIC_ORDERS,
+        ClarkeParkExploration,
+    )
+
+    parser = argparse.ArgumentParser(description="Time batched scenario comparisons.")
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[1, 4, 16, 64], help="scenario counts")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    cpe = ClarkeParkExploration(sample_count=args.samples)
+    cpe.time_offset = 0.3
+    cpe.frequency = 1.5
+    cpe.harmonic_amplitudes[:] = [0.05, 0.03, 0.0, 0.01]
+    cpe.harmonic_amplitudes[:, 2] = [0.0, 0.02, -0.01]
+    cpe.harmonic_offsets[:] = rng.uniform(-1.0, 1.0, cpe.harmonic_offsets.shape)
+    angle = (cpe.time + cpe.time_offset) * cpe.frequency * TWO_PI
+    for count in args.scenarios:
+        values = np.column_stack(
+            [
+                rng.uniform(0.5, 1.5, (count, PHASE_COUNT)),
+                rng.uniform(-0.2, 0.2, (count, PHASE_COUNT)),
+                rng.uniform(0.0, 0.3, count),
+            ]
+        )
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = compute_scenarios(
+                angle, values, HARMONIC_ORDERS, cpe.harmonic_amplitudes, cpe.harmonic_offsets
+            )
+        batch = (time.perf_counter() - start) / args.repeat
+
+        error = 0.0
+        start = time.perf_counter()
+        for scenario in range(count):
+            amplitudes, offsets, zero_sequence = np.split(values[scenario], [PHASE_COUNT, 2 * PHASE_COUNT])
+            cpe.phaseA_amplitude, cpe.phaseB_amplitude, cpe.phaseC_amplitude = amplitudes
+            cpe.phaseA_offset, cpe.phaseB_offset, cpe.phaseC_offset = offsets
+            cpe.zero_sequence = float(zero_sequence[0])
+            cpe.generate_figure_data()
+            expected = np.concatenate([cpe.three_phase_data[:, 1], cpe.clarke_data, cpe.park_data[:2]])
+            error = max(error, float(np.max(np.abs(result["channels"][scenario] - expected))))
+        single = time.perf_counter() - start
+        print(
+            f"{count:4d} scenarios: batch {batch * 1e3:8.3f} ms, one at a time {single * 1e3:8.3f} ms, "
+            + f"largest difference {error:0.2e}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
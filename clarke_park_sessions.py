@@ -0,0 +1,397 @@
+"""This python module keeps a bounded pool of per-session page instances.
+
+Every browser session gets its own ClarkeParkExploration instance, so its
+workspaces, figure dictionaries and cached results are not shared with other
+tabs. The pool measures the bytes held by each instance after its updates,
+counting NumPy buffers once however many views and figure traces refer to
+them. Walking the figure dictionaries takes a millisecond or two, so a session
+is measured again at most every MEASURE_INTERVAL seconds while sliders move.
+
+Sessions idle for longer than SESSION_IDLE seconds are dropped, and while the
+total is over SESSION_BUDGET bytes the least recently used idle sessions are
+evicted. A session that comes back after being evicted gets a new instance.
+Every update sets all of the controls, and the view state that is not a
+control, such as the focused view, is kept for evicted sessions until they
+expire and restored on the new instance, so the page looks the same.
+
+Updates of one session run one at a time: each session, and the shared
+default instance, has a lock that is held from the creation of the instance
+through the update and the serialization of its figures, so overlapping
+requests of a dragged slider never share a workspace mid-update. Callbacks
+return figures that refer to the instance's workspace arrays, so they hold
+the session until the end of their request, after dash has encoded the
+response, rather than copying the figures.
+
+Other instances kept for a session, such as the copy the live stream
+animates, are held by the pool as extras of the session. They are measured
+with the session's instance and dropped with it. Each frame of a live stream
+uses its session, so a streaming session is not dropped as idle.
+
+Usage is reported as JSON on the "/sessions" endpoint of the Flask server.
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import contextlib
+import enum
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import flask
+import numpy as np
+
+# total bytes held by session instances, and seconds after which an unused session is dropped
+SESSION_BUDGET = int(float(os.environ.get("CLARKE_PARK_SESSION_BUDGET_MB", "512")) * (1 << 20))
+SESSION_IDLE = float(os.environ.get("CLARKE_PARK_SESSION_IDLE", "3600"))
+
+# seconds between measurements of a session that keeps updating
+MEASURE_INTERVAL = 1.0
+
+# characters of the session ids shown in reports
+REPORT_ID_LENGTH = 8
+
+# instance attributes kept for evicted sessions, the view state that updates do not set from controls
+RETAINED_ATTRIBUTES = ["focus_selection", "webgl_2d"]
+
+# objects measure_bytes does not follow into
+SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    enum.Enum,
+)
+
+
+def measure_bytes(value: Any, seen: Optional[set] = None) -> int:
+    """Estimate the memory held by a value and everything it refers to.
+
+    Dictionaries, lists, tuples, sets and the attributes of objects are
+    followed, except classes, modules, functions and enum members, which are
+    shared rather than held. NumPy arrays count their underlying buffer once,
+    so views and figure traces that refer to workspace arrays add nothing.
+
+    Args:
+        value: value to measure
+        seen: ids of the objects and buffers already counted
+
+    Returns:
+        bytes
+    """
+    if seen is None:
+        seen = set()
+    if isinstance(value, np.ndarray):
+        base = value
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if id(base) in seen:
+            return 0
+        seen.add(id(base))
+        return base.nbytes
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(measure_bytes(key, seen) + measure_bytes(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(measure_bytes(item, seen) for item in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, SHARED_TYPES):
+        size += measure_bytes(vars(value), seen)
+    return size
+
+
+class Session:
+    """Instance and accounting of one browser session."""
+
+    def __init__(self, instance: Any, now: float) -> None:
+        """Create a session.
+
+        Args:
+            instance: page instance of the session
+            now: creation time
+        """
+        self.instance = instance
+        self.bytes = 0
+        self.last_used = now
+        # time of the last measurement, None until the first update is done
+        self.measured: Optional[float] = None
+        # updates of the session in progress or waiting, sessions are only evicted when idle
+        self.active = 0
+        # held from the creation of the instance through each update, updates of a session run one at a time
+        self.lock = threading.Lock()
+        # other instances kept for the session by name, see SessionPool.get_extra
+        self.extras: Dict[str, Any] = {}
+
+
+class SessionPool:
+    """Per-session instances under a global memory budget with least recently used eviction."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        default: Any,
+        budget: int = SESSION_BUDGET,
+        idle: float = SESSION_IDLE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create an empty pool.
+
+        Args:
+            factory: function creating the instance of a new session
+            default: shared instance used for requests without a session id, it is not accounted
+            budget: total bytes of the session instances
+            idle: seconds after which an unused session is dropped
+            clock: time source
+        """
+        self.factory = factory
+        self.default = default
+        self.budget = budget
+        self.idle = idle
+        self.clock = clock
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # retained attributes and last use time of evicted sessions
+        self.retained: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self.total = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+        # serializes the updates of the default instance
+        self.default_lock = threading.Lock()
+        # extras of the default instance, not accounted like the default instance
+        self.default_extras: Dict[str, Any] = {}
+
+    @contextlib.contextmanager
+    def use(self, session_id: Optional[str], create: bool = True) -> Iterator[Any]:
+        """Get the instance of a session for one update, creating the session if needed.
+
+        The session's lock is held while the caller uses the instance, so
+        callers should finish everything that reads the instance, including
+        serializing its figures, inside the with block. The instance and the
+        session's extras are measured, if they were not measured in the last
+        MEASURE_INTERVAL seconds, and the budget enforced when the update is
+        done.
+
+        Args:
+            session_id: session id, None for the shared default instance
+            create: create the session if it has no instance, otherwise None is yielded for it
+
+        Yields:
+            the session's instance
+        """
+        if not session_id:
+            with self.default_lock:
+                yield self.default
+            return
+        with self.lock:
+            session = self.sessions.get(session_id)
+            retained: Dict[str, Any] = {}
+            if session is None or session.instance is None:
+                if create is False:
+                    session = None
+                elif session is None:
+                    session = self.sessions[session_id] = Session(None, self.clock())
+                    retained = self.retained.pop(session_id, ({}, 0.0))[0]
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+                session.active += 1
+        if session is None:
+            yield None
+            return
+        try:
+            with session.lock:
+                try:
+                    if session.instance is None:
+                        # the first update of a session builds its workspace outside of the pool lock
+                        instance = self.factory()
+                        for name, value in retained.items():
+                            setattr(instance, name, value)
+                        session.instance = instance
+                    yield session.instance
+                finally:
+                    now = self.clock()
+                    size = session.bytes
+                    if session.measured is None or now - session.measured >= MEASURE_INTERVAL:
+                        seen: set = set()
+                        size = measure_bytes(session.instance, seen) if session.instance is not None else 0
+                        size += sum(measure_bytes(extra, seen) for extra in session.extras.values())
+                        session.measured = now
+        finally:
+            with self.lock:
+                session.active -= 1
+                session.last_used = now
+                if self.sessions.get(session_id) is session:
+                    self.total += size - session.bytes
+                session.bytes = size
+                self.enforce(session_id)
+
+    def hold(self, session_id: Optional[str]) -> Any:
+        """Get the instance of a session for the rest of the current Flask request.
+
+        This is use() entered for the request, the session is released when
+        the request ends, after dash has serialized the callback outputs, so
+        the outputs can refer to the instance's figures and workspace arrays.
+        The server must be set up with install().
+
+        Args:
+            session_id: session id, None for the shared default instance
+
+        Returns:
+            the session's instance
+        """
+        stack = flask.g.get("held_sessions")
+        if stack is None:
+            stack = flask.g.held_sessions = contextlib.ExitStack()
+        return stack.enter_context(self.use(session_id))
+
+    def release(self, _exception: Optional[BaseException] = None) -> None:
+        """Release the sessions held by the current Flask request.
+
+        Args:
+            _exception: exception that ended the request, if any
+        """
+        stack = flask.g.pop("held_sessions", None)
+        if stack is not None:
+            stack.close()
+
+    def get_extra(self, session_id: Optional[str], name: str, factory: Callable[[], Any]) -> Any:
+        """Get an instance kept for a session next to its page instance, creating it if needed.
+
+        The caller must be using the session, see use(). Extras are measured
+        with the session's instance when the use ends, so they count toward
+        the budget, and are dropped with the session.
+
+        Args:
+            session_id: session id, None for the shared default instance
+            name: name of the extra
+            factory: function creating the extra
+
+        Returns:
+            the extra
+        """
+        if not session_id:
+            extras = self.default_extras
+            session = None
+        else:
+            with self.lock:
+                session = self.sessions[session_id]
+            extras = session.extras
+        if name not in extras:
+            extras[name] = factory()
+            if session is not None:
+                # measured when the use ends
+                session.measured = None
+        return extras[name]
+
+    def remove_extra(self, session_id: Optional[str], name: str) -> None:
+        """Drop an extra of a session, if the session and the extra still exist.
+
+        Args:
+            session_id: session id, None for the shared default instance
+            name: name of the extra
+        """
+        with self.use(session_id, create=False) as instance:
+            if instance is None:
+                return
+            if not session_id:
+                self.default_extras.pop(name, None)
+                return
+            with self.lock:
+                session = self.sessions[session_id]
+            if session.extras.pop(name, None) is not None:
+                session.measured = None
+
+    def enforce(self, keep: str = "") -> None:
+        """Drop expired sessions, then evict idle sessions while over the budget, the pool lock must be held.
+
+        Args:
+            keep: session that is never evicted, the one that was just used
+        """
+        now = self.clock()
+        for session_id, session in list(self.sessions.items()):
+            if session.active == 0 and session_id != keep and now - session.last_used > self.idle:
+                self.remove(session_id)
+                self.expirations += 1
+        for session_id, (_, last_used) in list(self.retained.items()):
+            if now - last_used > self.idle:
+                del self.retained[session_id]
+        # sessions are kept from least to most recently used
+        for session_id, session in list(self.sessions.items()):
+            if self.total <= self.budget:
+                break
+            if session.active == 0 and session_id != keep:
+                self.remove(session_id, retain=True)
+                self.evictions += 1
+
+    def remove(self, session_id: str, retain: bool = False) -> None:
+        """Remove a session, the pool lock must be held.
+
+        Args:
+            session_id: session id
+            retain: keep the session's RETAINED_ATTRIBUTES for its next instance
+        """
+        session = self.sessions.pop(session_id)
+        self.total -= session.bytes
+        if retain and session.instance is not None:
+            attributes = {name: getattr(session.instance, name) for name in RETAINED_ATTRIBUTES}
+            self.retained[session_id] = (attributes, session.last_used)
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """Get the instance of a session without using it, e.g. to follow its controls.
+
+        Args:
+            session_id: session id, "" for the shared default instance
+
+        Returns:
+            instance, None if the session has no instance
+        """
+        if not session_id:
+            return self.default
+        with self.lock:
+            session = self.sessions.get(session_id)
+        return session.instance if session is not None else None
+
+    def report(self) -> Dict[str, Any]:
+        """Get the memory use of the pool.
+
+        Returns:
+            totals, limits and eviction counts, plus the bytes and idle time of each session
+        """
+        now = self.clock()
+        with self.lock:
+            return {
+                "sessions": len(self.sessions),
+                "bytes": self.total,
+                "budget": self.budget,
+                "idle_limit": self.idle,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "retained": len(self.retained),
+                "default_bytes": measure_bytes(self.default),
+                "by_session": [
+                    {
+                        "id": session_id[:REPORT_ID_LENGTH],
+                        "bytes": session.bytes,
+                        "idle": round(now - session.last_used, 3),
+                        "active": session.active,
+                    }
+                    for session_id, session in reversed(self.sessions.items())
+                ],
+            }
+
+    def install(self, server: flask.Flask) -> None:
+        """Add the "/sessions" usage report endpoint to a Flask server and release held sessions.
+
+        Args:
+            server: Flask server of the dash app
+        """
+        server.teardown_request(self.release)
+
+        @server.route("/sessions")
+        def sessions():
+            return flask.jsonify(self.report())
@@ -0,0 +1,456 @@
+"""This python module shares the latest Clarke and Park frames with other local processes.
+
+The publisher writes every computed frame into a ring of slots in a
+multiprocessing.shared_memory block. Readers attach to the block by name and
+get NumPy views straight into it, so a frame reaches a test script or logger on
+the same machine without HTTP, JSON or any copy.
+
+The block starts with a HEADER_SIZE byte header:
+
+    uint64 magic, uint32 version, uint32 slot count, uint32 channel count,
+    uint32 sample capacity, uint64 sequence number of the latest frame
+
+followed by the slots. Each slot has a SLOT_HEADER_SIZE byte header:
+
+    uint64 begin sequence, uint64 end sequence, float64 time offset,
+    float64 frequency, uint64 sample count, uint64 session tag
+
+and float64 data of shape (channels, capacity) in SHARED_CHANNELS order. Frame
+n goes to slot n % slots. The writer sets the begin sequence, the data, the
+end sequence and finally the header sequence, so a reader holding frame n can
+tell it was overwritten once the slot's begin sequence is no longer n. The
+writer never waits for readers; a reader that falls more than a ring behind
+skips frames, the sequence numbers show how many.
+
+Every browser session publishes its own frames into the same ring. The session
+tag, a hash of the session id from get_session_tag, tells them apart, and
+readers can ask for the frames of one session only.
+
+Usage:
+    CLARKE_PARK_SHM=clarke_park python clarke_park_3d.py
+    python clarke_park_shm.py clarke_park
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, List, Optional
+import numpy as np
+from clarke_park_recording import CHANNEL_INDEX, CHANNELS
+
+SHARED_NAME = os.environ.get("CLARKE_PARK_SHM", "")
+
+# channels of each frame, the Clarke α, β and zero components and the Park d and q components
+SHARED_CHANNELS = CHANNELS[CHANNEL_INDEX["alpha"] :]
+
+MAGIC = 0x4D48534B52415043
+VERSION = 2
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 64
+DEFAULT_SLOTS = 8
+
+# header fields, as indices of uint32 and uint64 views
+MAGIC_FIELD = 0
+VERSION_FIELD = 2
+SLOTS_FIELD = 3
+CHANNELS_FIELD = 4
+CAPACITY_FIELD = 5
+SEQUENCE_FIELD = 3
+
+# slot header fields, as indices of uint64 and float64 views
+BEGIN_FIELD = 0
+END_FIELD = 1
+TIME_FIELD = 2
+FREQUENCY_FIELD = 3
+COUNT_FIELD = 4
+SESSION_FIELD = 5
+
+
+def get_session_tag(session_id: str) -> int:
+    """Get the tag stored with the frames of a browser session.
+
+    Args:
+        session_id: session id, "" for updates without a session
+
+    Returns:
+        64 bit hash of the session id, 0 for ""
+    """
+    if not session_id:
+        return 0
+    return int.from_bytes(hashlib.blake2b(session_id.encode(), digest_size=8).digest(), "little")
+
+
+def get_block_size(slots: int, channels: int, capacity: int) -> int:
+    """Get the bytes of a shared block.
+
+    Args:
+        slots: number of frames in the ring
+        channels: channels of each frame
+        capacity: largest number of samples of a frame
+
+    Returns:
+        bytes
+    """
+    return HEADER_SIZE + slots * (SLOT_HEADER_SIZE + channels * capacity * 8)
+
+
+class SharedBlock:
+    """Views of the header and slots of a shared block."""
+
+    def __init__(self, memory: shared_memory.SharedMemory) -> None:
+        """Map the views of a block whose header is written.
+
+        Args:
+            memory: shared memory block
+        """
+        self.memory = memory
+        self.header32 = np.ndarray((HEADER_SIZE // 4,), dtype=np.uint32, buffer=memory.buf)
+        self.header64 = np.ndarray((HEADER_SIZE // 8,), dtype=np.uint64, buffer=memory.buf)
+        if int(self.header64[MAGIC_FIELD]) != MAGIC or int(self.header32[VERSION_FIELD]) != VERSION:
+            raise ValueError(f"{memory.name} is not a version {VERSION} Clarke and Park frame block")
+        self.slots = int(self.header32[SLOTS_FIELD])
+        self.channels = int(self.header32[CHANNELS_FIELD])
+        self.capacity = int(self.header32[CAPACITY_FIELD])
+        slot_size = SLOT_HEADER_SIZE + self.channels * self.capacity * 8
+        self.slot_headers = []
+        self.slot_values = []
+        self.slot_data = []
+        for slot in range(self.slots):
+            offset = HEADER_SIZE + slot * slot_size
+            self.slot_headers.append(
+                np.ndarray((SLOT_HEADER_SIZE // 8,), dtype=np.uint64, buffer=memory.buf, offset=offset)
+            )
+            self.slot_values.append(
+                np.ndarray((SLOT_HEADER_SIZE // 8,), dtype=np.float64, buffer=memory.buf, offset=offset)
+            )
+            self.slot_data.append(
+                np.ndarray(
+                    (self.channels, self.capacity),
+                    dtype=np.float64,
+                    buffer=memory.buf,
+                    offset=offset + SLOT_HEADER_SIZE,
+                )
+            )
+
+    @property
+    def sequence(self) -> int:
+        """Get the sequence number of the latest frame.
+
+        Returns:
+            sequence number, 0 before the first frame
+        """
+        return int(self.header64[SEQUENCE_FIELD])
+
+    def release(self) -> None:
+        """Drop the views so the block can be closed."""
+        self.header32 = self.header64 = None
+        self.slot_headers, self.slot_values, self.slot_data = [], [], []
+
+
+class SharedFramePublisher:
+    """Writes frames into a shared memory ring, the writing side of SharedFrameReader."""
+
+    def __init__(self) -> None:
+        """Create a closed publisher, publish does nothing until open is called."""
+        self.block: Optional[SharedBlock] = None
+        self.next_sequence = 1
+        # the page publishes from the request threads of every session
+        self.lock = threading.Lock()
+
+    def open(self, name: str = SHARED_NAME, capacity: int = 100, slots: int = DEFAULT_SLOTS) -> None:
+        """Create the shared block, replacing a block of the same name left by an earlier run.
+
+        Args:
+            name: shared memory name readers attach to
+            capacity: largest number of samples of a frame
+            slots: number of frames in the ring
+        """
+        try:
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        memory = shared_memory.SharedMemory(
+            name, create=True, size=get_block_size(slots, len(SHARED_CHANNELS), capacity)
+        )
+        header32 = np.ndarray((HEADER_SIZE // 4,), dtype=np.uint32, buffer=memory.buf)
+        header64 = np.ndarray((HEADER_SIZE // 8,), dtype=np.uint64, buffer=memory.buf)
+        header64[:] = 0
+        header32[VERSION_FIELD] = VERSION
+        header32[SLOTS_FIELD] = slots
+        header32[CHANNELS_FIELD] = len(SHARED_CHANNELS)
+        header32[CAPACITY_FIELD] = capacity
+        # the magic number goes last, readers attaching early see an invalid block
+        header64[MAGIC_FIELD] = MAGIC
+        del header32, header64
+        with self.lock:
+            self.block = SharedBlock(memory)
+            self.next_sequence = 1
+
+    def close(self, unlink: bool = True) -> None:
+        """Close the block.
+
+        Args:
+            unlink: remove the block, readers already attached keep their mapping
+        """
+        with self.lock:
+            if self.block is None:
+                return
+            memory = self.block.memory
+            self.block.release()
+            self.block = None
+        memory.close()
+        if unlink:
+            memory.unlink()
+
+    def publish(
+        self,
+        clarke_data: np.ndarray,
+        park_data: np.ndarray,
+        time_offset: float,
+        frequency: float,
+        session_id: str = "",
+    ) -> int:
+        """Write a frame into the next slot, from any thread.
+
+        Frames longer than the block's capacity are truncated. Frames are written one at a time, so
+        sequence numbers only grow and no two frames share a slot while they are written.
+
+        Args:
+            clarke_data: Clarke α, β and zero components, shape (3, samples)
+            park_data: Park d and q components and any further rows, shape (>= 2, samples)
+            time_offset: time slider value of the frame
+            frequency: frequency of the frame
+            session_id: browser session the frame belongs to, "" for none
+
+        Returns:
+            sequence number of the frame, 0 while the publisher is closed
+        """
+        tag = get_session_tag(session_id)
+        with self.lock:
+            block = self.block
+            if block is None:
+                return 0
+            sequence = self.next_sequence
+            self.next_sequence += 1
+            slot = sequence % block.slots
+            count = min(clarke_data.shape[-1], block.capacity)
+            header = block.slot_headers[slot]
+            values = block.slot_values[slot]
+            data = block.slot_data[slot]
+            header[BEGIN_FIELD] = sequence
+            data[0:3, :count] = clarke_data[:, :count]
+            data[3:5, :count] = park_data[0:2, :count]
+            values[TIME_FIELD] = time_offset
+            values[FREQUENCY_FIELD] = frequency
+            header[COUNT_FIELD] = count
+            header[SESSION_FIELD] = tag
+            header[END_FIELD] = sequence
+            block.header64[SEQUENCE_FIELD] = sequence
+            return sequence
+
+    def publish_instance(self, cpe: Any, session_id: str = "") -> int:
+        """Write the current frame of a page instance.
+
+        Args:
+            cpe: ClarkeParkExploration instance after generate_figure_data
+            session_id: browser session of the instance, "" for none
+
+        Returns:
+            sequence number of the frame, 0 while the publisher is closed
+        """
+        if self.block is None:
+            return 0
+        return self.publish(cpe.clarke_data, cpe.park_data, cpe.time_offset, cpe.frequency, session_id)
+
+
+class SharedFrame:
+    """A frame read from a shared block, its data is a view into the block."""
+
+    def __init__(self, block: SharedBlock, slot: int, sequence: int) -> None:
+        """Wrap a slot holding a complete frame.
+
+        Args:
+            block: shared block
+            slot: slot index
+            sequence: sequence number of the frame
+        """
+        self.block = block
+        self.slot = slot
+        self.sequence = sequence
+        self.time_offset = float(block.slot_values[slot][TIME_FIELD])
+        self.frequency = float(block.slot_values[slot][FREQUENCY_FIELD])
+        self.session_tag = int(block.slot_headers[slot][SESSION_FIELD])
+        self.data = block.slot_data[slot][:, : int(block.slot_headers[slot][COUNT_FIELD])]
+
+    def __getitem__(self, channel: str) -> np.ndarray:
+        """Get a channel view.
+
+        Args:
+            channel: name in SHARED_CHANNELS
+
+        Returns:
+            samples of the channel, a view into shared memory
+        """
+        return self.data[SHARED_CHANNELS.index(channel)]
+
+    @property
+    def valid(self) -> bool:
+        """Check the writer has not started overwriting the frame's slot.
+
+        Check after using the views; if the frame is no longer valid the values read may be torn.
+
+        Returns:
+            True while the data belongs to this frame
+        """
+        return int(self.block.slot_headers[self.slot][BEGIN_FIELD]) == self.sequence
+
+
+class SharedFrameReader:
+    """Zero-copy reader of the frames published by SharedFramePublisher."""
+
+    def __init__(self, name: str = SHARED_NAME) -> None:
+        """Attach to a shared block.
+
+        Args:
+            name: shared memory name of the publisher
+        """
+        memory = shared_memory.SharedMemory(name)
+        try:
+            self.block = SharedBlock(memory)
+        except ValueError:
+            memory.close()
+            raise
+        # before python 3.13 attaching registers the block with the resource tracker, which would
+        # remove it when this process exits
+        if sys.version_info < (3, 13):
+            try:
+                from multiprocessing import resource_tracker  # pylint: disable=import-outside-toplevel
+
+                resource_tracker.unregister(memory._name, "shared_memory")  # pylint: disable=protected-access
+            except (AttributeError, KeyError):
+                pass
+        self.last_sequence = 0
+
+    @property
+    def channels(self) -> List[str]:
+        """Get the channel names.
+
+        Returns:
+            channel names in data order
+        """
+        return SHARED_CHANNELS[: self.block.channels]
+
+    def get_latest(self, session_id: Optional[str] = None) -> Optional[SharedFrame]:
+        """Get the latest complete frame.
+
+        Args:
+            session_id: only return frames of this browser session, None for frames of any session
+
+        Returns:
+            frame, None before the first frame is published or when no frame of the session is in the ring
+        """
+        tag = None if session_id is None else get_session_tag(session_id)
+        while True:
+            latest = self.block.sequence
+            if latest == 0:
+                return None
+            for sequence in range(latest, max(0, latest - self.block.slots), -1):
+                slot = sequence % self.block.slots
+                if int(self.block.slot_headers[slot][END_FIELD]) != sequence:
+                    continue
+                frame = SharedFrame(self.block, slot, sequence)
+                # the writer may have started the next lap while the metadata was read
+                if frame.valid and (tag is None or frame.session_tag == tag):
+                    self.last_sequence = sequence
+                    return frame
+            if tag is not None:
+                return None
+
+    def wait(
+        self, timeout: Optional[float] = None, spin: float = 0.001, session_id: Optional[str] = None
+    ) -> Optional[SharedFrame]:
+        """Wait for a frame newer than the last one returned.
+
+        The sequence number is polled in a busy loop for the first spin seconds, which sees new frames
+        within microseconds, then with short sleeps to spare the CPU.
+
+        Args:
+            timeout: seconds to wait, None waits forever
+            spin: seconds of busy polling before sleeping between polls
+            session_id: only return frames of this browser session, None for frames of any session
+
+        Returns:
+            frame, None on timeout
+        """
+        started = time.perf_counter()
+        seen = previous = self.last_sequence
+        while True:
+            sequence = self.block.sequence
+            if sequence > seen:
+                seen = sequence
+                frame = self.get_latest(session_id)
+                if frame is not None and frame.sequence > previous:
+                    return frame
+                self.last_sequence = previous
+            waited = time.perf_counter() - started
+            if timeout is not None and waited > timeout:
+                return None
+            if waited > spin:
+                time.sleep(0.0001)
+
+    def close(self) -> None:
+        """Detach from the block, frames read earlier must not be used afterwards."""
+        memory = self.block.memory
+        self.block.release()
+        memory.close()
+
+
+SHARED_FRAMES = SharedFramePublisher()
+
+
+def main(argv: List[str] = None) -> int:
+    """Print the frames of a running publisher with their latency.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Read Clarke and Park frames from shared memory.")
+    parser.add_argument("name", nargs="?", default=SHARED_NAME or "clarke_park", help="shared memory name")
+    parser.add_argument("--frames", type=int, default=0, help="frames to read, 0 reads until interrupted")
+    parser.add_argument("--session", help="only read the frames of this browser session id")
+    args = parser.parse_args(argv)
+    reader = SharedFrameReader(args.name)
+    read = skipped = 0
+    try:
+        while args.frames == 0 or read < args.frames:
+            previous = reader.last_sequence
+            frame = reader.wait(session_id=args.session)
+            if previous:
+                skipped += frame.sequence - previous - 1
+            read += 1
+            line = ", ".join(f"{name} {frame[name][0]: 0.3f}" for name in reader.channels)
+            print(
+                f"frame {frame.sequence} session {frame.session_tag:016x} time {frame.time_offset:0.2f}: "
+                + f"{line}, skipped {skipped}"
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frame = None
+        reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
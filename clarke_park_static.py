@@ -0,0 +1,399 @@
+"""This python script builds a static copy of the page for hosts without a Python server.
+
+Every time slider step of the default settings, and optionally of a coarse grid
+of other slider values, is computed by the same update code as the web page.
+The frames are written as gzip compressed JSON shards of SHARD_FRAMES time
+steps each, next to an index.html rendered from the page layout down to the
+symmetrical components readout. The page loads the shards it needs as the
+sliders move and restyles the plot and the equation values in place, so the
+explorer can be served from any static file host with no server CPU.
+
+Usage:
+    python clarke_park_static.py --output site
+    python clarke_park_static.py --grid phaseB_amplitude_slider=0.8,0.9,1 --grid harmonic5_slider=0,0.1
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import argparse
+import gzip
+import html as html_text
+import itertools
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import plotly
+from plotly.offline import get_plotlyjs
+from clarke_park_3d import AXIS_COUNT, CAMERA_PRESETS, PHASE_COUNT, ClarkeParkExploration, FocusAxis, app
+from clarke_park_bench import DEFAULT_CONTROLS
+from clarke_park_stream import get_frame
+
+# time slider steps per shard
+SHARD_FRAMES = 10
+
+# sliders that can be part of the grid, the time slider is always stepped and the size only scales the plot
+GRID_CONTROLS = [
+    name
+    for name in DEFAULT_CONTROLS
+    if name.endswith("_slider") and name not in ("time_slider", "size_slider")
+]
+
+# layout slider ids of the DEFAULT_CONTROLS names that differ
+SLIDER_IDS = {"zero_sequence_slider": "zerosequence_slider"}
+
+# camera preset of each view button
+FOCUS_BUTTONS = {
+    "focus_xy": FocusAxis.XY,
+    "focus_xz": FocusAxis.XZ,
+    "focus_yz": FocusAxis.YZ,
+    "focus_corner": FocusAxis.XYZ,
+}
+
+# the static page ends with this component, later sections need the server
+LAST_COMPONENT = "unbalance"
+
+# dash properties written as HTML attributes
+ATTRIBUTES = {"id": "id", "className": "class", "title": "title", "colSpan": "colspan", "rowSpan": "rowspan"}
+
+CAMEL_CASE = re.compile("([A-Z])")
+
+TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static_site")
+ASSETS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+
+def parse_grid(specs: List[str]) -> Dict[str, List[float]]:
+    """Parse grid options.
+
+    Args:
+        specs: "<slider>=<value>,<value>,..." strings, see GRID_CONTROLS
+
+    Returns:
+        dictionary of slider name to values
+
+    Raises:
+        ValueError: for unknown sliders or empty value lists
+    """
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in GRID_CONTROLS:
+            raise ValueError(f"{name} is not one of {', '.join(GRID_CONTROLS)}")
+        grid[name] = [float(value) for value in values.split(",") if value.strip()]
+        if len(grid[name]) == 0:
+            raise ValueError(f"{name} has no values")
+    return grid
+
+
+def get_time_steps(slider_count: int) -> List[float]:
+    """Get the values of the time slider.
+
+    Args:
+        slider_count: slider steps between 0 and 1
+
+    Returns:
+        time offsets from 0 to 1
+    """
+    return [step / slider_count for step in range(slider_count + 1)]
+
+
+def build_frames(cpe: ClarkeParkExploration, controls: Dict[str, Any], time_steps: List[float]) -> List[dict]:
+    """Compute the page content of every time step of one set of slider values.
+
+    Args:
+        cpe: instance computing the frames
+        controls: update arguments, see DEFAULT_CONTROLS
+        time_steps: time slider values
+
+    Returns:
+        frames with the trace names, the rounded y and z coordinates, the equation values and the unbalance
+    """
+    frames = []
+    for time_offset in time_steps:
+        cpe.update("time_slider.value", **dict(controls, time_slider=time_offset))
+        frame = get_frame(cpe)
+        frames.append(
+            {
+                "names": frame["names"],
+                "traces": {"y": frame["traces"]["y"], "z": frame["traces"]["z"]},
+                "equation_values": cpe.get_equation_values(),
+                "unbalance": cpe.get_unbalance_label(),
+            }
+        )
+    return frames
+
+
+def write_shards(frames: List[dict], directory: str, combination: int) -> List[str]:
+    """Write the frames of one grid combination as gzip compressed JSON shards.
+
+    Args:
+        frames: frames of every time step
+        directory: shard directory
+        combination: grid combination index
+
+    Returns:
+        shard file names
+    """
+    names = []
+    for block, start in enumerate(range(0, len(frames), SHARD_FRAMES)):
+        name = f"{combination}_{block}.json.gz"
+        payload = json.dumps(frames[start : start + SHARD_FRAMES], separators=(",", ":")).encode("utf-8")
+        with open(os.path.join(directory, name), "wb") as shard_file:
+            # a fixed time stamp keeps rebuilt shards identical
+            shard_file.write(gzip.compress(payload, compresslevel=9, mtime=0))
+        names.append(name)
+    return names
+
+
+def to_css(style: Dict[str, Any]) -> str:
+    """Convert a dash style dictionary to an inline CSS declaration.
+
+    Args:
+        style: style with camel case property names
+
+    Returns:
+        CSS text
+    """
+    declarations = [(CAMEL_CASE.sub(r"-\1", key).lower(), value) for key, value in style.items()]
+    return "; ".join(f"{key}: {value}" for key, value in declarations)
+
+
+def render_tag(tag: str, props: Dict[str, Any], inner: str = "") -> str:
+    """Render an HTML element.
+
+    Args:
+        tag: element name
+        props: dash properties, the ones in ATTRIBUTES and "style" are written
+        inner: rendered children
+
+    Returns:
+        HTML text
+    """
+    attributes = "".join(
+        f' {attribute}="{html_text.escape(str(props[name]))}"'
+        for name, attribute in ATTRIBUTES.items()
+        if props.get(name) is not None
+    )
+    if props.get("style"):
+        attributes += f' style="{html_text.escape(to_css(props["style"]))}"'
+    return f"<{tag}{attributes}>{inner}</{tag}>"
+
+
+def render_slider(props: Dict[str, Any], values: List[float]) -> str:
+    """Render a slider as a range input stepping through a list of values.
+
+    Args:
+        props: dash slider properties
+        values: values of an explorable slider, or an empty list for a slider fixed at its value
+
+    Returns:
+        HTML text, explorable sliders start at the value closest to the layout's
+    """
+    if len(values) == 0:
+        # fixed sliders show their value on the control's own scale
+        return (
+            f'<input type="range" min="{props["min"]}" max="{props["max"]}" step="{props["step"]}" '
+            + f'value="{props["value"]}" disabled> <span>{props["value"]}</span>'
+        )
+    position = int(np.argmin(np.abs(np.array(values) - props["value"])))
+    return (
+        f'<input type="range" id="{props["id"]}" min="0" max="{len(values) - 1}" step="1" '
+        + f'value="{position}"> '
+        + f'<span id="{props["id"]}_value">{values[position]}</span>'
+    )
+
+
+def render_component(component: Any, sliders: Dict[str, List[float]]) -> str:
+    """Render a dash component tree as static HTML.
+
+    HTML components are rendered as they are, the scatter plot becomes an
+    empty element for plotly, sliders become range inputs and number inputs
+    are shown disabled. Components that need the server are left out.
+
+    Args:
+        component: component, list of components, text or None
+        sliders: values of the explorable sliders by slider id
+
+    Returns:
+        HTML text
+    """
+    if component is None:
+        return ""
+    if isinstance(component, (list, tuple)):
+        return "".join(render_component(child, sliders) for child in component)
+    if isinstance(component, (str, int, float)):
+        return html_text.escape(str(component))
+    props = component.to_plotly_json()["props"]
+    namespace = component._namespace  # pylint: disable=protected-access
+    kind = component._type  # pylint: disable=protected-access
+    if namespace == "dash_html_components":
+        children = props.get("children")
+        inner = render_component(children, sliders)
+        rows = isinstance(children, list) and len(children) > 0
+        rows = rows and all(getattr(child, "_type", "") == "Tr" for child in children)
+        if rows and kind != "Table":
+            # react accepts rows in a cell, an HTML parser needs them in a table of their own
+            inner = f"<table>{inner}</table>"
+        return render_tag(kind.lower(), props, inner)
+    if kind == "Graph" and props.get("id") == "scatter_plot":
+        return render_tag("div", {"id": "scatter_plot"})
+    if kind == "Slider":
+        return render_slider(props, sliders.get(props["id"], []))
+    if kind == "Input":
+        # inputs, like the per-phase harmonics, are fixed at their layout value
+        input_type = props.get("type", "text")
+        return f'<input type="{input_type}" value="{props.get("value", "")}" size="4" disabled>'
+    return ""
+
+
+def get_static_layout() -> List[Any]:
+    """Get the sections of the page layout that work without the server.
+
+    Returns:
+        top level components up to LAST_COMPONENT
+    """
+    children = app.layout.children
+    last = next(index for index, child in enumerate(children) if getattr(child, "id", None) == LAST_COMPONENT)
+    return children[: last + 1]
+
+
+def render_page(sliders: Dict[str, List[float]]) -> str:
+    """Render index.html with the page's stylesheets, MathJax and the static layout.
+
+    Args:
+        sliders: values of the explorable sliders by slider id
+
+    Returns:
+        HTML text
+    """
+    # the layout's bootstrap container
+    container = app.layout
+    body = render_tag(
+        "div",
+        {"className": "container-fluid" if container.fluid else "container", "style": container.style},
+        render_component(get_static_layout(), sliders),
+    )
+    head = [f"<title>{html_text.escape(app.title)}</title>", '<meta charset="utf-8">']
+    head += [f'<link rel="stylesheet" href="{sheet}">' for sheet in app.config.external_stylesheets]
+    # MathJax from its CDN, the local callback asset only serves the dash callbacks
+    head += [
+        f'<script type="text/javascript" src="{script["src"]}"></script>'
+        for script in app.config.external_scripts
+        if script["src"].startswith("http")
+    ]
+    head += [
+        f'<script type="text/javascript" src="{script}"></script>'
+        for script in ["plotly.min.js", "equations.js", "explorer.js"]
+    ]
+    head_text = "\n".join(head)
+    return f"<!DOCTYPE html>\n<html>\n<head>\n{head_text}\n</head>\n<body>\n{body}\n</body>\n</html>\n"
+
+
+def build_site(
+    directory: str, grid: Dict[str, List[float]], sample_count: int, controls: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """Build the static site.
+
+    Args:
+        directory: output directory, created if needed
+        grid: values of the sliders explored besides the time slider, see GRID_CONTROLS
+        sample_count: number of samples along the time axis
+        controls: update arguments of the sliders that are not in the grid, DEFAULT_CONTROLS by default
+
+    Returns:
+        the manifest written to manifest.json
+    """
+    controls = dict(DEFAULT_CONTROLS if controls is None else controls)
+    shard_directory = os.path.join(directory, "shards")
+    os.makedirs(shard_directory, exist_ok=True)
+    cpe = ClarkeParkExploration(sample_count=sample_count)
+    time_steps = get_time_steps(cpe.slider_count)
+    names = list(grid)
+    # combinations are numbered in row-major order, the last grid slider changes fastest
+    for combination, values in enumerate(itertools.product(*[grid[name] for name in names])):
+        frames = build_frames(cpe, dict(controls, **dict(zip(names, values))), time_steps)
+        write_shards(frames, shard_directory, combination)
+
+    sliders = {SLIDER_IDS.get(name, name): grid[name] for name in names}
+    manifest = {
+        "time_steps": time_steps,
+        "sliders": [{"id": slider, "values": values} for slider, values in sliders.items()],
+        "shard_frames": SHARD_FRAMES,
+        # the plot is created from the figure of the last frame and restyled with every frame
+        "figure": json.loads(json.dumps(cpe.get_figure(), cls=plotly.utils.PlotlyJSONEncoder)),
+        "cells": [
+            f"three_phase_data_{row}_{column}"
+            for row in range(PHASE_COUNT + 1)
+            for column in range(AXIS_COUNT)
+        ]
+        + [f"clarke_data_{row}_0" for row in range(PHASE_COUNT)]
+        + [f"park_data_{row}_0" for row in range(AXIS_COUNT)],
+        "cameras": {button: CAMERA_PRESETS[focus] for button, focus in FOCUS_BUTTONS.items()},
+    }
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, separators=(",", ":"))
+    with open(os.path.join(directory, "index.html"), "w", encoding="utf-8") as page_file:
+        page_file.write(render_page(dict({"time_slider": time_steps}, **sliders)))
+    with open(os.path.join(directory, "plotly.min.js"), "w", encoding="utf-8") as plotly_file:
+        plotly_file.write(get_plotlyjs())
+    shutil.copyfile(os.path.join(ASSETS_DIRECTORY, "equations.js"), os.path.join(directory, "equations.js"))
+    shutil.copyfile(os.path.join(TEMPLATE_DIRECTORY, "explorer.js"), os.path.join(directory, "explorer.js"))
+    return manifest
+
+
+def get_size(directory: str) -> Tuple[int, int]:
+    """Get the number and total size of the files under a directory.
+
+    Args:
+        directory: directory
+
+    Returns:
+        file count and bytes
+    """
+    paths = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+    return len(paths), sum(os.path.getsize(path) for path in paths)
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the static build command line interface.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        process exit status
+    """
+    parser = argparse.ArgumentParser(description="Build a static copy of the Clarke and Park page.")
+    parser.add_argument("--output", default="site", help="output directory")
+    parser.add_argument(
+        "--grid",
+        action="append",
+        default=[],
+        metavar="SLIDER=VALUES",
+        help=f"comma separated values of one of {', '.join(GRID_CONTROLS)}, may be repeated",
+    )
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args(argv)
+    try:
+        grid = parse_grid(args.grid)
+    except ValueError as error:
+        parser.error(str(error))
+
+    started = time.perf_counter()
+    manifest = build_site(args.output, grid, args.samples)
+    combinations = int(np.prod([len(slider["values"]) for slider in manifest["sliders"]]))
+    frames = combinations * len(manifest["time_steps"])
+    files, size = get_size(args.output)
+    print(
+        f"built {frames} frames in {time.perf_counter() - started:0.2f} s, "
+        + f"{files} files of {size / 1e6:0.1f} MB in {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
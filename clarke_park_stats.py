@@ -0,0 +1,246 @@
+"""This python module keeps incremental sliding window statistics of streaming signals.
+
+RollingStatistics takes blocks of new samples and updates the window sums in
+O(1) per sample: the sums of samples leaving the window are subtracted
+instead of summing the whole window again. Sums are kept relative to an
+anchor value and are recomputed exactly from the window every few windows,
+moving the anchor to the current mean, so rounding errors cannot build up
+over long telemetry streams.
+
+The statistics of each channel are the mean, the RMS, the ripple (RMS of the
+signal without its mean) and the THD relative to the channel's fundamental.
+The fundamental is found with a sliding DFT of a single bin, a fundamental
+frequency of 0 makes the mean the fundamental, which suits the d and q axes.
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+from typing import Dict, Optional
+import numpy as np
+
+STATISTICS = ["mean", "rms", "ripple", "thd"]
+
+# windows of samples between exact recomputations of the sums
+REANCHOR_WINDOWS = 16
+
+# smallest fundamental power, relative to the mean square, with a defined THD
+FUNDAMENTAL_FLOOR = 1e-9
+
+
+class RollingStatistics:
+    """Sliding window mean, RMS, ripple and THD of several channels."""
+
+    def __init__(self, window: int, frequencies: np.ndarray, reanchor: int = REANCHOR_WINDOWS) -> None:
+        """Create empty statistics.
+
+        Args:
+            window: samples per window
+            frequencies: fundamental frequency of each channel in cycles per sample, 0 for DC signals
+            reanchor: windows of samples between exact recomputations of the sums
+        """
+        self.window = max(1, int(window))
+        self.frequencies = np.asarray(frequencies, dtype=np.float64)
+        self.reanchor = max(1, int(reanchor)) * self.window
+        channels = len(self.frequencies)
+        self.ring = np.zeros((channels, self.window))
+        # scratch space of recompute, so reloading a window allocates nothing
+        self.offsets = np.arange(self.window, dtype=np.float64)
+        self.positions = np.zeros(self.window)
+        self.deviation = np.zeros((channels, self.window))
+        self.rotation = np.zeros((channels, self.window), dtype=np.complex128)
+        self.anchor = np.zeros((channels, 1))
+        self.sum = np.zeros(channels)
+        self.square_sum = np.zeros(channels)
+        self.fundamental_sum = np.zeros(channels, dtype=np.complex128)
+        # total samples pushed, and samples pushed since the sums were last recomputed
+        self.count = 0
+        self.since_anchor = 0
+
+    def get_rotation(self, indexes: np.ndarray) -> np.ndarray:
+        """Get the DFT rotation factors of absolute sample indexes.
+
+        Args:
+            indexes: absolute sample indexes, shape (samples,)
+
+        Returns:
+            factors, shape (channels, samples)
+        """
+        cycles = np.outer(self.frequencies, indexes)
+        return np.exp(-2j * np.pi * (cycles - np.floor(cycles)))
+
+    def push(self, block: np.ndarray) -> Dict[str, np.ndarray]:
+        """Add new samples and get the statistics of the window ending at each of them.
+
+        Args:
+            block: new samples, shape (channels, samples)
+
+        Returns:
+            dictionary of statistic name to values, each shape (channels, samples)
+        """
+        block = np.asarray(block, dtype=np.float64)
+        count = block.shape[1]
+        if count == 0:
+            return {name: np.zeros((len(self.frequencies), 0)) for name in STATISTICS}
+        if self.count == 0:
+            # empty slots hold the anchor so they add nothing to the sums
+            self.anchor[:, 0] = block[:, 0]
+            self.ring[:] = self.anchor
+
+        # samples leaving the window, from the ring and then from the block itself once it wraps
+        indexes = self.count + np.arange(count)
+        head = self.count % self.window
+        evicted = np.concatenate(
+            [
+                self.ring[:, (head + np.arange(min(count, self.window))) % self.window],
+                block[:, : max(0, count - self.window)],
+            ],
+            axis=1,
+        )
+        evicted_filled = indexes >= self.window
+
+        deviation = block - self.anchor
+        evicted_deviation = evicted - self.anchor
+        sums = self.sum[:, np.newaxis] + np.cumsum(deviation - evicted_deviation, axis=1)
+        square_sums = self.square_sum[:, np.newaxis] + np.cumsum(
+            deviation**2 - evicted_deviation**2, axis=1
+        )
+        fundamental = self.get_rotation(indexes) * block
+        fundamental -= np.where(evicted_filled, self.get_rotation(indexes - self.window) * evicted, 0.0)
+        fundamental_sums = self.fundamental_sum[:, np.newaxis] + np.cumsum(fundamental, axis=1)
+
+        # store the block, keeping only its last window of samples
+        kept = block[:, -self.window :]
+        self.ring[:, (self.count + count - kept.shape[1] + np.arange(kept.shape[1])) % self.window] = kept
+        self.sum = sums[:, -1].copy()
+        self.square_sum = square_sums[:, -1].copy()
+        self.fundamental_sum = fundamental_sums[:, -1].copy()
+        self.count += count
+        self.since_anchor += count
+
+        samples = np.minimum(indexes + 1, self.window)
+        statistics = self.get_statistics(sums, square_sums, fundamental_sums, samples)
+        if self.since_anchor >= self.reanchor and self.count >= self.window:
+            self.recompute()
+        return statistics
+
+    def load(self, samples: np.ndarray, frequencies: Optional[np.ndarray] = None) -> None:
+        """Replace the whole window, so one instance can be reused for unrelated windows.
+
+        Args:
+            samples: the window's samples oldest first, shape (channels, window)
+            frequencies: new fundamental frequency of each channel in cycles per sample, None keeps them
+        """
+        if frequencies is not None:
+            self.frequencies[:] = frequencies
+        self.ring[:] = samples
+        self.count = self.window
+        self.recompute()
+
+    def recompute(self) -> None:
+        """Recompute the sums exactly from the window, anchored at the window mean, in the scratch arrays."""
+        np.mean(self.ring, axis=1, out=self.anchor[:, 0])
+        # rows are combined with scalars one at a time, NumPy buffers small broadcast operands
+        deviation = self.deviation
+        for channel, anchor in enumerate(self.anchor[:, 0]):
+            np.subtract(self.ring[channel], anchor, out=deviation[channel])
+        np.sum(deviation, axis=1, out=self.sum)
+        np.square(deviation, out=deviation)
+        np.sum(deviation, axis=1, out=self.square_sum)
+        # the rotation of the window's samples oldest first, the same factors as get_rotation
+        np.add(self.offsets, self.count - self.window, out=self.positions)
+        cycles = self.deviation
+        for channel, frequency in enumerate(self.frequencies):
+            np.multiply(self.positions, frequency, out=cycles[channel])
+        np.mod(cycles, 1.0, out=cycles)
+        # float and complex operands are combined through the real and imaginary views, mixing them would
+        # cast through temporary buffers
+        rotation = self.rotation
+        rotation.real = 0.0
+        np.multiply(cycles, -2 * np.pi, out=rotation.imag)
+        np.exp(rotation, out=rotation)
+        # the oldest sample is at the ring head
+        split = self.window - self.count % self.window
+        for part in (rotation.real, rotation.imag):
+            np.multiply(part[:, :split], self.ring[:, self.window - split :], out=part[:, :split])
+            np.multiply(part[:, split:], self.ring[:, : self.window - split], out=part[:, split:])
+        np.sum(rotation, axis=1, out=self.fundamental_sum)
+        self.since_anchor = 0
+
+    def get_statistics(
+        self,
+        sums: np.ndarray,
+        square_sums: np.ndarray,
+        fundamental_sums: np.ndarray,
+        samples: np.ndarray,
+    ) -> Dict[str, np.ndarray]:
+        """Turn window sums into statistics.
+
+        Args:
+            sums: sums of deviations from the anchor, shape (channels, samples)
+            square_sums: sums of squared deviations from the anchor, shape (channels, samples)
+            fundamental_sums: single bin DFT sums, shape (channels, samples)
+            samples: number of samples in each window, shape (samples,)
+
+        Returns:
+            dictionary of statistic name to values, each shape (channels, samples)
+        """
+        mean_deviation = sums / samples
+        mean = self.anchor + mean_deviation
+        variance = np.maximum(square_sums / samples - mean_deviation**2, 0.0)
+        mean_square = variance + mean**2
+        dc = self.frequencies[:, np.newaxis] == 0
+        # power of the fundamental, a tone of amplitude 2|X|/n has a mean square of half its amplitude squared
+        fundamental_power = np.where(dc, mean**2, 2 * np.abs(fundamental_sums / samples) ** 2)
+        harmonic_power = np.where(dc, variance, np.maximum(variance - fundamental_power, 0.0))
+        # THD is undefined without a fundamental
+        defined = fundamental_power > FUNDAMENTAL_FLOOR * mean_square
+        with np.errstate(divide="ignore", invalid="ignore"):
+            thd = np.where(defined, np.sqrt(harmonic_power / fundamental_power), np.nan)
+        return {
+            "mean": mean,
+            "rms": np.sqrt(mean_square),
+            "ripple": np.sqrt(variance),
+            "thd": thd,
+        }
+
+    def current(self) -> Dict[str, np.ndarray]:
+        """Get the statistics of the current window.
+
+        Returns:
+            dictionary of statistic name to values, each shape (channels,)
+        """
+        statistics = self.get_statistics(
+            self.sum[:, np.newaxis],
+            self.square_sum[:, np.newaxis],
+            self.fundamental_sum[:, np.newaxis],
+            np.array([max(1, min(self.count, self.window))]),
+        )
+        return {name: values[:, 0] for name, values in statistics.items()}
+
+
+def rolling_statistics(
+    signals: np.ndarray,
+    window: int,
+    frequencies: np.ndarray,
+    chunk_size: int = 1 << 16,
+) -> Dict[str, np.ndarray]:
+    """Compute sliding window statistics of whole records.
+
+    Records are pushed through RollingStatistics in chunks, so memory use
+    depends on the chunk size and window rather than the record length.
+
+    Args:
+        signals: signals, shape (channels, samples)
+        window: samples per window
+        frequencies: fundamental frequency of each channel in cycles per sample, 0 for DC signals
+        chunk_size: samples pushed at a time
+
+    Returns:
+        dictionary of statistic name to values of the window ending at each sample, shape (channels, samples)
+    """
+    statistics = RollingStatistics(window, frequencies)
+    results = {name: np.empty(np.shape(signals)) for name in STATISTICS}
+    for start in range(0, np.shape(signals)[1], chunk_size):
+        for name, values in statistics.push(signals[:, start : start + chunk_size]).items():
+            results[name][:, start : start + chunk_size] = values
+    return results
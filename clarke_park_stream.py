@@ -0,0 +1,293 @@
+"""This python module pushes Clarke and Park frames to browsers with Server-Sent Events.
+
+An asyncio HTTP server running on its own thread and port serves "/stream" as
+an event stream. Every published frame is JSON encoded once and offered to
+each subscriber through a single slot queue, so a slow client skips stale
+frames instead of falling behind.
+
+Subscribers pass their browser session id as "/stream?session=<id>". Frames
+can come from the StreamProducer, which animates a copy of each subscribed
+session's own settings and sends the frames only to that session, or from any
+local data source calling FrameBroadcaster.publish, e.g. drive telemetry,
+which reaches every subscriber. The animated copies are kept by the session
+pool as extras of their sessions, so they count toward its memory budget and
+are dropped with their sessions.
+
+Author: joe f.
+GitHub: https://github.com/joeferg425
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+
+STREAM_PORT = int(os.environ.get("CLARKE_PARK_STREAM_PORT", "0"))
+STREAM_PATH = "/stream"
+STREAM_SESSION_QUERY = "session"
+
+# name of the animated copy among the extras of a session, see SessionPool.get_extra
+STREAM_EXTRA = "stream"
+
+# seconds between keep alive comments on idle streams
+KEEP_ALIVE = 15.0
+
+# instance attributes copied from the page instance to the producer instance
+CONTROL_ATTRIBUTES = [
+    "frequency",
+    "phaseA_amplitude",
+    "phaseB_amplitude",
+    "phaseC_amplitude",
+    "phaseA_offset",
+    "phaseB_offset",
+    "phaseC_offset",
+    "zero_sequence",
+    "focus_selection",
+    "webgl_2d",
+    "projection",
+    "height",
+    "width",
+]
+
+
+class FrameBroadcaster:
+    """Server-Sent Events server with latest-frame-wins delivery."""
+
+    def __init__(self) -> None:
+        """Create a stopped broadcaster."""
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # subscriber queues by session id, "" for subscribers without a session
+        self.queues: Dict[str, List[asyncio.Queue]] = {}
+        self.sequence = 0
+        self.dropped = 0
+        self.subscribed = threading.Event()
+        # numbers frames from any thread and queues them in the order of their numbers
+        self.lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        """Get the number of connected clients.
+
+        Returns:
+            number of clients
+        """
+        return sum(len(queues) for queues in list(self.queues.values()))
+
+    def get_sessions(self) -> List[str]:
+        """Get the sessions with at least one connected client, from any thread.
+
+        Returns:
+            session ids, "" for clients without a session
+        """
+        return list(self.queues)
+
+    def start(self, host: str = "0.0.0.0", port: int = STREAM_PORT) -> None:
+        """Start serving on a daemon thread.
+
+        Args:
+            host: address to listen on
+            port: port to listen on
+
+        Raises:
+            OSError: the server could not listen, e.g. the port is in use
+        """
+        ready = threading.Event()
+        errors: List[BaseException] = []
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                server = loop.run_until_complete(asyncio.start_server(self.handle_client, host, port))
+                self.loop = loop
+            except BaseException as error:
+                errors.append(error)
+                loop.close()
+                return
+            finally:
+                ready.set()
+            try:
+                loop.run_forever()
+            finally:
+                server.close()
+
+        threading.Thread(target=serve, name="clarke-park-stream", daemon=True).start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+
+    def publish(self, frame: Dict[str, Any], session: Optional[str] = None) -> None:
+        """Send a frame to the subscribers of a session, or to every subscriber, from any thread.
+
+        Args:
+            frame: JSON serializable frame
+            session: session id whose subscribers receive the frame, None for every subscriber
+        """
+        if self.loop is None or not self.queues:
+            return
+        data = json.dumps(frame, separators=(",", ":"))
+        with self.lock:
+            self.sequence += 1
+            message = f"id: {self.sequence}\ndata: {data}\n\n".encode()
+            self.loop.call_soon_threadsafe(self.offer, message, session)
+
+    def offer(self, message: bytes, session: Optional[str] = None) -> None:
+        """Put a message in subscriber queues, replacing a frame not yet sent.
+
+        Args:
+            message: encoded event
+            session: session id whose subscribers receive the message, None for every subscriber
+        """
+        if session is None:
+            queues = [queue for session_queues in self.queues.values() for queue in session_queues]
+        else:
+            queues = self.queues.get(session, [])
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one HTTP connection.
+
+        Args:
+            reader: connection reader
+            writer: connection writer
+        """
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        parts = request.split(b" ", 2)
+        url = urlparse(parts[1].decode(errors="replace") if len(parts) > 1 else "")
+        session = parse_qs(url.query).get(STREAM_SESSION_QUERY, [""])[0]
+        if url.path != STREAM_PATH:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            + b"Content-Type: text/event-stream\r\n"
+            + b"Cache-Control: no-cache\r\n"
+            + b"Access-Control-Allow-Origin: *\r\n"
+            + b"Connection: keep-alive\r\n\r\n"
+        )
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.queues.setdefault(session, []).append(queue)
+        self.subscribed.set()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEP_ALIVE)
+                except asyncio.TimeoutError:
+                    message = b": keep-alive\n\n"
+                writer.write(message)
+                # while a slow client drains, newer frames replace the queued one
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.queues[session].remove(queue)
+            if not self.queues[session]:
+                del self.queues[session]
+            if not self.queues:
+                self.subscribed.clear()
+            writer.close()
+
+
+def get_frame(cpe: Any) -> Dict[str, Any]:
+    """Get the numeric content of an instance's current figure.
+
+    Args:
+        cpe: ClarkeParkExploration instance after generate_figure_data
+
+    Returns:
+        frame with the time offset, figure type and rounded trace coordinates
+    """
+    figure = cpe.get_figure()
+    axes = ["x", "y", "z"] if figure["data"][0]["type"] == "scatter3d" else ["x", "y"]
+    return {
+        "time": cpe.time_offset,
+        "type": figure["data"][0]["type"],
+        "names": [trace["name"] for trace in figure["data"]],
+        "traces": {
+            axis: [np.round(np.asarray(trace[axis], dtype=float), 4).tolist() for trace in figure["data"]]
+            for axis in axes
+        },
+    }
+
+
+class StreamProducer:
+    """Animates each subscribed session's settings and publishes a frame per step to that session."""
+
+    def __init__(
+        self,
+        pool: Any,
+        factory: Callable[[], Any],
+        broadcaster: FrameBroadcaster,
+        fps: float = 20.0,
+    ) -> None:
+        """Create a stopped producer.
+
+        Args:
+            pool: SessionPool of the page's instances, whose controls are followed, it keeps the animated
+                instances as the STREAM_EXTRA extra of their sessions
+            factory: function creating the ClarkeParkExploration instance the producer animates for a session
+            broadcaster: broadcaster receiving the frames
+            fps: frames per second
+        """
+        self.pool = pool
+        self.factory = factory
+        self.broadcaster = broadcaster
+        self.period = 1.0 / fps
+        # sessions with an animated instance
+        self.streamed: Set[str] = set()
+
+    def start(self) -> None:
+        """Start producing frames on a daemon thread."""
+        threading.Thread(target=self.run, name="clarke-park-producer", daemon=True).start()
+
+    def run(self) -> None:
+        """Produce frames forever."""
+        while True:
+            self.broadcaster.subscribed.wait()
+            started = time.perf_counter()
+            sessions = self.broadcaster.get_sessions()
+            for session in self.streamed - set(sessions):
+                self.pool.remove_extra(session, STREAM_EXTRA)
+            self.streamed.intersection_update(sessions)
+            for session in sessions:
+                # the session is held while its controls are copied and its animated instance steps
+                with self.pool.use(session, create=False) as source:
+                    if source is None:
+                        continue
+                    target = self.pool.get_extra(session, STREAM_EXTRA, self.factory)
+                    self.streamed.add(session)
+                    self.step(source, target)
+                    frame = get_frame(target)
+                self.broadcaster.publish(frame, session)
+            time.sleep(max(0.0, self.period - (time.perf_counter() - started)))
+
+    def step(self, source: Any, target: Any) -> None:
+        """Copy the controls of a session's instance and advance the animated instance by one frame.
+
+        Args:
+            source: ClarkeParkExploration instance of the session
+            target: ClarkeParkExploration instance animated for the session
+        """
+        for name in CONTROL_ATTRIBUTES:
+            setattr(target, name, getattr(source, name))
+        target.harmonic_amplitudes[:] = source.harmonic_amplitudes
+        target.harmonic_offsets[:] = source.harmonic_offsets
+        target.time_offset = (target.time_offset + 1.0 / target.slider_count) % 1.0
+        target.generate_figure_data()
+
+
+BROADCASTER = FrameBroadcaster()
@@ -0,0 +1,100 @@
+// static copy of the Clarke and Park page built by clarke_park_static.py, the frames of every time slider
+// step are read from gzip compressed JSON shards as the sliders move
+(function () {
+    var manifest = null;
+    var shards = {};
+    var request = 0;
+
+    var getPosition = function (id) {
+        return Number(document.getElementById(id).value);
+    };
+
+    // shards are decompressed here unless the host already sent them with a gzip content encoding
+    var getShard = function (name) {
+        if (!shards[name]) {
+            shards[name] = fetch("shards/" + name).then(function (response) {
+                if (!response.ok) {
+                    throw new Error("could not load shard " + name + ": " + response.status);
+                }
+                return response.arrayBuffer();
+            }).then(function (buffer) {
+                var bytes = new Uint8Array(buffer);
+                if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) {
+                    return JSON.parse(new TextDecoder().decode(bytes));
+                }
+                var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+                return new Response(stream).json();
+            });
+            shards[name].catch(function () {
+                delete shards[name];
+            });
+        }
+        return shards[name];
+    };
+
+    // grid combinations are numbered in row-major order, the last grid slider changes fastest
+    var getCombination = function () {
+        return manifest.sliders.reduce(function (combination, slider) {
+            return combination * slider.values.length + getPosition(slider.id);
+        }, 0);
+    };
+
+    var showFrame = function (frame) {
+        var graph = document.getElementById("scatter_plot");
+        Plotly.restyle(graph, { name: frame.names, y: frame.traces.y, z: frame.traces.z });
+        var text = window.dash_clientside.equations.fill_tables(frame.equation_values);
+        manifest.cells.forEach(function (id, index) {
+            document.getElementById(id).textContent = text[index];
+        });
+        document.getElementById("unbalance").textContent = frame.unbalance;
+    };
+
+    var update = function () {
+        var step = getPosition("time_slider");
+        document.getElementById("time_slider_value").textContent = manifest.time_steps[step].toFixed(2);
+        manifest.sliders.forEach(function (slider) {
+            var value = slider.values[getPosition(slider.id)];
+            document.getElementById(slider.id + "_value").textContent = value;
+        });
+        var combination = getCombination();
+        var block = Math.floor(step / manifest.shard_frames);
+        var current = ++request;
+        getShard(combination + "_" + block + ".json.gz").then(function (frames) {
+            // a later slider position may have been shown already
+            if (current === request) {
+                showFrame(frames[step % manifest.shard_frames]);
+            }
+        });
+        // the next block is fetched ahead of the time slider
+        if ((block + 1) * manifest.shard_frames < manifest.time_steps.length) {
+            getShard(combination + "_" + (block + 1) + ".json.gz");
+        }
+    };
+
+    var start = function () {
+        fetch("manifest.json").then(function (response) {
+            return response.json();
+        }).then(function (loaded) {
+            manifest = loaded;
+            return Plotly.newPlot("scatter_plot", manifest.figure.data, manifest.figure.layout);
+        }).then(function () {
+            ["time_slider"].concat(manifest.sliders.map(function (slider) {
+                return slider.id;
+            })).forEach(function (id) {
+                document.getElementById(id).addEventListener("input", update);
+            });
+            Object.keys(manifest.cameras).forEach(function (id) {
+                document.getElementById(id).addEventListener("click", function () {
+                    Plotly.relayout("scatter_plot", { "scene.camera": manifest.cameras[id] });
+                });
+            });
+            update();
+        });
+    };
+
+    if (document.readyState === "loading") {
+        document.addEventListener("DOMContentLoaded", start);
+    } else {
+        start();
+    }
+})();